@@ -0,0 +1,1056 @@
+from settings import *
+import resource
+import sys
+import tempfile
+import time
+import types
+import numba
+from noise import noise2, noise3, noise2_grid, noise3_grid
+from terrain_gen import generate_terrain
+from voxel_storage import UNIFORM_ROWS, create_pool, get_chunk_voxels, read_voxel
+from palette_storage import PaletteStore
+from meshes.chunk_mesh_builder import (ALL_SECTIONS, build_chunk_mesh, build_greedy_mesh, build_mesh_keys,
+                                      build_quad_indices, build_world_meshes, get_edit_sections, get_face_offsets,
+                                      get_mesher_salt)
+from mesh_cache import MeshCache
+from camera import Camera
+from frustum import cull_spheres, sort_by_distance
+from occlusion_queries import OcclusionQueries
+from occlusion import ANY_FACE, build_connectivity, find_visible_chunks, get_region_faces
+from world_objects.chunk import get_lod
+from meshes.chunk_mesh import ORIGIN_BYTES, ORIGIN_FORMAT, ChunkMesh, get_facing_faces, render_face_ranges
+from shader_program import get_camera_data
+from region_storage import RegionStore, encode_chunk
+from edit_journal import EditJournal, write_journal
+from fixed_world import (ALL_CHUNKS, DENSE_SLOTS, WORLD_COLUMNS, bind_camera, build_fixed_world, build_world_heightmaps,
+                         create_headless_context, generate_world, get_chunk_position, get_mixed_chunks, get_quad_count,
+                         get_vertex_bytes, load_program, mesh_world, read_frame)
+
+
+def timed(func, *args):
+    """
+    Runs a function once and measures its wall-clock duration.
+
+    Parameters:
+        func: The function to call.
+        *args: Arguments forwarded to the function.
+
+    Returns:
+        float: The elapsed time in seconds.
+    """
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def generate_world_serial(voxels, heightmaps):
+    """Generates the world one chunk at a time, mirroring the serial Chunk.build_voxels path."""
+    for x in range(WORLD_W):
+        for y in range(WORLD_H):
+            for z in range(WORLD_D):
+                chunk_voxels = np.zeros(CHUNK_VOL, dtype='uint8')
+                cx, cy, cz = x * CHUNK_SIZE, y * CHUNK_SIZE, z * CHUNK_SIZE
+                generate_terrain(chunk_voxels, heightmaps[x + WORLD_W * z], cx, cy, cz, CAVE_STRIDE)
+                voxels[DENSE_SLOTS[x + WORLD_W * z + WORLD_AREA * y]] = chunk_voxels
+
+
+def bench_gen():
+    """Compares serial world generation against the parallel generate_chunks kernel."""
+    heightmaps = build_world_heightmaps()
+    voxels = create_pool(WORLD_VOL)
+
+    # compile both paths before timing
+    generate_world(voxels, heightmaps, CAVE_STRIDE)
+    generate_terrain(np.zeros(CHUNK_VOL, dtype='uint8'), heightmaps[0], 0, 0, 0, CAVE_STRIDE)
+
+    serial = timed(generate_world_serial, voxels, heightmaps)
+    print(f'gen serial: {serial:.3f}s ({WORLD_VOL / serial:.0f} chunks/s)')
+
+    max_workers = min(GEN_WORKERS, numba.config.NUMBA_NUM_THREADS)
+    workers = 1
+    while True:
+        numba.set_num_threads(workers)
+        parallel = timed(generate_world, voxels, heightmaps, CAVE_STRIDE)
+        print(f'gen parallel x{workers}: {parallel:.3f}s (speedup {serial / parallel:.2f}x)')
+        if workers == max_workers:
+            break
+        workers = min(workers * 2, max_workers)
+
+
+@njit
+def noise2_points(xs, ys, out):
+    """Evaluates 2D noise one scalar call per point, as the generator did."""
+    for j in range(ys.size):
+        for i in range(xs.size):
+            out[j, i] = noise2(xs[i], ys[j])
+
+
+@njit
+def noise3_points(xs, ys, zs, out):
+    """Evaluates 3D noise one scalar call per point, as the generator did."""
+    for k in range(ys.size):
+        for j in range(zs.size):
+            for i in range(xs.size):
+                out[k, j, i] = noise3(xs[i], ys[k], zs[j])
+
+
+def bench_noise():
+    """
+    Compares points/sec of the scalar noise path against the batched grid kernels on a chunk-sized field,
+    and the largest difference between their values.
+    """
+    axis = np.arange(CHUNK_SIZE) * 0.09
+    field2 = np.empty((CHUNK_SIZE, CHUNK_SIZE))
+    field3 = np.empty((CHUNK_SIZE, CHUNK_SIZE, CHUNK_SIZE))
+    cases = (
+        ('noise2', CHUNK_AREA, (noise2_points, axis, axis, field2), (noise2_grid, axis, axis, field2)),
+        ('noise3', CHUNK_VOL, (noise3_points, axis, axis, axis, field3), (noise3_grid, axis, axis, axis, field3)),
+    )
+    for name, points, scalar, grid in cases:
+        scalar[0](*scalar[1:])
+        expected = scalar[-1].copy()
+        grid[0](*grid[1:])
+        error = np.abs(grid[-1] - expected).max()
+        scalar_rate = points / min(timed(*scalar) for _ in range(5))
+        grid_rate = points / min(timed(*grid) for _ in range(5))
+        print(f'{name}: scalar {scalar_rate / 1e6:.2f} Mpts/s, grid {grid_rate / 1e6:.2f} Mpts/s '
+              f'({grid_rate / scalar_rate:.2f}x), max difference {error:.1e}')
+
+
+def bench_caves():
+    """Reports generation time and voxel disagreements of interpolated cave strides against exact sampling."""
+    heightmaps = build_world_heightmaps()
+    exact = create_pool(WORLD_VOL)
+    voxels = create_pool(WORLD_VOL)
+    generate_world(exact, heightmaps, 1)
+    exact_time = timed(generate_world, exact, heightmaps, 1)
+    solid = int(np.count_nonzero(exact[UNIFORM_ROWS:]))
+    print(f'caves stride 1: {exact_time:.3f}s, {solid} solid voxels')
+
+    for stride in (2, 4, 8):
+        generate_world(voxels, heightmaps, stride)
+        stride_time = timed(generate_world, voxels, heightmaps, stride)
+        mismatched = int(np.count_nonzero(voxels != exact))
+        print(f'caves stride {stride}: {stride_time:.3f}s ({exact_time / stride_time:.2f}x), '
+              f'{mismatched} voxels differ ({100 * mismatched / solid:.3f}% of solid)')
+
+
+def regenerate_world(voxels):
+    """Rebuilds the height tiles and voxels of the whole world from noise, as a launch without a save does."""
+    generate_world(voxels, build_world_heightmaps(), CAVE_STRIDE)
+
+
+def load_world(store, voxels):
+    """Loads every column of the world from a region store into the voxel pool."""
+    for x in range(WORLD_W):
+        for z in range(WORLD_D):
+            _, column_voxels, _ = store.load_column(x, z)
+            for y in range(WORLD_H):
+                voxels[DENSE_SLOTS[x + WORLD_W * z + WORLD_AREA * y]] = column_voxels[y]
+
+
+def bench_regions():
+    """Compares loading the world from region files against regenerating it, and reports bytes per chunk."""
+    heightmaps = build_world_heightmaps()
+    voxels = create_pool(WORLD_VOL)
+    regenerate_world(voxels)
+    regen = timed(regenerate_world, voxels)
+    raw = WORLD_VOL * CHUNK_VOL
+    print(f'regions regenerate: {regen:.3f}s, {CHUNK_VOL} bytes/chunk uncompressed')
+
+    def save_world(store):
+        for x in range(WORLD_W):
+            for z in range(WORLD_D):
+                column = x + WORLD_W * z
+                store.save_column(x, z, heightmaps[column],
+                                  [voxels[DENSE_SLOTS[column + WORLD_AREA * y]] for y in range(WORLD_H)])
+
+    with tempfile.TemporaryDirectory() as path:
+        for level in (1, 6, 9):
+            store = RegionStore(f'{path}/{level}', level)
+            save = timed(save_world, store)
+            size = store.get_size()
+            store.close()
+
+            store = RegionStore(f'{path}/{level}', level)
+            loaded = create_pool(WORLD_VOL)
+            load = timed(load_world, store, loaded)
+            store.close()
+            assert np.array_equal(loaded, voxels)
+            print(f'regions zlib {level}: save {save:.3f}s, load {load:.3f}s ({regen / load:.1f}x faster than regenerating), '
+                  f'{size / WORLD_VOL:.0f} bytes/chunk ({raw / size:.1f}x smaller)')
+
+
+def bench_journal():
+    """
+    Compares the size of saving edited chunks as journal deltas against saving them whole,
+    and times recording, compacting and replaying the edits.
+    """
+    heightmaps, voxels = build_fixed_world()
+    edited = [(x, 0, z) for x in range(8, 12) for z in range(8, 12)]
+    rng = np.random.default_rng(SEED)
+
+    for edits in (100, 1000, 10000):
+        with tempfile.TemporaryDirectory() as path:
+            journal = EditJournal(f'{path}/edits.journal')
+            chunks = rng.integers(len(edited), size=edits)
+            indices = rng.integers(CHUNK_VOL, size=edits)
+            voxel_ids = rng.integers(WOOD + 1, size=edits)
+
+            def record():
+                for chunk, voxel_index, voxel_id in zip(chunks.tolist(), indices.tolist(), voxel_ids.tolist()):
+                    journal.record(edited[chunk], voxel_index, voxel_id)
+
+            record_time = timed(record)
+            journal_size = os.path.getsize(journal.path)
+            compact_time = timed(write_journal, f'{path}/compacted', journal.get_records())
+            compact_size = os.path.getsize(f'{path}/compacted')
+            journal.close()
+
+            def replay():
+                replayed = EditJournal(journal.path)
+                for x, y, z in edited:
+                    delta = replayed.get_delta((x, y, z))
+                    if delta is not None:
+                        voxels[DENSE_SLOTS[x + WORLD_W * z + WORLD_AREA * y], delta[0]] = delta[1]
+                replayed.close()
+
+            replay_time = timed(replay)
+            chunk_size = sum(len(encode_chunk(voxels[DENSE_SLOTS[x + WORLD_W * z + WORLD_AREA * y]]))
+                             for x, y, z in edited)
+            print(f'journal {edits} edits: {1e6 * record_time / edits:.1f}us/edit, replay {replay_time * 1000:.1f}ms, '
+                  f'compact {compact_time * 1000:.1f}ms; journal {journal_size} bytes, compacted {compact_size} bytes, '
+                  f'whole chunks {chunk_size} bytes')
+
+
+@njit
+def read_sequential(storage, chunk_indices):
+    """Sums every voxel of the given chunks in index order through read_voxel."""
+    total = 0
+    for chunk_index in chunk_indices:
+        for voxel_index in range(CHUNK_VOL):
+            total += read_voxel(storage, chunk_index, voxel_index)
+    return total
+
+
+@njit
+def read_random(storage, chunk_indices, voxel_indices):
+    """Sums voxels at scattered (chunk, voxel) pairs through read_voxel, as the AO and neighbour lookups do."""
+    total = 0
+    for i in range(len(chunk_indices)):
+        total += read_voxel(storage, chunk_indices[i], voxel_indices[i])
+    return total
+
+
+def get_chunk_draws(ctx, program, meshes, indexed, cull_faces, camera):
+    """
+    Uploads chunk meshes and sets up the chunk program for a camera, see render_world.
+
+    Returns:
+        dict: The VAO, face offsets and faces to draw of each chunk index.
+    """
+    bind_camera(ctx, camera)
+    program['bg_color'].write(BG_COLOR)
+    program['water_line'] = WATER_LINE
+    program['u_texture_array_0'] = 1
+    index_buffer = ctx.buffer(build_quad_indices()) if indexed else None
+    origins = ctx.buffer(np.array([get_chunk_position(chunk_index) for chunk_index in ALL_CHUNKS],
+                                  dtype='int32') * CHUNK_SIZE)  # as World.chunk_origins
+    draws = {}
+    for chunk_index, (vertex_data, section_offsets) in meshes.items():
+        vao = ctx.vertex_array(program, [(ctx.buffer(vertex_data), '1u4', 'packed_data')],
+                               index_buffer=index_buffer, index_element_size=4, skip_errors=True)
+        vao.bind(program['chunk_origin'].location, 'i', origins, ORIGIN_FORMAT, offset=chunk_index * ORIGIN_BYTES,
+                 divisor=1)
+        box_min = glm.vec3(get_chunk_position(chunk_index)) * CHUNK_SIZE
+        faces = get_facing_faces(camera.position, box_min, box_min + CHUNK_SIZE) if cull_faces else (True,) * 6
+        draws[chunk_index] = vao, get_face_offsets(section_offsets).tolist(), faces
+    return draws
+
+
+def render_world(ctx, program, meshes, frames=10, indexed=INDEXED_QUADS, cull_faces=CULL_FACE_RANGES, camera=None):
+    """
+    Draws chunk meshes from the player's spawn view, or another camera, as World.render does, and measures
+    the frame time.
+
+    Parameters:
+        ctx: The headless context.
+        program: The chunk shader program.
+        meshes (dict): The mesh_world meshes of each chunk index.
+        frames (int): The number of frames to time.
+        indexed (bool): The meshes were built for the shared quad index buffer.
+        cull_faces (bool): Draw only the face directions of each chunk that can face the camera.
+        camera (Camera): The view, the player's spawn view when omitted.
+
+    Returns:
+        tuple: The average frame time in seconds and the vertices submitted per frame.
+    """
+    if camera is None:
+        camera = Camera(PLAYER_POS, -90, 0)
+        camera.update()
+    draws = get_chunk_draws(ctx, program, meshes, indexed, cull_faces, camera)
+
+    def frame():
+        ctx.clear(color=BG_COLOR)
+        submitted = 0
+        for vao, face_offsets, faces in draws.values():
+            submitted += render_face_ranges(vao, face_offsets, faces)[0]
+        ctx.finish()
+        return submitted
+
+    submitted = frame()
+    return timed(lambda: [frame() for _ in range(frames)]) / frames, submitted
+
+
+def bench_palette():
+    """
+    Compares the memory of dense, uniform-sharing and palette-packed chunk storage,
+    and the read throughput and meshing time of the packed store against dense rows.
+    """
+    heightmaps, voxels = build_fixed_world()
+    dense = voxels, DENSE_SLOTS
+
+    mixed = get_mixed_chunks(voxels)
+    store = PaletteStore(WORLD_VOL)
+    pack = timed(lambda: [store.pack(chunk_index, voxels[DENSE_SLOTS[chunk_index]]) for chunk_index in ALL_CHUNKS])
+    packed = store.storage
+
+    full = WORLD_VOL * CHUNK_VOL
+    pool = (UNIFORM_ROWS + len(mixed)) * CHUNK_VOL
+    palette = store.get_memory()
+    widths = ', '.join(f'{bits} bit: {count}' for bits, count in enumerate(np.bincount(store.bits[mixed], minlength=9)) if count)
+    print(f'palette memory: dense {full / 2**20:.1f}MB, uniform-sharing pool {pool / 2**20:.1f}MB, '
+          f'palette {palette / 2**20:.1f}MB ({pool / palette:.1f}x smaller than the pool); '
+          f'{len(mixed)} mixed chunks ({widths}), packed in {pack:.3f}s')
+
+    rng = np.random.default_rng(SEED)
+    chunk_indices = rng.choice(mixed, size=10 ** 7).astype('int32')
+    voxel_indices = rng.integers(CHUNK_VOL, size=10 ** 7).astype('int32')
+    for name, storage in (('dense', dense), ('palette', packed)):
+        read_sequential(storage, mixed[:1])
+        read_random(storage, chunk_indices[:1], voxel_indices[:1])
+        mesh_world(storage, mixed[:1])
+        sequential = timed(read_sequential, storage, mixed)
+        scattered = timed(read_random, storage, chunk_indices, voxel_indices)
+        mesh = timed(mesh_world, storage, mixed)
+        print(f'palette {name} reads: sequential {len(mixed) * CHUNK_VOL / sequential / 1e6:.0f}M voxels/s, '
+              f'random {len(chunk_indices) / scattered / 1e6:.0f}M voxels/s; meshing {mesh:.3f}s')
+    assert read_sequential(dense, mixed) == read_sequential(packed, mixed)
+
+
+def bench_greedy():
+    """Compares the triangle count, vertex memory, meshing time and headless frame time of the greedy mesher against the per-voxel one."""
+    heightmaps, voxels = build_fixed_world()
+    storage = voxels, DENSE_SLOTS
+    mixed = get_mixed_chunks(voxels)
+
+    ctx = create_headless_context()
+    program = load_program(ctx, 'chunk')
+    for name, mesher in (('per-voxel', build_chunk_mesh), ('greedy', build_greedy_mesh)):
+        mesh_world(storage, mixed[:1], mesher)
+        start = time.perf_counter()
+        meshes = mesh_world(storage, mixed, mesher)
+        mesh_time = time.perf_counter() - start
+        vertex_bytes = get_vertex_bytes(meshes)
+        frame_time, _ = render_world(ctx, program, meshes)
+        print(f'greedy {name}: {2 * get_quad_count(meshes)} triangles, {vertex_bytes / 2**20:.1f}MB of vertices, '
+              f'meshing {mesh_time:.3f}s, frame {frame_time * 1000:.1f}ms ({ctx.info["GL_RENDERER"]})')
+
+
+def bench_mesh():
+    """Measures the meshing throughput of both meshers over every mixed chunk of the fixed world."""
+    heightmaps, voxels = build_fixed_world()
+    storage = voxels, DENSE_SLOTS
+    mixed = get_mixed_chunks(voxels)
+
+    for name, mesher in (('per-voxel', build_chunk_mesh), ('greedy', build_greedy_mesh)):
+        mesh_world(storage, mixed[:1], mesher)
+        start = time.perf_counter()
+        meshes = mesh_world(storage, mixed, mesher)
+        mesh_time = time.perf_counter() - start
+        quads = get_quad_count(meshes)
+        print(f'mesh {name}: {1000 * mesh_time / len(mixed):.2f}ms/chunk, {len(mixed) / mesh_time:.1f} chunks/s, '
+              f'{quads / mesh_time / 1e6:.2f}M quads/s')
+
+
+def get_memory():
+    """Returns the resident and the virtual size of the process in bytes, from /proc/self/statm."""
+    with open('/proc/self/statm') as file:
+        virtual, resident = map(int, file.read().split()[:2])
+    return resident * resource.getpagesize(), virtual * resource.getpagesize()
+
+
+def bench_memory():
+    """
+    Measures the memory held by the finished meshes of the whole world, as queued for upload at startup,
+    the peak RSS growth of meshing it, and the memory a chunk remesh after an edit keeps alive.
+    """
+    heightmaps, voxels = build_fixed_world()
+    storage = voxels, DENSE_SLOTS
+    mixed = get_mixed_chunks(voxels)
+    chunk_index = mixed[len(mixed) // 2]
+
+    for name, mesher in (('per-voxel', build_chunk_mesh), ('greedy', build_greedy_mesh)):
+        mesh_world(storage, mixed[:1], mesher)
+        resident, virtual = get_memory()
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        meshes = mesh_world(storage, mixed, mesher)
+        held_resident, held_virtual = get_memory()
+        peak_growth = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 - peak, 0)
+        used = get_vertex_bytes(meshes)
+        del meshes
+
+        edits = 100
+        remeshes = []
+        start = time.perf_counter()
+        for _ in range(edits):
+            remeshes.append(mesh_world(storage, [chunk_index], mesher)[chunk_index])
+        edit_time = (time.perf_counter() - start) / edits
+        edit_virtual = (get_memory()[1] - virtual) / edits
+        del remeshes
+        print(f'memory {name}: {used / 2**20:.1f}MB of vertices held as {(held_resident - resident) / 2**20:.1f}MB resident, '
+              f'{(held_virtual - virtual) / 2**20:.1f}MB virtual, peak RSS +{peak_growth / 2**20:.1f}MB; '
+              f'edit remesh {edit_time * 1000:.2f}ms holding {edit_virtual / 2**10:.0f}KB')
+
+
+def bench_indexed():
+    """
+    Compares indexed quad meshes, 4 vertices per face drawn through the shared index buffer,
+    against 6 vertices per face: buffer sizes, headless frame time and the rendered frames.
+    """
+    heightmaps, voxels = build_fixed_world()
+    storage = voxels, DENSE_SLOTS
+    mixed = get_mixed_chunks(voxels)
+
+    ctx = create_headless_context()
+    program = load_program(ctx, 'chunk')
+    frames = []
+    for indexed in (False, True):
+        meshes = mesh_world(storage, mixed, indexed=indexed)
+        vertex_bytes = get_vertex_bytes(meshes)
+        index_bytes = build_quad_indices().nbytes if indexed else 0
+        frame_time, _ = render_world(ctx, program, meshes, indexed=indexed)
+        frames.append(read_frame(ctx).astype('int32'))
+        print(f'indexed {indexed}: {get_quad_count(meshes, indexed)} quads, {vertex_bytes / 2**20:.1f}MB of vertices '
+              f'+ {index_bytes / 2**20:.1f}MB shared indices, frame {frame_time * 1000:.1f}ms')
+    differing = int(np.count_nonzero((frames[0] != frames[1]).any(axis=2)))
+    print(f'indexed frames: {differing} of {frames[0].shape[0] * frames[0].shape[1]} pixels differ')
+
+
+def bench_faces():
+    """
+    Compares drawing every face of the visible chunks against drawing only the face directions
+    that can face the camera: vertices submitted, headless frame time and the rendered frames.
+    """
+    heightmaps, voxels = build_fixed_world()
+    storage = voxels, DENSE_SLOTS
+    mixed = get_mixed_chunks(voxels)
+
+    ctx = create_headless_context()
+    program = load_program(ctx, 'chunk')
+    for name, mesher in (('per-voxel', build_chunk_mesh), ('greedy', build_greedy_mesh)):
+        meshes = mesh_world(storage, mixed, mesher)
+        frames = []
+        for cull_faces in (False, True):
+            frame_time, submitted = render_world(ctx, program, meshes, cull_faces=cull_faces)
+            frames.append(read_frame(ctx).astype('int32'))
+            print(f'faces {name} culled {cull_faces}: {submitted} vertices submitted, frame {frame_time * 1000:.1f}ms')
+        differing = int(np.count_nonzero((frames[0] != frames[1]).any(axis=2)))
+        print(f'faces {name}: {differing} pixels differ')
+
+
+def bench_lod():
+    """
+    Compares meshing every chunk at full detail against meshing chunks at the level of detail of
+    their distance from the player's spawn: triangles within growing view distances, meshing time,
+    headless frame time, and pixels of the frame that turn to sky, where a crack between levels
+    would show through.
+    """
+    heightmaps, voxels = build_fixed_world()
+    storage = voxels, DENSE_SLOTS
+    mixed = get_mixed_chunks(voxels)
+    positions = np.array([get_chunk_position(chunk_index) for chunk_index in mixed], dtype='int32')
+    distances = np.array([glm.distance(PLAYER_POS, (glm.vec3(position) + 0.5) * CHUNK_SIZE)
+                          for position in positions.tolist()])
+    lod_scales = np.array([1 << get_lod(distance) for distance in distances], dtype='int32')
+
+    ctx = create_headless_context()
+    program = load_program(ctx, 'chunk')
+    radii = np.arange(2, int(distances.max() // CHUNK_SIZE) + 3, 2) * CHUNK_SIZE
+    triangles, frames = {}, []
+    for name, scales in (('full', np.ones(len(mixed), dtype='int32')), ('lod', lod_scales)):
+        build_world_meshes(mixed[:1], positions[:1], scales[:1], storage, WORLD_COLUMNS, 1, INDEXED_QUADS, False)
+        start = time.perf_counter()
+        arena, offsets, counts, section_offsets = build_world_meshes(
+            mixed, positions, scales, storage, WORLD_COLUMNS, 1, INDEXED_QUADS, False
+        )
+        mesh_time = time.perf_counter() - start
+        meshes = {chunk_index: (arena[offsets[i]: offsets[i] + counts[i]], section_offsets[i])
+                  for i, chunk_index in enumerate(mixed)}
+        quads = section_offsets[:, -1]
+        triangles[name] = [2 * int(quads[distances <= radius].sum()) for radius in radii]
+        frame_time, _ = render_world(ctx, program, meshes)
+        frames.append(read_frame(ctx))
+        print(f'lod {name}: {triangles[name][-1]} triangles, meshing {mesh_time:.2f}s, frame {frame_time * 1000:.1f}ms')
+
+    levels = ', '.join(f'{scale}x: {int(np.count_nonzero(lod_scales == scale))}' for scale in (1, 2, 4, 8))
+    print(f'lod chunks per level ({levels})')
+    for radius, full, lod in zip(radii, triangles['full'], triangles['lod']):
+        print(f'lod within {radius:4d}: {full:9d} full, {lod:9d} lod triangles ({lod / full:.0%})')
+    background = np.round(np.array(BG_COLOR) * 255)
+    sky = [np.all(np.abs(frame.astype('int32') - background) <= 1, axis=2) for frame in frames]
+    print(f'lod frame: {int(np.count_nonzero(sky[1] & ~sky[0]))} pixels turned to sky, '
+          f'{int(np.count_nonzero((frames[0] != frames[1]).any(axis=2)))} pixels differ')
+
+
+def get_surface_voxel(voxels, wx, wz):
+    """Returns the world position of the highest solid voxel of a column of the fixed world."""
+    chunk_column = wx // CHUNK_SIZE + WORLD_W * (wz // CHUNK_SIZE)
+    for wy in range(WORLD_H * CHUNK_SIZE - 1, -1, -1):
+        chunk_index = chunk_column + WORLD_AREA * (wy // CHUNK_SIZE)
+        voxel_index = wx % CHUNK_SIZE + CHUNK_SIZE * (wz % CHUNK_SIZE) + CHUNK_AREA * (wy % CHUNK_SIZE)
+        if voxels[DENSE_SLOTS[chunk_index], voxel_index]:
+            return wx, wy, wz
+    return None
+
+
+def bench_edits():
+    """
+    Measures edit-to-visible latency, from removing surface voxels to the GPU holding the updated
+    meshes, when whole chunks are remeshed against when only the touched sections are, for single
+    edits and for bursts of 16 edits in a 4x4 patch remeshed together. Checks that the spliced
+    meshes match full remeshes.
+    """
+    heightmaps, voxels = build_fixed_world()
+    initial = voxels.copy()
+    storage = voxels, DENSE_SLOTS
+    ctx = create_headless_context()
+    app = types.SimpleNamespace(ctx=ctx, shader_program=types.SimpleNamespace(chunk=load_program(ctx, 'chunk')))
+    world = types.SimpleNamespace(chunk_origins=ctx.buffer(reserve=WORLD_VOL * ORIGIN_BYTES))
+    chunk = types.SimpleNamespace(app=app, world=world, index=0)
+
+    rng = np.random.default_rng(SEED)
+    singles = [[(int(x), int(z))] for x, z in rng.integers(1, WORLD_W * CHUNK_SIZE - 1, size=(100, 2))]
+    bursts = [[(int(x) + dx, int(z) + dz) for dx in range(4) for dz in range(4)]
+              for x, z in rng.integers(1, WORLD_W * CHUNK_SIZE - 5, size=(20, 2))]
+
+    def get_mesh(chunk_index, sections=ALL_SECTIONS):
+        return build_chunk_mesh(get_chunk_voxels(storage, chunk_index), 1, get_chunk_position(chunk_index),
+                                storage, WORLD_COLUMNS, INDEXED_QUADS, sections)
+
+    build_chunk_mesh(voxels[0], 1, (0, 0, 0), storage, WORLD_COLUMNS, INDEXED_QUADS, ALL_SECTIONS[:1])
+    for name, by_sections in (('chunks', False), ('sections', True)):
+        voxels[:] = initial
+        meshes = {}
+        for kind, groups in (('single', singles), ('burst', bursts)):
+            latencies = []
+            for columns in groups:
+                edits = [get_surface_voxel(voxels, wx, wz) for wx, wz in columns]
+                edits = [edit for edit in edits if edit is not None]
+                touched = {}
+                for wx, wy, wz in edits:
+                    for (cx, cy, cz), sections in get_edit_sections(wx, wy, wz).items():
+                        if 0 <= cx < WORLD_W and 0 <= cy < WORLD_H and 0 <= cz < WORLD_D:
+                            touched.setdefault(cx + WORLD_W * cz + WORLD_AREA * cy, set()).update(sections)
+                for chunk_index in touched:
+                    if chunk_index not in meshes:
+                        meshes[chunk_index] = ChunkMesh(chunk, *get_mesh(chunk_index))
+                ctx.finish()
+
+                start = time.perf_counter()
+                for wx, wy, wz in edits:
+                    chunk_index = wx // CHUNK_SIZE + WORLD_W * (wz // CHUNK_SIZE) + WORLD_AREA * (wy // CHUNK_SIZE)
+                    voxel_index = wx % CHUNK_SIZE + CHUNK_SIZE * (wz % CHUNK_SIZE) + CHUNK_AREA * (wy % CHUNK_SIZE)
+                    voxels[DENSE_SLOTS[chunk_index], voxel_index] = 0
+                for chunk_index, sections in touched.items():
+                    if by_sections:
+                        sections = np.array(sorted(sections), dtype='int32')
+                        meshes[chunk_index].rebuild_sections(*get_mesh(chunk_index, sections), sections)
+                    else:
+                        meshes[chunk_index].rebuild(*get_mesh(chunk_index))
+                ctx.finish()
+                latencies.append(time.perf_counter() - start)
+            print(f'edits {name} {kind}: median {np.median(latencies) * 1000:.2f}ms, '
+                  f'max {np.max(latencies) * 1000:.2f}ms per {len(groups[0])} edit(s)')
+
+        for chunk_index, mesh in meshes.items():
+            vertex_data, section_offsets = get_mesh(chunk_index)
+            assert mesh.vbo.read() == vertex_data.tobytes()
+            assert np.array_equal(mesh.section_offsets, section_offsets)
+
+
+def bench_bulk():
+    """
+    Measures startup meshing of every mixed chunk of the fixed world, from voxels to vertex buffers
+    on the GPU: one chunk at a time into a buffer each, against build_world_meshes into one arena
+    buffer at increasing thread counts. Checks that every chunk's range of the arena holds exactly
+    its serial mesh.
+    """
+    heightmaps, voxels = build_fixed_world()
+    storage = voxels, DENSE_SLOTS
+    mixed = get_mixed_chunks(voxels)
+    positions = np.array([get_chunk_position(chunk_index) for chunk_index in mixed], dtype='int32')
+    scales = np.ones(len(mixed), dtype='int32')
+    ctx = create_headless_context()
+    thread_counts = [1 << i for i in range(numba.config.NUMBA_NUM_THREADS.bit_length())]
+
+    for name, mesher, greedy in (('per-voxel', build_chunk_mesh, False), ('greedy', build_greedy_mesh, True)):
+        mesh_world(storage, mixed[:1], mesher)
+        build_world_meshes(mixed[:1], positions[:1], scales[:1], storage, WORLD_COLUMNS, 1, INDEXED_QUADS, greedy)
+
+        def upload_serial():
+            meshes = mesh_world(storage, mixed, mesher)
+            buffers = [ctx.buffer(vertex_data) for vertex_data, _ in meshes.values() if len(vertex_data)]
+            ctx.finish()
+            return meshes, buffers
+
+        start = time.perf_counter()
+        meshes, buffers = upload_serial()
+        serial_time = time.perf_counter() - start
+        print(f'bulk {name} serial: {serial_time:.2f}s, {len(buffers)} buffers')
+        for buffer in buffers:
+            buffer.release()
+
+        for threads in thread_counts:
+            numba.set_num_threads(threads)
+            start = time.perf_counter()
+            arena, offsets, counts, section_offsets = build_world_meshes(
+                mixed, positions, scales, storage, WORLD_COLUMNS, 1, INDEXED_QUADS, greedy
+            )
+            mesh_time = time.perf_counter() - start
+            buffer = ctx.buffer(arena)
+            ctx.finish()
+            bulk_time = time.perf_counter() - start
+            print(f'bulk {name} {threads} thread(s): {bulk_time:.2f}s ({mesh_time:.2f}s meshing), '
+                  f'1 buffer of {arena.nbytes / 2**20:.1f}MB, {serial_time / bulk_time:.2f}x serial')
+
+            uploaded = np.frombuffer(buffer.read(), dtype='uint32')
+            for i, chunk_index in enumerate(mixed):
+                vertex_data, chunk_offsets = meshes[chunk_index]
+                assert np.array_equal(uploaded[offsets[i]: offsets[i] + counts[i]], vertex_data)
+                assert np.array_equal(section_offsets[i], chunk_offsets)
+            buffer.release()
+    numba.set_num_threads(numba.config.NUMBA_NUM_THREADS)
+
+
+def bench_cache():
+    """
+    Measures startup meshing of every mixed chunk of the fixed world into one arena buffer on the
+    GPU, as World.build_meshes does: without the mesh cache, cold with an empty cache that every
+    mesh is written to, and warm from a reopened cache, hashing every chunk and uploading the hits
+    from the mapped pages. The files were just written, so warm reads come from the page cache.
+    Checks that the warm arena holds the cold meshes, then measures a cache capped at half the meshes.
+    """
+    heightmaps, voxels = build_fixed_world()
+    storage = voxels, DENSE_SLOTS
+    mixed = get_mixed_chunks(voxels)
+    positions = np.array([get_chunk_position(chunk_index) for chunk_index in mixed], dtype='int32')
+    scales = np.ones(len(mixed), dtype='int32')
+    salts = np.full(len(mixed), get_mesher_salt(False, 1, INDEXED_QUADS), dtype='int64')
+    ctx = create_headless_context()
+
+    def startup(cache):
+        cached = [None] * len(mixed)
+        if cache is not None:
+            keys = [tuple(key) for key in build_mesh_keys(mixed, positions, scales, salts, storage,
+                                                            WORLD_COLUMNS).tolist()]
+            cached = [cache.get(key) for key in keys]
+        misses = [i for i, mesh in enumerate(cached) if mesh is None]
+        arena, offsets, counts, section_offsets = build_world_meshes(
+            mixed[misses], positions[misses], scales[misses], storage, WORLD_COLUMNS, 1, INDEXED_QUADS, False
+        )
+        ranges = [None] * len(mixed)
+        for i, offset, count, chunk_offsets in zip(misses, offsets.tolist(), counts.tolist(), section_offsets):
+            ranges[i] = offset * 4, count * 4
+            if cache is not None:
+                cache.put(keys[i], arena[offset: offset + count], chunk_offsets)
+        size = arena.nbytes
+        for i, mesh in enumerate(cached):
+            if mesh is not None:
+                ranges[i] = size, mesh[0].nbytes
+                size += mesh[0].nbytes
+        buffer = ctx.buffer(reserve=max(size, 4))
+        if arena.nbytes:
+            buffer.write(arena)
+        for (offset, count), mesh in zip(ranges, cached):
+            if mesh is not None and count:
+                buffer.write(mesh[0], offset=offset)
+        ctx.finish()
+        return buffer, ranges
+
+    with tempfile.TemporaryDirectory() as path:
+        cache = MeshCache(path)
+        build_mesh_keys(mixed[:1], positions[:1], scales[:1], salts[:1], storage, WORLD_COLUMNS)
+        build_world_meshes(mixed[:1], positions[:1], scales[:1], storage, WORLD_COLUMNS, 1, INDEXED_QUADS, False)
+
+        start = time.perf_counter()
+        buffer, _ = startup(None)
+        print(f'cache off: {time.perf_counter() - start:.2f}s')
+        buffer.release()
+
+        start = time.perf_counter()
+        cold_buffer, cold_ranges = startup(cache)
+        cache.close()
+        print(f'cache cold: {time.perf_counter() - start:.2f}s, {cache.misses} misses, '
+              f'{cache.get_size() / 2**20:.1f}MB written')
+
+        start = time.perf_counter()
+        cache = MeshCache(path)
+        warm_buffer, warm_ranges = startup(cache)
+        print(f'cache warm: {time.perf_counter() - start:.2f}s, {cache.hits} hits, {cache.misses} misses')
+        cold, warm = cold_buffer.read(), warm_buffer.read()
+        for (cold_offset, count), (warm_offset, _) in zip(cold_ranges, warm_ranges):
+            assert cold[cold_offset: cold_offset + count] == warm[warm_offset: warm_offset + count]
+        cold_buffer.release()
+        warm_buffer.release()
+        live = cache.live
+        cache.close()
+
+        start = time.perf_counter()
+        cache = MeshCache(path, live // 2)
+        buffer, _ = startup(cache)
+        print(f'cache capped at {live / 2**21:.1f}MB: {time.perf_counter() - start:.2f}s, '
+              f'{cache.hits} hits, {cache.misses} misses')
+        buffer.release()
+        cache.close()
+
+
+def bench_cull():
+    """
+    Measures frustum culling of growing square worlds of chunks around the camera: one
+    is_sphere_on_frustum call per chunk, as World.render did, against a single Frustum.cull
+    call over the chunk center table. Checks that both find the same visible chunks.
+    """
+    camera = Camera(PLAYER_POS, -60, -10)
+    camera.update()
+    frustum = camera.frustum
+    cull_spheres(np.zeros([1, 3], dtype='float32'), CHUNK_SPHERE_RADIUS, tuple(camera.position),
+                 tuple(camera.forward), tuple(camera.up), tuple(camera.right), 1.0, 1.0, 1.0, 1.0)
+    for chunks in (800, 10_000, 100_000):
+        width = round(math.sqrt(chunks / WORLD_H))
+        x, y, z = np.meshgrid(np.arange(width), np.arange(WORLD_H), np.arange(width), indexing='ij')
+        positions = np.stack([x.ravel(), y.ravel(), z.ravel()], axis=1) - [width // 2, 0, width // 2]
+        positions += [int(PLAYER_POS.x) // CHUNK_SIZE, 0, int(PLAYER_POS.z) // CHUNK_SIZE]
+        centers = ((positions + 0.5) * CHUNK_SIZE).astype('float32')
+        glm_centers = [glm.vec3(*center) for center in centers.tolist()]
+
+        per_chunk = timed(lambda: [i for i, center in enumerate(glm_centers) if frustum.is_sphere_on_frustum(center)])
+        visible = [i for i, center in enumerate(glm_centers) if frustum.is_sphere_on_frustum(center)]
+        table = min(timed(frustum.cull, centers) for _ in range(10))
+        assert frustum.cull(centers).tolist() == visible
+        print(f'cull {len(centers)} chunks: per chunk {per_chunk * 1000:.2f}ms, table {table * 1000:.3f}ms '
+              f'({per_chunk / table:.0f}x), {len(visible)} visible')
+
+
+def fill_caves(voxels, heightmaps):
+    """Fills every air voxel of the fixed world below its column's terrain height with stone."""
+    heights = np.arange(CHUNK_SIZE)[:, None, None]
+    for chunk_index in ALL_CHUNKS:
+        x, y, z = get_chunk_position(chunk_index)
+        below = heights + y * CHUNK_SIZE < heightmaps[x + WORLD_W * z].reshape(CHUNK_SIZE, CHUNK_SIZE)
+        chunk_voxels = voxels[DENSE_SLOTS[chunk_index]].reshape(CHUNK_SIZE, CHUNK_SIZE, CHUNK_SIZE)
+        chunk_voxels[below & (chunk_voxels == 0)] = STONE
+
+
+def bench_occlusion():
+    """
+    Compares drawing the chunks within the frustum against drawing only those the connectivity walk
+    reaches from the camera: chunks and vertices drawn, headless frame time and pixels that differ.
+    Views are from above the spawn and from a cave of the generated world, whose caves connect nearly
+    every chunk face, then from above the spawn and from a sealed room of the world with its caves
+    filled. Also times finding the connectivity of every chunk and the walk.
+    """
+    heightmaps, generated = build_fixed_world()
+    filled = generated.copy()
+    fill_caves(filled, heightmaps)
+
+    wx, wy, wz = get_surface_voxel(generated, int(PLAYER_POS.x), int(PLAYER_POS.z))
+    surface = glm.vec3(wx, wy + 3, wz) + 0.5
+    rng = np.random.default_rng(SEED)
+    while True:
+        wx, wz = rng.integers(CHUNK_SIZE, WORLD_W * CHUNK_SIZE - CHUNK_SIZE, 2).tolist()
+        wy = int(rng.integers(CHUNK_SIZE // 2))
+        chunk_index = wx // CHUNK_SIZE + WORLD_W * (wz // CHUNK_SIZE) + WORLD_AREA * (wy // CHUNK_SIZE)
+        voxel_index = wx % CHUNK_SIZE + CHUNK_SIZE * (wz % CHUNK_SIZE) + CHUNK_AREA * (wy % CHUNK_SIZE)
+        if not generated[DENSE_SLOTS[chunk_index], voxel_index]:
+            cave = glm.vec3(wx, wy, wz) + 0.5
+            break
+    column = int(np.argmax(heightmaps.min(axis=1)))  # the column with the deepest ground, to dig the room under
+    room = (glm.vec3(column % WORLD_W, 0, column // WORLD_W) + 0.5) * CHUNK_SIZE
+    room_chunk = filled[DENSE_SLOTS[column]].reshape(CHUNK_SIZE, CHUNK_SIZE, CHUNK_SIZE)
+    room_chunk[H_CHUNK_SIZE - 4: H_CHUNK_SIZE + 4, 4: -4, 4: -4] = 0
+
+    centers = np.array([(glm.vec3(get_chunk_position(chunk_index)) + 0.5) * CHUNK_SIZE for chunk_index in ALL_CHUNKS],
+                       dtype='float32')
+    connectivity = np.empty(WORLD_VOL, dtype='int64')
+    build_connectivity(ALL_CHUNKS[:1], (generated, DENSE_SLOTS), connectivity)
+    ctx = create_headless_context()
+    program = load_program(ctx, 'chunk')
+    scales = np.ones(WORLD_VOL, dtype='int32')
+    positions = np.array([get_chunk_position(chunk_index) for chunk_index in ALL_CHUNKS], dtype='int32')
+
+    for name, voxels, views in (('generated', generated, (('spawn', surface, -60, -15), ('cave', cave, -90, 0))),
+                                ('filled', filled, (('spawn', surface, -60, -15), ('room', room, -90, 0)))):
+        storage = voxels, DENSE_SLOTS
+        connect_time = timed(build_connectivity, ALL_CHUNKS, storage, connectivity)
+        arena, offsets, counts, section_offsets = build_world_meshes(
+            ALL_CHUNKS, positions, scales, storage, WORLD_COLUMNS, 1, INDEXED_QUADS, False
+        )
+        meshes = {chunk_index: (arena[offsets[i]: offsets[i] + counts[i]], section_offsets[i])
+                  for i, chunk_index in enumerate(ALL_CHUNKS) if counts[i]}
+        print(f'occlusion {name}: connectivity of {WORLD_VOL} chunks in {connect_time:.2f}s, '
+              f'{int(np.count_nonzero(connectivity == (1 << 36) - 1))} connect every face pair')
+
+        for view, position, yaw, pitch in views:
+            camera = Camera(position, yaw, pitch)
+            camera.update()
+            visible = camera.frustum.cull(centers)
+            in_frustum = np.zeros(WORLD_VOL, dtype=np.bool_)
+            in_frustum[visible] = True
+            x, y, z = (int(value) for value in position)
+            chunk_index = x // CHUNK_SIZE + WORLD_W * (z // CHUNK_SIZE) + WORLD_AREA * (y // CHUNK_SIZE)
+            voxel_index = x % CHUNK_SIZE + CHUNK_SIZE * (z % CHUNK_SIZE) + CHUNK_AREA * (y % CHUNK_SIZE)
+            walk = (np.array([chunk_index], dtype='int32'), np.array([ANY_FACE]), connectivity, in_frustum,
+                    WORLD_COLUMNS, get_region_faces(voxels[DENSE_SLOTS[chunk_index]], voxel_index,
+                                                    np.zeros(CHUNK_VOL, dtype=np.bool_)))
+            walk_time = min(timed(find_visible_chunks, *walk) for _ in range(10))
+            reached = find_visible_chunks(*walk)
+
+            render_world(ctx, program, {chunk_index: meshes[chunk_index] for chunk_index in meshes}, frames=1,
+                         camera=camera)  # warm up the rasterizer before timing
+            frames = []
+            for culling, chunk_indices in (('frustum', visible), ('occlusion', reached)):
+                drawn = {chunk_index: meshes[chunk_index] for chunk_index in chunk_indices.tolist()
+                         if chunk_index in meshes}
+                frame_time, submitted = render_world(ctx, program, drawn, camera=camera)
+                frames.append(read_frame(ctx))
+                print(f'occlusion {name} {view} {culling}: {len(drawn)} chunks, {submitted} vertices, '
+                      f'frame {frame_time * 1000:.1f}ms')
+            print(f'occlusion {name} {view}: {len(visible) - len(reached)} chunks culled, walk {walk_time * 1000:.3f}ms, '
+                  f'{int(np.count_nonzero((frames[0] != frames[1]).any(axis=2)))} pixels differ')
+
+
+def bench_queries():
+    """
+    Draws the chunks within the frustum through hardware occlusion queries, headless, from a view over
+    the spawn, a view along the ground of the deepest valley and the sealed room of bench_occlusion:
+    samples passed and chunks skipped per frame as read back, frame time against drawing every chunk,
+    and pixels that differ once the queries settle.
+    """
+    heightmaps, generated = build_fixed_world()
+    filled = generated.copy()
+    fill_caves(filled, heightmaps)
+
+    wx, wy, wz = get_surface_voxel(generated, int(PLAYER_POS.x), int(PLAYER_POS.z))
+    surface = glm.vec3(wx, wy + 3, wz) + 0.5
+    column = int(np.argmin(heightmaps.mean(axis=1)))
+    voxel = int(np.argmin(heightmaps[column]))
+    wx = column % WORLD_W * CHUNK_SIZE + voxel % CHUNK_SIZE
+    wz = column // WORLD_W * CHUNK_SIZE + voxel // CHUNK_SIZE
+    valley = glm.vec3(wx, heightmaps[column, voxel] + 2, wz) + 0.5
+    column = int(np.argmax(heightmaps.min(axis=1)))
+    room = (glm.vec3(column % WORLD_W, 0, column // WORLD_W) + 0.5) * CHUNK_SIZE
+    room_chunk = filled[DENSE_SLOTS[column]].reshape(CHUNK_SIZE, CHUNK_SIZE, CHUNK_SIZE)
+    room_chunk[H_CHUNK_SIZE - 4: H_CHUNK_SIZE + 4, 4: -4, 4: -4] = 0
+
+    centers = np.array([(glm.vec3(get_chunk_position(chunk_index)) + 0.5) * CHUNK_SIZE for chunk_index in ALL_CHUNKS],
+                       dtype='float32')
+    ctx = create_headless_context()
+    program = load_program(ctx, 'chunk')
+    box_program = load_program(ctx, 'chunk_box')
+    scales = np.ones(WORLD_VOL, dtype='int32')
+    positions = np.array([get_chunk_position(chunk_index) for chunk_index in ALL_CHUNKS], dtype='int32')
+
+    for name, voxels, views in (('generated', generated, (('spawn', surface, -60, -15), ('valley', valley, 0, 0))),
+                                ('filled', filled, (('room', room, -90, 0),))):
+        arena, offsets, counts, section_offsets = build_world_meshes(
+            ALL_CHUNKS, positions, scales, (voxels, DENSE_SLOTS), WORLD_COLUMNS, 1, INDEXED_QUADS, False
+        )
+        meshes = {chunk_index: (arena[offsets[i]: offsets[i] + counts[i]], section_offsets[i])
+                  for i, chunk_index in enumerate(ALL_CHUNKS) if counts[i]}
+
+        for view, position, yaw, pitch in views:
+            camera = Camera(position, yaw, pitch)
+            camera.update()
+            visible = camera.frustum.cull(centers)
+            drawn = {chunk_index: meshes[chunk_index] for chunk_index in visible.tolist() if chunk_index in meshes}
+            frame_time, submitted = render_world(ctx, program, drawn, camera=camera)
+            expected = read_frame(ctx)
+
+            draws = get_chunk_draws(ctx, program, drawn, INDEXED_QUADS, CULL_FACE_RANGES, camera)
+            queries = OcclusionQueries(ctx, box_program, WORLD_VOL)
+            chunk_indices = np.array(list(drawn), dtype='int32')
+
+            def draw(chunk_index):
+                vao, face_offsets, faces = draws[chunk_index]
+                return render_face_ranges(vao, face_offsets, faces)
+
+            def frame():
+                ctx.clear(color=BG_COLOR)
+                queries.render(chunk_indices, centers, camera.position, draw)
+                ctx.finish()
+
+            for i in range(QUERY_LATENCY + 2):
+                frame()
+                print(f'queries {name} {view} frame {i}: {queries.samples_passed} samples passed, '
+                      f'{queries.skipped_chunks} chunks skipped')
+            query_time = timed(lambda: [frame() for _ in range(10)]) / 10
+            print(f'queries {name} {view}: {len(drawn)} chunks, frame {frame_time * 1000:.1f}ms without queries, '
+                  f'{query_time * 1000:.1f}ms with, '
+                  f'{int(np.count_nonzero((expected != read_frame(ctx)).any(axis=2)))} pixels differ')
+
+
+def measure_overdraw(ctx, draw):
+    """
+    Counts the fragments a frame shades against the pixels it covers, offscreen. A samples-passed query
+    counts the fragments passing the depth test, the ones shaded once early depth testing rejects the rest,
+    and the depth buffer gives the pixels covered.
+
+    Parameters:
+        ctx: The headless context.
+        draw (callable): Draws the frame.
+
+    Returns:
+        tuple: The fragments shaded and the pixels covered.
+    """
+    ctx.clear(color=BG_COLOR)
+    query = ctx.query(samples=True)
+    with query:
+        draw()
+    depth = np.frombuffer(ctx.fbo.read(components=1, attachment=-1, dtype='f4'), dtype='float32')
+    return query.samples, int(np.count_nonzero(depth < 1.0))
+
+
+def bench_order():
+    """
+    Compares drawing the chunks within the frustum in table order, nearest first and farthest first,
+    headless, from a view over the spawn, one from high above and one along the ground of the deepest
+    valley: fragments shaded per pixel covered, and frame time. Also times keeping the draw order sorted
+    while the camera walks, re-sorting last frame's order against sorting from scratch every frame.
+    """
+    heightmaps, voxels = build_fixed_world()
+    wx, wy, wz = get_surface_voxel(voxels, int(PLAYER_POS.x), int(PLAYER_POS.z))
+    surface = glm.vec3(wx, wy + 3, wz) + 0.5
+    column = int(np.argmin(heightmaps.mean(axis=1)))
+    voxel = int(np.argmin(heightmaps[column]))
+    wx = column % WORLD_W * CHUNK_SIZE + voxel % CHUNK_SIZE
+    wz = column // WORLD_W * CHUNK_SIZE + voxel // CHUNK_SIZE
+    valley = glm.vec3(wx, heightmaps[column, voxel] + 2, wz) + 0.5
+
+    centers = np.array([(glm.vec3(get_chunk_position(chunk_index)) + 0.5) * CHUNK_SIZE for chunk_index in ALL_CHUNKS],
+                       dtype='float32')
+    scales = np.ones(WORLD_VOL, dtype='int32')
+    positions = np.array([get_chunk_position(chunk_index) for chunk_index in ALL_CHUNKS], dtype='int32')
+    arena, offsets, counts, section_offsets = build_world_meshes(
+        ALL_CHUNKS, positions, scales, (voxels, DENSE_SLOTS), WORLD_COLUMNS, 1, INDEXED_QUADS, False
+    )
+    meshes = {chunk_index: (arena[offsets[i]: offsets[i] + counts[i]], section_offsets[i])
+              for i, chunk_index in enumerate(ALL_CHUNKS) if counts[i]}
+    ctx = create_headless_context()
+    program = load_program(ctx, 'chunk')
+
+    for view, position, yaw, pitch in (('spawn', surface, -60, -15), ('above', glm.vec3(surface.x, 160, surface.z), -45, -40),
+                                       ('valley', valley, 0, 0)):
+        camera = Camera(position, yaw, pitch)
+        camera.update()
+        visible = camera.frustum.cull(centers)
+        order = ALL_CHUNKS.copy()
+        sort_by_distance(order, centers, tuple(position))
+        selected = np.zeros(WORLD_VOL, dtype=np.bool_)
+        selected[visible] = True
+        nearest = order[selected[order]]
+        for name, chunk_indices in (('table order', visible), ('nearest first', nearest),
+                                    ('farthest first', nearest[::-1])):
+            drawn = {chunk_index: meshes[chunk_index] for chunk_index in chunk_indices.tolist() if chunk_index in meshes}
+            draws = get_chunk_draws(ctx, program, drawn, INDEXED_QUADS, CULL_FACE_RANGES, camera)
+
+            def draw():
+                for vao, face_offsets, faces in draws.values():
+                    render_face_ranges(vao, face_offsets, faces)
+
+            shaded, covered = measure_overdraw(ctx, draw)
+            frame_time, _ = render_world(ctx, program, drawn, camera=camera)
+            print(f'order {view} {name}: {len(drawn)} chunks, {shaded / covered:.2f} fragments shaded per pixel '
+                  f'({shaded} over {covered} pixels), frame {frame_time * 1000:.1f}ms')
+
+    walk = [(surface.x + 0.2 * i, surface.y, surface.z + 0.1 * i) for i in range(500)]
+    order = ALL_CHUNKS.copy()
+    sort_by_distance(order, centers, walk[0])
+    first = timed(sort_by_distance, ALL_CHUNKS.copy(), centers, walk[0])
+    incremental = timed(lambda: [sort_by_distance(order, centers, position) for position in walk]) / len(walk)
+    scratch = timed(lambda: [np.argsort(((centers - position) ** 2).sum(axis=1), kind='stable')
+                             for position in walk]) / len(walk)
+    print(f'order sort of {WORLD_VOL} chunks walking: {incremental * 1e6:.1f}us re-sorting last frame\'s order, '
+          f'{scratch * 1e6:.1f}us argsort from scratch, {first * 1e6:.1f}us from table order')
+
+
+def bench_uniforms():
+    """
+    Counts the driver calls of a frame's chunk pass from the spawn view, headless: draw calls, and uniform
+    uploads with the camera in one uniform block and chunks placed by the chunk origin buffer, against
+    writing the view matrix into each of the 5 programs and a model matrix per chunk. Also times the uploads.
+    """
+    heightmaps, voxels = build_fixed_world()
+    centers = np.array([(glm.vec3(get_chunk_position(chunk_index)) + 0.5) * CHUNK_SIZE for chunk_index in ALL_CHUNKS],
+                       dtype='float32')
+    scales = np.ones(WORLD_VOL, dtype='int32')
+    positions = np.array([get_chunk_position(chunk_index) for chunk_index in ALL_CHUNKS], dtype='int32')
+    arena, offsets, counts, section_offsets = build_world_meshes(
+        ALL_CHUNKS, positions, scales, (voxels, DENSE_SLOTS), WORLD_COLUMNS, 1, INDEXED_QUADS, False
+    )
+    meshes = {chunk_index: (arena[offsets[i]: offsets[i] + counts[i]], section_offsets[i])
+              for i, chunk_index in enumerate(ALL_CHUNKS) if counts[i]}
+    ctx = create_headless_context()
+    program = load_program(ctx, 'chunk')
+    marker = load_program(ctx, 'voxel_marker')  # the one program still placed by a model matrix
+
+    camera = Camera(PLAYER_POS, -90, 0)
+    camera.update()
+    drawn = {chunk_index: meshes[chunk_index] for chunk_index in camera.frustum.cull(centers).tolist()
+             if chunk_index in meshes}
+    draws = get_chunk_draws(ctx, program, drawn, INDEXED_QUADS, CULL_FACE_RANGES, camera)
+    ctx.clear(color=BG_COLOR)
+    draw_calls = 0
+    for vao, face_offsets, faces in draws.values():
+        draw_calls += render_face_ranges(vao, face_offsets, faces)[1]
+    ctx.finish()
+
+    uploads = 100000
+    block = bind_camera(ctx, camera)
+    m_model = glm.mat4()
+    matrix_time = timed(lambda: [marker['m_model'].write(m_model) for _ in range(uploads)]) / uploads
+    block_time = timed(lambda: [block.write(get_camera_data(camera)) for _ in range(uploads)]) / uploads
+    chunks = len(draws)
+    print(f'uniforms spawn: {chunks} chunks, {draw_calls} draw calls')
+    print(f'uniforms per-program matrices: {chunks + 5} uploads, {(chunks + 5) * 64} bytes, '
+          f'{(chunks + 5) * matrix_time * 1e6:.0f}us')
+    print(f'uniforms camera block: 1 upload, 192 bytes, {block_time * 1e6:.0f}us')
+    print(f'uniforms per upload: mat4 {matrix_time * 1e9:.0f}ns, camera block {block_time * 1e9:.0f}ns')
+
+
+BENCHMARKS = {
+    'gen': bench_gen,
+    'noise': bench_noise,
+    'caves': bench_caves,
+    'regions': bench_regions,
+    'journal': bench_journal,
+    'palette': bench_palette,
+    'greedy': bench_greedy,
+    'mesh': bench_mesh,
+    'memory': bench_memory,
+    'indexed': bench_indexed,
+    'faces': bench_faces,
+    'edits': bench_edits,
+    'bulk': bench_bulk,
+    'lod': bench_lod,
+    'cache': bench_cache,
+    'cull': bench_cull,
+    'occlusion': bench_occlusion,
+    'queries': bench_queries,
+    'order': bench_order,
+    'uniforms': bench_uniforms,
+}
+
+if __name__ == '__main__':
+    for name in sys.argv[1:] or BENCHMARKS:
+        BENCHMARKS[name]()
@@ -0,0 +1,333 @@
+from settings import *
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import time
+from terrain_gen import generate_columns
+from voxel_storage import AIR_SLOT, find_uniform_rows, get_chunk_voxels
+from meshes.chunk_mesh_builder import ALL_SECTIONS, build_chunk_mesh, build_greedy_mesh, build_lod_mesh, build_mesh_key
+from mesh_cache import get_cached_mesh
+from occlusion import get_connectivity
+
+# ChunkMesh packs each vertex into a single uint32
+MESH_FORMAT_SIZE = 1
+
+# Job ranks, lower ranks are scheduled first
+EDIT_RANK, VISIBLE_RANK, HIDDEN_RANK = 0, 1, 2
+
+
+def generate_batch(columns, region_store=None):
+    """
+    Generates a batch of chunk columns into standalone arrays. Runs on the generation thread.
+    Columns saved in the region store are loaded instead, and newly generated ones are saved.
+
+    Parameters:
+        columns (list): The (cx, cz) positions of the columns.
+        region_store (RegionStore): The world's region store, if saving is enabled.
+
+    Returns:
+        tuple: The column positions, their [n, CHUNK_AREA] height tiles, their
+        [n, WORLD_H, CHUNK_VOL] voxels and, per chunk, its uniform voxel ID or -1.
+    """
+    saved = [region_store.load_column(cx, cz) if region_store else None for cx, cz in columns]
+    missing = [column for column, data in zip(columns, saved) if data is None]
+
+    generated = np.array(missing, dtype='int32').reshape(-1, 2)
+    heightmaps = np.empty([len(missing), CHUNK_AREA], dtype='int32')
+    voxels = np.zeros([len(missing), WORLD_H, CHUNK_VOL], dtype='uint8')
+    generate_columns(voxels, heightmaps, generated, CAVE_STRIDE)
+
+    rows = np.arange(len(missing) * WORLD_H, dtype='int32')
+    uniform_ids = np.empty(len(rows), dtype='int32')
+    find_uniform_rows(voxels.reshape(-1, CHUNK_VOL), rows, uniform_ids)
+    uniform_ids = uniform_ids.reshape(-1, WORLD_H)
+
+    if region_store:
+        for (cx, cz), heightmap, column_voxels in zip(missing, heightmaps, voxels):
+            region_store.save_column(cx, cz, heightmap, column_voxels)
+
+    loaded = [(column, *data) for column, data in zip(columns, saved) if data is not None]
+    if not loaded:
+        return generated, heightmaps, voxels, uniform_ids
+    return (
+        np.concatenate([generated, np.array([column for column, *_ in loaded], dtype='int32')]),
+        np.concatenate([heightmaps, [data[1] for data in loaded]]),
+        np.concatenate([voxels, [data[2] for data in loaded]]),
+        np.concatenate([uniform_ids, [data[3] for data in loaded]]),
+    )
+
+
+def mesh_chunk(chunk, version, storage, chunk_columns, greedy, sections, scale, connect=False, cache=None):
+    """
+    Builds the vertex data of a chunk from a snapshot of the world tables. Runs on a mesh worker.
+    Whole meshes go through the mesh cache.
+
+    Parameters:
+        chunk (Chunk): The chunk to mesh.
+        version (int): The chunk's mesh version when the job was submitted.
+        storage (tuple): A snapshot of the world voxel storage, see World.get_storage.
+        chunk_columns (ndarray): A copy of the world chunk columns.
+        greedy (bool): Merge faces with the greedy mesher.
+        sections (ndarray): The sorted sections to remesh, None for the whole chunk.
+        scale (int): The chunk's LOD cell edge, see Chunk.lod_scale, meshed whole with build_lod_mesh past 1.
+        connect (bool): Also find the chunk's face connectivity, see get_connectivity.
+        cache (MeshCache): The world's mesh cache, if enabled.
+
+    Returns:
+        tuple: The chunk, the version, the vertex data, the quad offsets of its ranges, the sections
+        and the connectivity, None unless found.
+    """
+    connectivity = get_connectivity(get_chunk_voxels(storage, chunk.index)) if connect else None
+    if scale > 1:
+        def mesher():
+            return build_lod_mesh(
+                get_chunk_voxels(storage, chunk.index), MESH_FORMAT_SIZE, chunk.position, storage, chunk_columns,
+                INDEXED_QUADS, scale
+            )
+    else:
+        def mesher():
+            build = build_greedy_mesh if greedy else build_chunk_mesh
+            return build(
+                chunk_voxels=get_chunk_voxels(storage, chunk.index),
+                format_size=MESH_FORMAT_SIZE,
+                chunk_pos=chunk.position,
+                storage=storage,
+                chunk_columns=chunk_columns,
+                indexed=INDEXED_QUADS,
+                sections=ALL_SECTIONS if sections is None else sections
+            )
+    if sections is not None:
+        return (chunk, version, *mesher(), sections, connectivity)
+    vertex_data, section_offsets = get_cached_mesh(cache, storage, chunk_columns, chunk.index, chunk.position, greedy,
+                                                   scale, mesher)
+    return chunk, version, vertex_data, section_offsets, None, connectivity
+
+
+class ChunkBuilder:
+    """
+    Generates and meshes chunks in the background so the render loop never blocks on them.
+
+    Column generation runs in batches on a single thread that drives the parallel terrain
+    kernels, and meshing runs on BUILD_WORKERS threads through the GIL-free mesher. Neither
+    touches the world: generated columns are installed and finished vertex arrays are
+    uploaded on the main thread in update, the uploads capped by UPLOAD_BUDGET_MS and
+    UPLOAD_BUDGET_BYTES per frame. Pending jobs are kept on the main thread and only a few
+    are in flight at a time, so priorities follow the player: edited chunks first, then
+    chunks in the view frustum, each group nearest first. Edits queue only the sections they
+    touch; the sections requested since a chunk's mesh was last uploaded are remeshed together,
+    since a new request drops the results of jobs in flight.
+    """
+    def __init__(self, world):
+        """
+        Initializes the builder and its worker threads.
+
+        Parameters:
+            world (World): The world whose chunks are built.
+        """
+        self.app = world.app
+        self.world = world
+        self.gen_executor = ThreadPoolExecutor(max_workers=1)
+        self.mesh_executor = ThreadPoolExecutor(max_workers=BUILD_WORKERS)
+
+        self.pending_columns = set()  # Column positions waiting to be generated
+        self.gen_future = None  # The batch being generated
+        self.gen_columns = set()  # Column positions in the batch being generated
+
+        self.pending_meshes = {}  # Chunk -> rank, chunks waiting to be meshed
+        self.mesh_sections = {}  # Chunk -> set of sections to remesh, None for the whole chunk, until uploaded
+        self.mesh_futures = []  # (storage epoch, future) of mesh jobs in flight
+        self.uploads = deque()  # Finished mesh_chunk results waiting for the GPU
+        self.warm_up()
+
+    def warm_up(self):
+        """
+        Compiles the kernels and starts the parallel runtime on the main thread before any job
+        is submitted. Compiling holds the GIL wherever it happens, and starting the threading
+        layer from a worker thread can hang interpreter shutdown.
+        """
+        generate_batch([])
+        world = self.world
+        for mesher in (build_chunk_mesh, build_greedy_mesh):
+            for sections in (ALL_SECTIONS, ALL_SECTIONS[:1]):
+                mesher(world.voxels[AIR_SLOT], MESH_FORMAT_SIZE, (0, 0, 0), world.get_storage(), world.chunk_columns,
+                       INDEXED_QUADS, sections)
+        build_lod_mesh(world.voxels[AIR_SLOT], MESH_FORMAT_SIZE, (0, 0, 0), world.get_storage(), world.chunk_columns,
+                       INDEXED_QUADS, 2)
+        build_mesh_key(world.get_storage(), 0, (0, 0, 0), world.chunk_columns, 1, 0)
+        get_connectivity(world.voxels[AIR_SLOT])
+
+    @property
+    def is_idle(self):
+        """Indicates if no generation, meshing or upload work is left."""
+        return not (self.pending_columns or self.gen_future or self.pending_meshes
+                    or self.mesh_futures or self.uploads)
+
+    def shutdown(self):
+        """Drops pending jobs and waits for the worker threads to finish the ones in flight."""
+        self.pending_columns.clear()
+        self.pending_meshes.clear()
+        self.mesh_sections.clear()
+        self.gen_executor.shutdown(wait=True, cancel_futures=True)
+        self.mesh_executor.shutdown(wait=True, cancel_futures=True)
+
+    def request_columns(self, columns):
+        """
+        Queues chunk columns for background generation.
+
+        Parameters:
+            columns (list): The (cx, cz) positions of the columns.
+        """
+        self.pending_columns.update(column for column in columns if column not in self.gen_columns)
+
+    def request_mesh(self, chunk, rank=None, sections=None):
+        """
+        Queues a chunk for background meshing. Results of jobs already in flight for the
+        chunk become stale and are dropped, their sections joining the new request.
+
+        Parameters:
+            chunk (Chunk): The chunk to mesh.
+            rank (int): EDIT_RANK to jump the queue, otherwise ranked by visibility.
+            sections (list): The sections to remesh, None for the whole chunk.
+        """
+        chunk.mesh_version += 1
+        if rank is None:
+            rank = VISIBLE_RANK
+        self.pending_meshes[chunk] = min(rank, self.pending_meshes.get(chunk, rank))
+        requested = self.mesh_sections.get(chunk, set())
+        self.mesh_sections[chunk] = None if sections is None or requested is None else requested.union(sections)
+
+    def update(self):
+        """Installs generated columns, schedules pending jobs and uploads finished meshes within budget."""
+        self.collect_columns()
+        self.schedule_columns()
+        self.collect_meshes()
+        self.schedule_meshes()
+        self.upload_meshes()
+
+    def get_priority(self, center, rank):
+        """
+        Returns the scheduling key of a job.
+
+        Parameters:
+            center (glm.vec3): The center of the chunk or column.
+            rank (int): The job rank; anything but edits is ranked by frustum visibility.
+
+        Returns:
+            tuple: The rank and the distance to the player, lower is sooner.
+        """
+        player = self.app.player
+        if rank != EDIT_RANK:
+            rank = VISIBLE_RANK if player.frustum.is_sphere_on_frustum(center) else HIDDEN_RANK
+        return rank, glm.length(center - player.position)
+
+    def collect_columns(self):
+        """Installs the generated batch into the world and queues meshes for the chunks it completes."""
+        if self.gen_future is None or not self.gen_future.done():
+            return None
+        columns, heightmaps, voxels, uniform_ids = self.gen_future.result()
+        self.gen_future = None
+        self.gen_columns = set()
+
+        ready = set()
+        for (cx, cz), heightmap, column_voxels, column_ids in zip(columns.tolist(), heightmaps, voxels, uniform_ids):
+            if not self.world.is_column_wanted(cx, cz) or self.world.is_column_loaded(cx, cz):
+                continue
+            self.world.add_column(cx, cz, heightmap, column_voxels, column_ids)
+            ready.update((x, z) for x in range(cx - 1, cx + 2) for z in range(cz - 1, cz + 2))
+
+        for cx, cz in ready:
+            if self.world.is_column_ready(cx, cz):
+                for y in range(WORLD_H):
+                    self.request_mesh(self.world.get_chunk(cx, y, cz))
+
+    def schedule_columns(self):
+        """Starts generating the most urgent pending columns when the generation thread is free."""
+        if self.gen_future is not None:
+            return None
+        world = self.world
+        self.pending_columns = {(cx, cz) for cx, cz in self.pending_columns
+                                if world.is_column_wanted(cx, cz) and not world.is_column_loaded(cx, cz)}
+        if not self.pending_columns:
+            return None
+
+        batch = sorted(self.pending_columns, key=lambda column: self.get_priority(
+            glm.vec3(column[0] + 0.5, 0, column[1] + 0.5) * CHUNK_SIZE + glm.vec3(0, CENTER_Y, 0), HIDDEN_RANK
+        ))[:GEN_BATCH]
+        self.pending_columns.difference_update(batch)
+        self.gen_columns = set(batch)
+        self.gen_future = self.gen_executor.submit(generate_batch, batch, self.world.region_store)
+
+    def collect_meshes(self):
+        """Moves the results of finished mesh jobs onto the upload queue."""
+        running = []
+        for epoch, future in self.mesh_futures:
+            if future.done():
+                self.uploads.append(future.result())
+            else:
+                running.append((epoch, future))
+        self.mesh_futures = running
+        self.world.recycle_slots(min((epoch for epoch, _ in running), default=self.world.storage_epoch + 1))
+
+    def schedule_meshes(self):
+        """
+        Submits the most urgent pending meshes while fewer than two jobs per worker are in flight.
+        Chunks with nothing to draw get their mesh cleared right away instead.
+        """
+        free = 2 * BUILD_WORKERS - len(self.mesh_futures)
+        if free <= 0 or not self.pending_meshes:
+            return None
+
+        world = self.world
+        chunks = sorted(self.pending_meshes, key=lambda chunk: self.get_priority(chunk.center, self.pending_meshes[chunk]))
+        storage, chunk_columns = world.get_storage(copy=True), world.chunk_columns.copy()
+        epoch = world.storage_epoch
+        for chunk in chunks:
+            if free == 0:
+                break
+            del self.pending_meshes[chunk]
+            if world.chunks[chunk.index] is not chunk:
+                self.mesh_sections.pop(chunk, None)
+                continue  # unloaded while waiting
+            if chunk.is_empty or chunk.is_buried():
+                self.mesh_sections.pop(chunk, None)
+                chunk.update_connectivity()
+                chunk.drop_mesh()
+                continue
+            sections = self.mesh_sections.get(chunk)
+            if sections is not None and chunk.mesh is not None and not chunk.lod:
+                sections = np.array(sorted(sections), dtype='int32')
+            else:
+                sections = None  # no mesh to update the sections of
+            self.mesh_futures.append((epoch, self.mesh_executor.submit(
+                mesh_chunk, chunk, chunk.mesh_version, storage, chunk_columns, world.greedy_meshing, sections,
+                chunk.lod_scale, OCCLUSION_CULLING and chunk.connectivity_stale, world.mesh_cache
+            )))
+            free -= 1
+
+    def upload_meshes(self):
+        """
+        Uploads finished meshes to the GPU while the per-frame time and byte budgets allow. Both are
+        checked before each upload, so a mesh that would overrun the byte budget waits for the next
+        frame, unless it is the frame's first and larger than the budget on its own.
+        """
+        start = time.perf_counter()
+        uploaded = 0
+        while self.uploads:
+            chunk, version, vertex_data, section_offsets, sections, connectivity = self.uploads[0]
+            if self.world.chunks[chunk.index] is not chunk:
+                self.uploads.popleft()
+                self.mesh_sections.pop(chunk, None)
+                continue  # unloaded
+            if version != chunk.mesh_version:
+                self.uploads.popleft()
+                continue  # superseded by a newer request
+            if (time.perf_counter() - start) * 1000 >= UPLOAD_BUDGET_MS:
+                break
+            if uploaded and uploaded + vertex_data.nbytes > UPLOAD_BUDGET_BYTES:
+                break
+            self.uploads.popleft()
+            self.mesh_sections.pop(chunk, None)
+            if connectivity is not None:
+                self.world.chunk_connectivity[chunk.index] = connectivity
+                chunk.connectivity_stale = False
+            chunk.set_mesh(vertex_data, section_offsets, sections)
+            uploaded += vertex_data.nbytes
@@ -0,0 +1,223 @@
+from settings import *
+from concurrent.futures import ThreadPoolExecutor
+import struct
+import time
+
+# Journal file layout: a header, then fixed-size edit records appended in edit order.
+# Replaying the records in order, later edits of a voxel overriding earlier ones,
+# gives the edits to apply over the generated terrain.
+JOURNAL_MAGIC = b'VXEJ'
+JOURNAL_VERSION = 1
+HEADER = struct.Struct('<4sHH')
+RECORD = np.dtype([('cx', '<i4'), ('cy', '<i4'), ('cz', '<i4'), ('index', '<u4'), ('voxel_id', 'u1')])
+
+EMPTY_INDICES = np.empty(0, dtype='int32')
+EMPTY_IDS = np.empty(0, dtype='uint8')
+
+
+def write_journal(path, records):
+    """
+    Writes a complete journal file. Runs on the compaction thread.
+
+    Parameters:
+        path (str): The file path.
+        records (ndarray): The RECORD array to write.
+    """
+    with open(path, 'wb') as file:
+        file.write(EditJournal.get_header())
+        file.write(records.tobytes())
+        file.flush()
+        os.fsync(file.fileno())
+
+
+class EditJournal:
+    """
+    Records voxel edits as sparse per-chunk deltas over the seed-generated terrain.
+
+    Each edited chunk keeps its edits as two compact arrays, sorted voxel indices and
+    their voxel IDs, and every edit is appended to the journal file as it happens, so a
+    save costs one small write. Appended edits are flushed at once, surviving a crash of the
+    engine, and synced to disk at most JOURNAL_SYNC_INTERVAL seconds later, or on close,
+    surviving a crash of the system. Once overwritten records make up most of the file, it is
+    rewritten with one record per live edit on a background thread; edits made meanwhile
+    are appended to the new file before it replaces the old one. Loaded and regenerated
+    chunks get their delta replayed over them.
+    """
+    def __init__(self, path=None):
+        """
+        Opens the journal, replaying the edits saved in it.
+
+        Parameters:
+            path (str): The journal file path, or None to keep the edits in memory only.
+        """
+        self.path = path
+        self.deltas = {}  # Chunk position -> (voxel indices, voxel IDs)
+        self.live = 0  # Number of edited voxels
+        self.records = 0  # Number of records in the journal file
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.compaction = None  # The compaction in progress
+        self.compaction_edits = []  # Records appended while compacting
+        self.compacted_records = 0  # Number of records in the compacted file
+        self.unsynced = False  # Edits were appended since the file was last synced to disk
+        self.sync_time = time.monotonic()
+        self.file = None
+        if path is not None:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self.load()
+            self.file = open(path, 'ab')
+
+    @staticmethod
+    def get_header():
+        """Returns the header written by this version of the engine."""
+        return HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION, CHUNK_SIZE)
+
+    def load(self):
+        """Replays the journal file into the deltas, starting a new file if it is missing or from another layout."""
+        data = b''
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as file:
+                data = file.read()
+        if data[:HEADER.size] != self.get_header():
+            write_journal(self.path, np.empty(0, dtype=RECORD))
+            return None
+
+        # drop a record torn by a crash mid-write
+        count = (len(data) - HEADER.size) // RECORD.itemsize
+        records = np.frombuffer(data, dtype=RECORD, count=count, offset=HEADER.size)
+        self.set_deltas(records)
+        self.records = count
+        if len(data) != HEADER.size + count * RECORD.itemsize:
+            write_journal(self.path, records)
+
+    def get_delta(self, position):
+        """
+        Returns the edits of a chunk.
+
+        Parameters:
+            position (tuple): The chunk position in chunk coordinates.
+
+        Returns:
+            tuple: The sorted voxel indices and their voxel IDs, or None if the chunk was never edited.
+        """
+        return self.deltas.get(position)
+
+    def set_delta(self, position, voxel_index, voxel_id):
+        """
+        Sets one voxel of a chunk's delta.
+
+        Parameters:
+            position (tuple): The chunk position in chunk coordinates.
+            voxel_index (int): The voxel index within the chunk.
+            voxel_id (int): The new voxel ID.
+        """
+        indices, ids = self.deltas.get(position, (EMPTY_INDICES, EMPTY_IDS))
+        i = np.searchsorted(indices, voxel_index)
+        if i < len(indices) and indices[i] == voxel_index:
+            ids[i] = voxel_id
+            return None
+        self.deltas[position] = np.insert(indices, i, voxel_index), np.insert(ids, i, voxel_id)
+        self.live += 1
+
+    def set_deltas(self, records):
+        """
+        Rebuilds the deltas from journal records, later records of a voxel overriding earlier ones.
+
+        Parameters:
+            records (ndarray): The RECORD array, in edit order.
+        """
+        if not len(records):
+            return None
+        # sort by chunk and voxel, keeping edit order among records of the same voxel
+        order = np.lexsort((np.arange(len(records)), records['index'], records['cz'], records['cy'], records['cx']))
+        records = records[order]
+        keys = np.stack([records['cx'], records['cy'], records['cz'], records['index'].astype('int32')], axis=1)
+        last = np.ones(len(records), dtype=bool)
+        last[:-1] = (keys[1:] != keys[:-1]).any(axis=1)
+        records = records[last]
+
+        chunk_starts = np.flatnonzero(np.r_[True, (keys[last][1:, :3] != keys[last][:-1, :3]).any(axis=1)])
+        for start, end in zip(chunk_starts, np.r_[chunk_starts[1:], len(records)]):
+            cx, cy, cz = records[start]['cx'], records[start]['cy'], records[start]['cz']
+            self.deltas[int(cx), int(cy), int(cz)] = (records['index'][start:end].astype('int32'),
+                                                      records['voxel_id'][start:end].copy())
+        self.live = len(records)
+
+    def record(self, position, voxel_index, voxel_id):
+        """
+        Records an edit in the chunk's delta and appends it to the journal file.
+
+        Parameters:
+            position (tuple): The chunk position in chunk coordinates.
+            voxel_index (int): The voxel index within the chunk.
+            voxel_id (int): The new voxel ID.
+        """
+        self.set_delta(position, voxel_index, voxel_id)
+        if self.file is None:
+            return None
+        record = np.array([(*position, voxel_index, voxel_id)], dtype=RECORD).tobytes()
+        self.file.write(record)
+        self.file.flush()
+        self.unsynced = True
+        self.records += 1
+        if self.compaction is not None:
+            self.compaction_edits.append(record)
+
+    def get_records(self):
+        """Returns one RECORD per live edit."""
+        records = np.empty(self.live, dtype=RECORD)
+        start = 0
+        for (cx, cy, cz), (indices, ids) in self.deltas.items():
+            chunk_records = records[start: start + len(indices)]
+            chunk_records['cx'], chunk_records['cy'], chunk_records['cz'] = cx, cy, cz
+            chunk_records['index'], chunk_records['voxel_id'] = indices, ids
+            start += len(indices)
+        return records
+
+    def sync(self):
+        """Syncs the appended edits to disk."""
+        if self.unsynced:
+            os.fsync(self.file.fileno())
+            self.unsynced = False
+        self.sync_time = time.monotonic()
+
+    def update(self):
+        """
+        Syncs the edits once JOURNAL_SYNC_INTERVAL has passed, then swaps in a finished compaction,
+        or starts one once overwritten records dominate the file.
+        """
+        if self.file is None:
+            return None
+        if self.unsynced and time.monotonic() - self.sync_time >= JOURNAL_SYNC_INTERVAL:
+            self.sync()
+        if self.compaction is not None:
+            if self.compaction.done():
+                self.finish_compaction()
+        elif self.records > JOURNAL_COMPACT_RATIO * max(self.live, JOURNAL_MIN_RECORDS):
+            records = self.get_records()
+            self.compaction = self.executor.submit(write_journal, f'{self.path}.tmp', records)
+            self.compaction_edits = []
+            self.compacted_records = len(records)
+
+    def finish_compaction(self):
+        """Appends the edits made while compacting to the compacted file and replaces the journal with it."""
+        self.compaction.result()
+        self.compaction = None
+        with open(f'{self.path}.tmp', 'ab') as file:
+            file.write(b''.join(self.compaction_edits))
+            file.flush()
+            os.fsync(file.fileno())
+        self.file.close()
+        self.unsynced = False
+        os.replace(f'{self.path}.tmp', self.path)
+        self.file = open(self.path, 'ab')
+        self.records = self.compacted_records + len(self.compaction_edits)
+        self.compaction_edits = []
+
+    def close(self):
+        """Waits for a running compaction and closes the journal file."""
+        if self.compaction is not None:
+            self.finish_compaction()
+        self.executor.shutdown()
+        if self.file is not None:
+            self.sync()
+            self.file.close()
@@ -0,0 +1,116 @@
+from settings import *
+import types
+import moderngl as mgl
+from terrain_gen import build_heightmap, generate_chunks
+from voxel_storage import UNIFORM_ROWS, create_pool, find_uniform_rows, get_chunk_voxels
+from meshes.chunk_mesh_builder import ALL_SECTIONS, build_chunk_mesh
+from textures import Textures
+from shader_program import CAMERA_BINDING, get_camera_data
+
+# The fixed world the benchmarks and tests run on: every column of the chunk table generated at once,
+# without a World, and every chunk given its own dense pool row, in chunk index order
+DENSE_SLOTS = np.arange(UNIFORM_ROWS, UNIFORM_ROWS + WORLD_VOL, dtype='int32')
+ALL_CHUNKS = np.arange(WORLD_VOL, dtype='int32')
+# The fixed world loads column (x, z) into table column x + WORLD_W * z
+WORLD_COLUMNS = np.array([(x, z) for z in range(WORLD_D) for x in range(WORLD_W)], dtype='int32')
+
+
+def build_world_heightmaps():
+    """Builds the column height tiles of the whole world, as World.build_heightmaps does."""
+    heightmaps = np.empty([WORLD_AREA, CHUNK_AREA], dtype='int32')
+    for x in range(WORLD_W):
+        for z in range(WORLD_D):
+            build_heightmap(heightmaps[x + WORLD_W * z], x * CHUNK_SIZE, z * CHUNK_SIZE)
+    return heightmaps
+
+
+def generate_world(voxels, heightmaps, cave_stride):
+    """Generates every chunk of the fixed world with the parallel generate_chunks kernel."""
+    generate_chunks(voxels, heightmaps, WORLD_COLUMNS, DENSE_SLOTS, ALL_CHUNKS, cave_stride)
+
+
+def build_fixed_world(cave_stride=CAVE_STRIDE):
+    """
+    Generates the fixed world.
+
+    Parameters:
+        cave_stride (int): The cave density sampling stride, see CAVE_STRIDE.
+
+    Returns:
+        tuple: The column height tiles and the voxel pool, one dense row per chunk, see DENSE_SLOTS.
+    """
+    heightmaps = build_world_heightmaps()
+    voxels = create_pool(WORLD_VOL)
+    generate_world(voxels, heightmaps, cave_stride)
+    return heightmaps, voxels
+
+
+def get_mixed_chunks(voxels):
+    """Returns the chunk indices of the fixed world whose voxels are not all the same."""
+    uniform_ids = np.empty(WORLD_VOL, dtype='int32')
+    find_uniform_rows(voxels, DENSE_SLOTS, uniform_ids)
+    return ALL_CHUNKS[uniform_ids == -1]
+
+
+def get_chunk_position(chunk_index):
+    """Returns the (x, y, z) chunk position of a chunk of the fixed world."""
+    chunk_index = int(chunk_index)
+    return chunk_index % WORLD_W, chunk_index // WORLD_AREA, chunk_index // WORLD_W % WORLD_D
+
+
+def mesh_world(storage, chunk_indices, mesher=build_chunk_mesh, indexed=INDEXED_QUADS):
+    """
+    Meshes the given chunks of the fixed world from a voxel storage.
+
+    Returns:
+        dict: The vertex data and range quad offsets of each chunk index.
+    """
+    return {chunk_index: mesher(get_chunk_voxels(storage, chunk_index), 1, get_chunk_position(chunk_index),
+                                storage, WORLD_COLUMNS, indexed, ALL_SECTIONS)
+            for chunk_index in chunk_indices}
+
+
+def get_quad_count(meshes, indexed=INDEXED_QUADS):
+    """Returns the number of face quads in meshes built by mesh_world."""
+    return sum(int(section_offsets[-1]) for _, section_offsets in meshes.values())
+
+
+def get_vertex_bytes(meshes):
+    """Returns the size of the vertex data of meshes built by mesh_world."""
+    return sum(vertex_data.nbytes for vertex_data, _ in meshes.values())
+
+
+def create_headless_context():
+    """
+    Creates an offscreen OpenGL context drawing into a window-sized framebuffer, with the game
+    textures bound, for GPU benchmarks.
+    """
+    ctx = mgl.create_context(standalone=True, backend='egl', require=MAJOR_VER * 100 + MINOR_VER * 10)
+    ctx.simple_framebuffer((int(WIN_RES.x), int(WIN_RES.y))).use()
+    ctx.enable(flags=mgl.DEPTH_TEST | mgl.CULL_FACE)
+    textures = Textures(types.SimpleNamespace(ctx=ctx))
+    textures.texture_array_0.anisotropy = 1.0  # software rasterizers filter anisotropically very slowly
+    return ctx
+
+
+def read_frame(ctx):
+    """Returns the RGB pixels of the headless framebuffer."""
+    return np.frombuffer(ctx.fbo.read(components=3), dtype='uint8').reshape(int(WIN_RES.y), int(WIN_RES.x), 3)
+
+
+def load_program(ctx, shader_name):
+    """Compiles a shader program from the shaders directory, as ShaderProgram.get_program does."""
+    with open(f'shaders/{shader_name}.vert') as file:
+        vertex_shader = file.read()
+    with open(f'shaders/{shader_name}.frag') as file:
+        fragment_shader = file.read()
+    program = ctx.program(vertex_shader=vertex_shader, fragment_shader=fragment_shader)
+    program['Camera'].binding = CAMERA_BINDING
+    return program
+
+
+def bind_camera(ctx, camera):
+    """Uploads a camera into a Camera uniform block buffer and binds it, as ShaderProgram does."""
+    block = ctx.buffer(get_camera_data(camera))
+    block.bind_to_uniform_block(CAMERA_BINDING)
+    return block
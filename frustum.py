@@ -1,5 +1,73 @@
 from settings import *
 
+@njit
+def cull_spheres(centers, radius, position, forward, up, right, factor_x, tan_x, factor_y, tan_y):
+    """
+    Tests many bounding spheres against the view frustum at once, see Frustum.is_sphere_on_frustum.
+
+    Parameters:
+        centers (np.array): The [n, 3] sphere centers; rows holding NaN are never visible.
+        radius (float): The sphere radius.
+        position, forward, up, right (tuple): The camera position and basis.
+        factor_x, tan_x, factor_y, tan_y (float): The precomputed frustum factors.
+
+    Returns:
+        np.array: The indices of the visible spheres, in order.
+    """
+    visible = np.empty(len(centers), dtype=np.int32)
+    count = 0
+    for i in range(len(centers)):
+        vx = centers[i, 0] - position[0]
+        vy = centers[i, 1] - position[1]
+        vz = centers[i, 2] - position[2]
+
+        sz = vx * forward[0] + vy * forward[1] + vz * forward[2]
+        if not (NEAR - radius <= sz <= FAR + radius):
+            continue
+
+        sy = vx * up[0] + vy * up[1] + vz * up[2]
+        dist = factor_y * radius + sz * tan_y
+        if not (-dist <= sy <= dist):
+            continue
+
+        sx = vx * right[0] + vy * right[1] + vz * right[2]
+        dist = factor_x * radius + sz * tan_x
+        if not (-dist <= sx <= dist):
+            continue
+
+        visible[count] = i
+        count += 1
+    return visible[:count]
+
+@njit
+def sort_by_distance(order, centers, position):
+    """
+    Sorts chunk indices nearest first by the distance of their centers from the camera, in place.
+    Uses an insertion sort: the order sorted for the last frame barely changes as the camera moves,
+    so it is nearly sorted already and the sort runs in about linear time.
+
+    Parameters:
+        order (np.array): Every index of the center table, as sorted last frame.
+        centers (np.array): The [n, 3] chunk centers; rows holding NaN sort last.
+        position (tuple): The camera position.
+    """
+    distances = np.empty(len(centers), dtype=np.float32)
+    for i in range(len(centers)):
+        dx = centers[i, 0] - position[0]
+        dy = centers[i, 1] - position[1]
+        dz = centers[i, 2] - position[2]
+        distance = dx * dx + dy * dy + dz * dz
+        distances[i] = distance if distance == distance else np.inf
+
+    for i in range(1, len(order)):
+        index = order[i]
+        distance = distances[index]
+        j = i - 1
+        while j >= 0 and distances[order[j]] > distance:
+            order[j + 1] = order[j]
+            j -= 1
+        order[j + 1] = index
+
 class Frustum:
     """
     Implements frustum culling for chunk visibility optimization. 
@@ -32,7 +100,19 @@ class Frustum:
         Returns:
             bool: True if the chunk is visible, False otherwise.
         """
-        sphere_vec = chunk.center - self.cam.position  # Vector from camera to chunk center
+        return self.is_sphere_on_frustum(chunk.center)
+
+    def is_sphere_on_frustum(self, center):
+        """
+        Checks if a chunk-sized bounding sphere is within the camera's view frustum.
+
+        Parameters:
+            center (glm.vec3): The center of the sphere.
+
+        Returns:
+            bool: True if the sphere is visible, False otherwise.
+        """
+        sphere_vec = center - self.cam.position  # Vector from camera to sphere center
 
         # Check if chunk is within the near and far planes
         sz = glm.dot(sphere_vec, self.cam.forward)
@@ -52,3 +132,17 @@ class Frustum:
             return False
 
         return True  # Chunk is within the frustum
+
+    def cull(self, centers):
+        """
+        Finds the chunks within the camera's view frustum in a single call.
+
+        Parameters:
+            centers (np.array): The [n, 3] chunk centers; rows holding NaN are never visible.
+
+        Returns:
+            np.array: The indices of the visible chunks, in order.
+        """
+        cam = self.cam
+        return cull_spheres(centers, CHUNK_SPHERE_RADIUS, tuple(cam.position), tuple(cam.forward), tuple(cam.up),
+                            tuple(cam.right), self.factor_x, self.tan_x, self.factor_y, self.tan_y)
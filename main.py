@@ -28,6 +28,7 @@ class VoxelEngine:
         self.clock = pg.time.Clock()
         self.delta_time = 0 # Time between frames
         self.time = 0 # Elapsed time in seconds
+        self.caption_time = -CAPTION_INTERVAL # Time the window caption was last refreshed
 
         # Lock mouse to window and hide cursor
         pg.event.set_grab(True)
@@ -52,7 +53,24 @@ class VoxelEngine:
         # Update timing values
         self.delta_time = self.clock.tick(FPS) # Limit FPS and get frame duration
         self.time = pg.time.get_ticks() * 0.001 # Get elapsed time in seconds
-        pg.display.set_caption(f'{self.clock.get_fps() :.0f}') # Update window title with FPS
+        if self.time - self.caption_time >= CAPTION_INTERVAL:
+            self.caption_time = self.time
+            self.update_caption()
+
+    def update_caption(self):
+        """
+        Updates the window title with FPS, the mesher's triangle count and the vertices, chunks, draw calls
+        and uniform uploads of the chunks drawn last frame. Counting triangles visits every chunk, so the
+        title is only refreshed every CAPTION_INTERVAL seconds.
+        """
+        world = self.scene.world
+        mesher = 'greedy' if world.greedy_meshing else 'per-voxel'
+        pg.display.set_caption(f'{self.clock.get_fps() :.0f} | {mesher} meshing, {world.get_triangle_count()} triangles, '
+                               f'{world.submitted_vertices} vertices drawn, {world.drawn_chunks} chunks drawn, '
+                               f'{world.draw_calls} draw calls, {world.uniform_uploads} uniform uploads, '
+                               f'{world.occluded_chunks} occluded'
+                               + (f', {world.queries.skipped_chunks} skipped by queries, '
+                                  f'{world.queries.samples_passed} samples passed' if world.queries is not None else ''))
 
     def render(self):
         """Clears the screen and renders the scene."""
@@ -74,7 +92,8 @@ class VoxelEngine:
             self.update()
             self.render()
 
-        # Clean up resources and exit
+        # Save the world, clean up resources and exit
+        self.scene.world.save()
         pg.quit()
         sys.exit()
 
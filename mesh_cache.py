@@ -0,0 +1,239 @@
+from settings import *
+import mmap
+import threading
+from collections import OrderedDict
+from meshes.chunk_mesh_builder import CHUNK_SECTIONS, build_mesh_key, get_mesher_salt
+
+# Cache layout:
+#   meshes.bin: appended vertex data, read through a memory map so hits are never copied
+#   meshes.index.npy: one ENTRY record per cached mesh, oldest use first, written on open,
+#       on close and whenever the data file is compacted
+#   meshes.log: a layout header, then the ENTRY record of every mesh added since the index
+#       was written, appended as each mesh is, so a crash loses no finished entry
+# Meshes are keyed by build_mesh_key, which hashes everything a mesh is built from, so
+# entries never go stale; edited chunks just miss and the old meshes age out of the LRU.
+DATA_FILE = 'meshes.bin'
+INDEX_FILE = 'meshes.index.npy'
+LOG_FILE = 'meshes.log'
+ENTRY = np.dtype([
+    ('key', '<u8', 2),
+    ('offset', '<i8'),  # Byte offset of the vertex data in the data file
+    ('size', '<i8'),  # Byte size of the vertex data
+    ('section_offsets', '<i4', 6 * CHUNK_SECTIONS + 1),
+])
+LOG_HEADER = f'{ENTRY.descr}\n'.encode()
+
+
+def get_cached_mesh(cache, storage, chunk_columns, chunk_index, chunk_pos, greedy, scale, mesher):
+    """
+    Returns the whole mesh of a chunk from a mesh cache, building and caching it on a miss.
+
+    Parameters:
+        cache (MeshCache): The cache, None to always build the mesh.
+        storage (tuple): The world voxel storage, see voxel_storage.read_voxel.
+        chunk_columns (ndarray): The column position held by each chunk table column.
+        chunk_index (int): The chunk table index.
+        chunk_pos (tuple): The chunk position in chunk coordinates.
+        greedy (bool): The world meshes with the greedy mesher.
+        scale (int): The chunk's LOD cell edge, see Chunk.lod_scale.
+        mesher (callable): Builds the mesh when it is not cached.
+
+    Returns:
+        tuple: The vertex data and the quad offsets of its ranges.
+    """
+    if cache is None:
+        return mesher()
+    key = build_mesh_key(storage, chunk_index, chunk_pos, chunk_columns, scale,
+                         get_mesher_salt(greedy, scale, INDEXED_QUADS))
+    key = tuple(key.tolist())
+    mesh = cache.get(key)
+    if mesh is None:
+        mesh = mesher()
+        cache.put(key, *mesh)
+    return mesh
+
+
+class MeshCache:
+    """
+    Keeps whole chunk meshes on disk across launches, keyed by a hash of the voxels they are
+    built from, so unchanged chunks skip meshing. Vertex data is appended to one data file and
+    hits are returned as views of its memory map, uploaded straight from the mapped pages.
+    Entries past max_bytes are evicted least recently used first and left as dead space, until
+    the dead space outgrows max_bytes and the file is compacted. New entries are appended to
+    the log as they are cached, and the log is folded into the index on open, close and
+    compaction. All access is serialized so the mesh workers and the main thread can share the cache.
+    """
+    def __init__(self, path=SAVE_DIR, max_bytes=MESH_CACHE_BYTES):
+        """
+        Opens the cache, merging the log into the index. Starts empty if the index is missing or
+        was written with another layout.
+
+        Parameters:
+            path (str): The directory holding the cache files.
+            max_bytes (int): The most vertex data kept.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # Key to (offset, size, section_offsets), least recently used first
+        self.live = 0  # Bytes held by entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.map = None
+        self.log = None
+        os.makedirs(path, exist_ok=True)
+
+        data_path = os.path.join(path, DATA_FILE)
+        size = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+        for entry in np.concatenate([self.load_index(), self.load_log()]):
+            key = tuple(entry['key'].tolist())
+            if key in self.entries:
+                self.entries.move_to_end(key)
+            elif entry['offset'] + entry['size'] <= size:
+                self.entries[key] = (int(entry['offset']), int(entry['size']), entry['section_offsets'].copy())
+                self.live += int(entry['size'])
+        self.file = open(data_path, 'r+b' if size else 'w+b')
+        self.end = size  # Bytes written to the data file
+        self.evict()
+        self.save_index()
+
+    def load_index(self):
+        """Returns the saved index entries, none if the index is missing or has another layout."""
+        index_path = os.path.join(self.path, INDEX_FILE)
+        if not os.path.exists(index_path):
+            return np.empty(0, dtype=ENTRY)
+        try:
+            index = np.load(index_path)
+        except (OSError, ValueError):
+            return np.empty(0, dtype=ENTRY)
+        return index if index.dtype == ENTRY else np.empty(0, dtype=ENTRY)
+
+    def load_log(self):
+        """Returns the logged entries, none if the log is missing or has another layout; a torn last record is dropped."""
+        log_path = os.path.join(self.path, LOG_FILE)
+        if not os.path.exists(log_path):
+            return np.empty(0, dtype=ENTRY)
+        with open(log_path, 'rb') as file:
+            data = file.read()
+        if not data.startswith(LOG_HEADER):
+            return np.empty(0, dtype=ENTRY)
+        count = (len(data) - len(LOG_HEADER)) // ENTRY.itemsize
+        return np.frombuffer(data, dtype=ENTRY, count=count, offset=len(LOG_HEADER))
+
+    def get(self, key):
+        """
+        Looks up a mesh, marking it as the most recently used.
+
+        Parameters:
+            key (tuple): The two lanes of the mesh key, see build_mesh_key.
+
+        Returns:
+            tuple: A read-only view of the vertex data and the quad offsets of its ranges, or None on a miss.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            offset, size, section_offsets = entry
+            if not size:
+                return np.empty(0, dtype='uint32'), section_offsets
+            if self.map is None or offset + size > len(self.map):
+                # remap to cover data appended since; views of the old map keep it alive
+                self.file.flush()
+                self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            return np.frombuffer(self.map, dtype='uint32', count=size // 4, offset=offset), section_offsets
+
+    def put(self, key, vertex_data, section_offsets):
+        """
+        Stores a mesh as the most recently used and logs it, evicting the least recently used past
+        max_bytes and compacting the data file once its dead space outgrows max_bytes.
+
+        Parameters:
+            key (tuple): The two lanes of the mesh key, see build_mesh_key.
+            vertex_data (np.array): The uint32 vertex data.
+            section_offsets (np.array): The quad offsets of its ranges.
+        """
+        with self.lock:
+            if key in self.entries:
+                return None
+            offset = self.end
+            if vertex_data.nbytes:
+                self.file.seek(offset)
+                self.file.write(np.ascontiguousarray(vertex_data))
+                self.file.flush()  # the data reaches the file before its log record
+                self.end += vertex_data.nbytes
+            section_offsets = np.array(section_offsets, dtype='int32')
+            self.entries[key] = (offset, vertex_data.nbytes, section_offsets)
+            self.live += vertex_data.nbytes
+            record = np.empty(1, dtype=ENTRY)
+            record[0] = key, offset, vertex_data.nbytes, section_offsets
+            self.log.write(record.tobytes())
+            self.log.flush()
+            self.evict()
+            if self.end - self.live > self.max_bytes:
+                self.compact()
+
+    def evict(self):
+        """Drops the least recently used entries until the live bytes fit max_bytes."""
+        while self.live > self.max_bytes and self.entries:
+            _, (_, size, _) = self.entries.popitem(last=False)
+            self.live -= size
+
+    def get_size(self):
+        """Returns the size of the data file in bytes, dead space included."""
+        return self.end
+
+    def compact(self):
+        """
+        Rewrites the data file with only the live entries, in use order, and writes the index.
+        Views returned by get keep the old data file mapped until they are released.
+        """
+        self.map = None
+        data_path = os.path.join(self.path, DATA_FILE)
+        with open(data_path + '.tmp', 'wb') as file:
+            end = 0
+            for key, (offset, size, section_offsets) in self.entries.items():
+                self.file.seek(offset)
+                file.write(self.file.read(size))
+                self.entries[key] = (end, size, section_offsets)
+                end += size
+        self.file.close()
+        self.log.close()
+        for name in (INDEX_FILE, LOG_FILE):
+            if os.path.exists(os.path.join(self.path, name)):
+                # a crash before the new index is written leaves an empty cache, never a wrong one
+                os.remove(os.path.join(self.path, name))
+        os.replace(data_path + '.tmp', data_path)
+        self.file = open(data_path, 'r+b')
+        self.end = end
+        self.save_index()
+
+    def save_index(self):
+        """Writes the index, least recently used entry first, and starts a new log."""
+        index = np.empty(len(self.entries), dtype=ENTRY)
+        for i, (key, (offset, size, section_offsets)) in enumerate(self.entries.items()):
+            index[i] = key, offset, size, section_offsets
+        index_path = os.path.join(self.path, INDEX_FILE)
+        with open(index_path + '.tmp', 'wb') as file:
+            np.save(file, index)
+        os.replace(index_path + '.tmp', index_path)
+        if self.log is not None:
+            self.log.close()
+        self.log = open(os.path.join(self.path, LOG_FILE), 'wb')
+        self.log.write(LOG_HEADER)
+        self.log.flush()
+
+    def close(self):
+        """Compacts the data file once it is mostly dead space, writes the index and closes the files."""
+        with self.lock:
+            self.map = None
+            self.file.flush()
+            if self.end - self.live > self.live:
+                self.compact()
+            else:
+                self.save_index()
+            self.file.close()
+            self.log.close()
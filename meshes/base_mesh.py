@@ -12,6 +12,7 @@ class BaseMesh:
         program: The shader program used for rendering the mesh.
         vbo_format (str): The data format of the vertex buffer (e.g., "3f 3f" for positions and colors).
         attrs (tuple[str, ...]): Attribute names corresponding to the vertex format.
+        index_buffer: The uint32 index buffer the VAO draws through, if any.
         vao: The vertex array object used for rendering.
     """
 
@@ -23,6 +24,7 @@ class BaseMesh:
         self.program = None  # Shader program, must be assigned before rendering
         self.vbo_format = None  # Format of vertex buffer data (e.g., "3f 3f")
         self.attrs: tuple[str, ...] = None  # Attribute names for vertex data
+        self.index_buffer = None  # Optional index buffer, shared by meshes drawing the same topology
         self.vao = None  # Vertex array object
 
     def get_vertex_data(self) -> np.array:
@@ -36,20 +38,25 @@ class BaseMesh:
         """
         raise NotImplementedError("Subclasses must implement `get_vertex_data`.")
 
-    def get_vao(self):
+    def get_vao(self, vertex_data=None):
         """
         Generates and returns a Vertex Array Object (VAO) using the vertex data.
 
         This method initializes the VBO, binds it to the shader program, and
         creates the VAO.
 
+        Args:
+            vertex_data (np.array): Prebuilt vertex data, generated with `get_vertex_data` when omitted.
+
         Returns:
             The generated VAO.
         """
-        vertex_data = self.get_vertex_data()  # Retrieve vertex data from subclass implementation
+        if vertex_data is None:
+            vertex_data = self.get_vertex_data()  # Retrieve vertex data from subclass implementation
         vbo = self.ctx.buffer(vertex_data)  # Create a buffer for vertex data
         vao = self.ctx.vertex_array(
-            self.program, [(vbo, self.vbo_format, *self.attrs)], skip_errors=True
+            self.program, [(vbo, self.vbo_format, *self.attrs)],
+            index_buffer=self.index_buffer, index_element_size=4, skip_errors=True
         )
         return vao
 
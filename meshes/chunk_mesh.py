@@ -1,5 +1,102 @@
+from settings import *
 from meshes.base_mesh import BaseMesh
-from meshes.chunk_mesh_builder import build_chunk_mesh
+from meshes.chunk_mesh_builder import CHUNK_SECTIONS, build_quad_indices, get_face_offsets
+
+ORIGIN_FORMAT = '3i'  # Format of a chunk's entry in the world's chunk origin buffer, its minimum corner
+ORIGIN_BYTES = 12  # Bytes of a chunk origin entry
+
+
+def get_facing_faces(position, box_min, box_max):
+    """
+    Finds the face directions of a box of voxels that can face a point. A direction is hidden when the
+    point lies behind the plane of every face it could have in the box, so the test is exact per axis.
+
+    Args:
+        position (glm.vec3): The camera position.
+        box_min (glm.vec3): The minimum corner of the box.
+        box_max (glm.vec3): The maximum corner of the box.
+
+    Returns:
+        tuple: Whether each face direction, top, bottom, right, left, back, front, can face the point.
+    """
+    x, y, z = position
+    return (
+        y > box_min.y + 1, y < box_max.y - 1,
+        x > box_min.x + 1, x < box_max.x - 1,
+        z < box_max.z - 1, z > box_min.z + 1
+    )
+
+
+def render_face_ranges(vao, face_offsets, faces):
+    """
+    Draws the face-direction ranges of a chunk mesh, merging adjacent ranges into one draw call.
+    A quad takes 6 vertices, or 6 indices of the shared quad index buffer, so ranges map to either layout.
+
+    Args:
+        vao: The chunk VAO.
+        face_offsets (list): The quad offset of each face direction's range, and the total quad count last.
+        faces (tuple): Whether each face direction is drawn.
+
+    Returns:
+        tuple: The number of vertices submitted and of draw calls made.
+    """
+    submitted = draws = 0
+    face_id = 0
+    while face_id < 6:
+        if not faces[face_id]:
+            face_id += 1
+            continue
+        start = face_id
+        while face_id < 6 and faces[face_id]:
+            face_id += 1
+        vertices = (face_offsets[face_id] - face_offsets[start]) * 6
+        if vertices:
+            vao.render(vertices=vertices, first=face_offsets[start] * 6)
+            submitted += vertices
+            draws += 1
+    return submitted, draws
+
+
+class MeshArena:
+    """
+    A vertex buffer holding the meshes of many chunks, built and uploaded at once, see build_world_meshes.
+    Each chunk mesh draws its own range of it until it is rebuilt into a buffer of its own; the buffer is
+    released along with the last range in use.
+
+    Attributes:
+        vbo: The vertex buffer.
+        users (int): The number of chunk meshes drawing from it.
+    """
+    def __init__(self, ctx, size, users):
+        """
+        Allocates the arena, filled with `write`.
+
+        Args:
+            ctx: The OpenGL rendering context.
+            size (int): The size of the vertex data of every chunk in bytes.
+            users (int): The number of chunk meshes that will draw from it.
+        """
+        self.vbo = ctx.buffer(reserve=size)
+        self.users = users
+
+    def write(self, vertex_data, offset):
+        """
+        Uploads vertex data into the arena.
+
+        Args:
+            vertex_data (np.array): The vertex data.
+            offset (int): Its byte offset in the arena.
+        """
+        if vertex_data.nbytes:
+            self.vbo.write(vertex_data, offset=offset)
+
+    def leave(self):
+        """Stops one chunk mesh drawing from the arena, releasing the buffer after the last."""
+        self.users -= 1
+        if not self.users:
+            self.vbo.release()
+            self.vbo = None
+
 
 class ChunkMesh(BaseMesh):
     """
@@ -16,15 +113,26 @@ class ChunkMesh(BaseMesh):
         vbo_format (str): The format of the vertex buffer data.
         format_size (int): The total size of the vertex attributes.
         attrs (tuple[str, ...]): The attributes corresponding to the vertex format.
+        index_buffer: The quad index buffer shared by all chunk meshes, None unless INDEXED_QUADS.
+        section_offsets (np.array): The quad offset of each (face direction, section) range in the VBO, see count_faces.
+        face_offsets (list): The quad offset of each face direction's range in the VBO.
+        vbo: The vertex buffer of the chunk, or of the arena it draws from.
+        vbo_offset (int): The byte offset of the chunk's vertex data in the VBO.
+        arena (MeshArena): The arena the chunk draws from, if any.
         vao: The vertex array object used for rendering the chunk.
     """
+    quad_index_buffer = None  # Built on the first indexed chunk mesh, see get_quad_index_buffer
 
-    def __init__(self, chunk):
+    def __init__(self, chunk, vertex_data=None, section_offsets=None, arena=None, arena_offset=0):
         """
         Initializes the chunk mesh.
 
         Args:
             chunk: The chunk for which this mesh is being created.
+            vertex_data (np.array): Vertex data built in the background, built here when omitted.
+            section_offsets (np.array): The ranges of the vertex data.
+            arena (MeshArena): An arena holding the vertex data instead, see use_arena.
+            arena_offset (int): The byte offset of the vertex data in the arena.
         """
         super().__init__()
         self.app = chunk.app  # Reference to the main application
@@ -36,31 +144,179 @@ class ChunkMesh(BaseMesh):
         self.vbo_format = '1u4'  # Single unsigned 4-byte integer
         self.format_size = sum(int(fmt[:1]) for fmt in self.vbo_format.split())  # Compute attribute size
         self.attrs = ('packed_data',)  # Vertex attribute names
+        self.index_buffer = self.get_quad_index_buffer() if INDEXED_QUADS else None
+        self.quad_bytes = (4 if INDEXED_QUADS else 6) * 4 * self.format_size  # VBO bytes per face quad
+        self.section_offsets = None
+        self.face_offsets = None
+        self.vbo = None
+        self.vbo_offset = 0
+        self.arena = None
 
         # Generate the initial VAO
-        self.vao = self.get_vao()
+        if arena is not None:
+            self.use_arena(arena, arena_offset, section_offsets)
+        else:
+            self.rebuild(vertex_data, section_offsets)
+
+    def get_quad_index_buffer(self):
+        """
+        Returns the index buffer shared by every indexed chunk mesh, building it on first use.
+        It covers the most quads a chunk can have, so it never needs to grow.
+        """
+        buffer = ChunkMesh.quad_index_buffer
+        if buffer is None or buffer.ctx is not self.ctx:
+            buffer = ChunkMesh.quad_index_buffer = self.ctx.buffer(build_quad_indices())
+        return buffer
 
-    def rebuild(self):
+    def set_offsets(self, section_offsets):
+        """Sets the ranges of the VBO, see count_faces."""
+        self.section_offsets = section_offsets
+        self.face_offsets = get_face_offsets(section_offsets).tolist()
+
+    def get_vao(self, vertex_data=None):
+        """
+        Uploads vertex data into a new VBO and generates its VAO.
+
+        Args:
+            vertex_data (np.array): Prebuilt vertex data, generated with `get_vertex_data` when omitted.
+
+        Returns:
+            The generated VAO.
+        """
+        if vertex_data is None:
+            vertex_data = self.get_vertex_data()
+        self.release()
+        self.vbo = self.ctx.buffer(vertex_data)
+        return self.get_buffer_vao()
+
+    def get_buffer_vao(self):
+        """
+        Generates the VAO drawing the VBO from the chunk's byte offset, limiting indexed meshes to the
+        indices of their own quads. The chunk is placed by its entry of the world's chunk origin buffer,
+        read as a per-instance attribute, so drawing it uploads nothing.
+        """
+        vao = self.ctx.vertex_array(
+            self.program, [], index_buffer=self.index_buffer, index_element_size=4, skip_errors=True
+        )
+        vao.bind(self.program[self.attrs[0]].location, 'i', self.vbo, self.vbo_format, offset=self.vbo_offset)
+        vao.bind(self.program['chunk_origin'].location, 'i', self.chunk.world.chunk_origins, ORIGIN_FORMAT,
+                 offset=self.chunk.index * ORIGIN_BYTES, divisor=1)
+        vao.vertices = self.face_offsets[-1] * 6
+        return vao
+
+    def use_arena(self, arena, offset, section_offsets):
+        """
+        Draws the chunk's range of an arena instead of a VBO of its own.
+
+        Args:
+            arena (MeshArena): The arena holding the vertex data.
+            offset (int): The byte offset of the vertex data in the arena.
+            section_offsets (np.array): The ranges of the vertex data.
+        """
+        self.release()
+        self.set_offsets(section_offsets)
+        self.arena, self.vbo, self.vbo_offset = arena, arena.vbo, offset
+        self.vao = self.get_buffer_vao()
+
+    def release(self):
+        """Releases the VAO and VBO, or leaves the arena, keeping the shared index buffer."""
+        if self.vao is not None:
+            self.vao.release()
+        if self.arena is not None:
+            self.arena.leave()
+        elif self.vbo is not None:
+            self.vbo.release()
+        self.vao = self.vbo = self.arena = None
+        self.vbo_offset = 0
+
+    def rebuild(self, vertex_data=None, section_offsets=None):
         """
         Rebuilds the chunk mesh.
 
         This method regenerates the vertex array object (VAO) when the chunk data changes.
+
+        Args:
+            vertex_data (np.array): Vertex data built in the background, built here when omitted.
+            section_offsets (np.array): The ranges of the vertex data.
+        """
+        if section_offsets is not None:
+            self.set_offsets(section_offsets)
+        self.vao = self.get_vao(vertex_data)
+
+    def rebuild_sections(self, vertex_data, section_offsets, sections):
         """
-        self.vao = self.get_vao()
+        Replaces the ranges of remeshed sections. The new VBO is assembled on the GPU: the ranges of the
+        other sections are copied from the current VBO, in one copy per run of them, and only the new
+        vertex data is uploaded. A mesh left without faces has no VAO.
+
+        Args:
+            vertex_data (np.array): The vertex data of the sections.
+            section_offsets (np.array): Its ranges, see count_faces.
+            sections (np.array): The sorted sections it holds.
+        """
+        old_offsets = self.section_offsets
+        counts = np.diff(old_offsets).reshape(6, CHUNK_SECTIONS)
+        counts[:, sections] = np.diff(section_offsets).reshape(6, len(sections))
+        new_offsets = np.zeros_like(old_offsets)
+        new_offsets[1:] = np.cumsum(counts)
+        if not new_offsets[-1]:
+            self.release()
+            self.set_offsets(new_offsets)
+            return None
+
+        vbo = self.ctx.buffer(reserve=int(new_offsets[-1]) * self.quad_bytes)
+        changed = np.zeros((6, CHUNK_SECTIONS), dtype=bool)
+        changed[:, sections] = True
+        changed = changed.ravel().tolist()
+        old_starts, new_starts = old_offsets.tolist(), new_offsets.tolist()
+        section_starts = section_offsets.tolist()
+        quad_values = self.quad_bytes // vertex_data.itemsize
+
+        run = None  # first range of the current run of unchanged ranges
+        k = 0  # next range of the new vertex data, they come in the same order as the changed ranges
+        for r in range(len(changed) + 1):
+            if r < len(changed) and not changed[r]:
+                run = r if run is None else run
+                continue
+            if run is not None:
+                size = (old_starts[r] - old_starts[run]) * self.quad_bytes
+                if size:
+                    self.ctx.copy_buffer(vbo, self.vbo, size,
+                                         read_offset=self.vbo_offset + old_starts[run] * self.quad_bytes,
+                                         write_offset=new_starts[run] * self.quad_bytes)
+                run = None
+            if r < len(changed):
+                start, end = section_starts[k] * quad_values, section_starts[k + 1] * quad_values
+                if end > start:
+                    vbo.write(vertex_data[start: end], offset=new_starts[r] * self.quad_bytes)
+                k += 1
+
+        self.release()
+        self.vbo = vbo
+        self.set_offsets(new_offsets)
+        self.vao = self.get_buffer_vao()
 
     def get_vertex_data(self):
         """
         Generates vertex data for the chunk mesh.
 
-        Calls the `build_chunk_mesh` function to construct the mesh data based on the chunk’s voxel data.
+        Meshes the chunk with the world's current mesher, see `Chunk.get_vertex_data`, keeping its ranges.
 
         Returns:
             np.array: The generated vertex data for the chunk mesh.
         """
-        mesh = build_chunk_mesh(
-            chunk_voxels=self.chunk.voxels,
-            format_size=self.format_size,
-            chunk_pos=self.chunk.position,
-            world_voxels=self.chunk.world.voxels
-        )
-        return mesh
+        vertex_data, section_offsets = self.chunk.get_vertex_data()
+        self.set_offsets(section_offsets)
+        return vertex_data
+
+    def render_faces(self, faces):
+        """
+        Draws the ranges of the given face directions.
+
+        Args:
+            faces (tuple): Whether each face direction is drawn, see get_facing_faces.
+
+        Returns:
+            tuple: The number of vertices submitted and of draw calls made.
+        """
+        return render_face_ranges(self.vao, self.face_offsets, faces)
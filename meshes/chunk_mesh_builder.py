@@ -1,52 +1,85 @@
 from settings import *
-from numba import uint8
+from numba import prange, uint8
+from voxel_storage import get_chunk_index, get_chunk_voxels, read_voxel
+
+# Chunk volume with a one-voxel border copied from the neighbouring chunks
+PADDED_SIZE = CHUNK_SIZE + 2
+PADDED_AREA = PADDED_SIZE * PADDED_SIZE
+PADDED_VOL = PADDED_AREA * PADDED_SIZE
+BORDER_VOXEL = 255  # Border voxel of unloaded neighbours, solid so faces against them are hidden
+
+# Sections a chunk is meshed in, indexed like voxels: sx + SECTIONS_PER_AXIS * sz + SECTIONS_PER_AXIS ** 2 * sy
+SECTIONS_PER_AXIS = CHUNK_SIZE // SECTION_SIZE
+CHUNK_SECTIONS = SECTIONS_PER_AXIS ** 3
+ALL_SECTIONS = np.arange(CHUNK_SECTIONS, dtype='int32')
+
+# Outward normal of each face: top, bottom, right, left, back, front
+FACE_NORMALS = np.array([
+    [0, 1, 0], [0, -1, 0],
+    [1, 0, 0], [-1, 0, 0],
+    [0, 0, -1], [0, 0, 1]
+], dtype='int32')
+
+# Order in which the corners v0-v3 of a face quad are emitted, unflipped and flipped, so that
+# QUAD_INDICES splits it into two front-facing triangles along the diagonal its AO calls for
+FACE_QUADS = np.array([
+    [[0, 3, 2, 1], [1, 0, 3, 2]],  # top
+    [[2, 3, 0, 1], [3, 0, 1, 2]],  # bottom
+    [[0, 1, 2, 3], [3, 0, 1, 2]],  # right
+    [[2, 1, 0, 3], [1, 0, 3, 2]],  # left
+    [[0, 1, 2, 3], [3, 0, 1, 2]],  # back
+    [[2, 1, 0, 3], [1, 0, 3, 2]]   # front
+], dtype='int32')
+
+# Bump whenever the vertex data built from the same voxels changes, so cached meshes are never reused across it
+MESHER_VERSION = 1
+
+# Triangles of an emitted quad, shared by every quad of the index buffer in indexed mode
+QUAD_INDICES = np.array([0, 1, 2, 0, 2, 3], dtype='uint32')
+MAX_QUADS = CHUNK_VOL * 3  # Visible faces of a checkerboard chunk, the most any chunk can have
 
 @njit
-def get_ao(local_pos, world_pos, world_voxels, plane):
+def get_ao(padded, index, plane):
     """
     Calculate ambient occlusion (AO) for a voxel face based on neighboring empty spaces.
 
     Parameters:
-        local_pos (tuple): The (x, y, z) position in the chunk.
-        world_pos (tuple): The (x, y, z) position in the world.
-        world_voxels (array): The voxel data of the world.
+        padded (array): The chunk's padded volume, see fill_padded_volume.
+        index (int): The padded index of the empty voxel in front of the face.
         plane (str): The plane ('X', 'Y', or 'Z') to check for AO.
 
     Returns:
         tuple: AO values for the four vertices of the voxel face.
     """
-    x, y, z = local_pos
-    wx, wy, wz = world_pos
-
-    if plane == 'Y': 
-        a = is_void((x    , y, z - 1), (wx    , wy, wz - 1), world_voxels)
-        b = is_void((x - 1, y, z - 1), (wx - 1, wy, wz - 1), world_voxels)
-        c = is_void((x - 1, y, z    ), (wx - 1, wy, wz    ), world_voxels)
-        d = is_void((x - 1, y, z + 1), (wx - 1, wy, wz + 1), world_voxels)
-        e = is_void((x    , y, z + 1), (wx    , wy, wz + 1), world_voxels)
-        f = is_void((x + 1, y, z + 1), (wx + 1, wy, wz + 1), world_voxels)
-        g = is_void((x + 1, y, z    ), (wx + 1, wy, wz    ), world_voxels)
-        h = is_void((x + 1, y, z - 1), (wx + 1, wy, wz - 1), world_voxels)
+    if plane == 'Y':
+        a = is_void(padded, index          - PADDED_SIZE)
+        b = is_void(padded, index - 1      - PADDED_SIZE)
+        c = is_void(padded, index - 1                   )
+        d = is_void(padded, index - 1      + PADDED_SIZE)
+        e = is_void(padded, index          + PADDED_SIZE)
+        f = is_void(padded, index + 1      + PADDED_SIZE)
+        g = is_void(padded, index + 1                   )
+        h = is_void(padded, index + 1      - PADDED_SIZE)
 
     elif plane == 'X':
-        a = is_void((x, y    , z - 1), (wx, wy    , wz - 1), world_voxels)
-        b = is_void((x, y - 1, z - 1), (wx, wy - 1, wz - 1), world_voxels)
-        c = is_void((x, y - 1, z    ), (wx, wy - 1, wz    ), world_voxels)
-        d = is_void((x, y - 1, z + 1), (wx, wy - 1, wz + 1), world_voxels)
-        e = is_void((x, y    , z + 1), (wx, wy    , wz + 1), world_voxels)
-        f = is_void((x, y + 1, z + 1), (wx, wy + 1, wz + 1), world_voxels)
-        g = is_void((x, y + 1, z    ), (wx, wy + 1, wz    ), world_voxels)
-        h = is_void((x, y + 1, z - 1), (wx, wy + 1, wz - 1), world_voxels)
+        a = is_void(padded, index                 - PADDED_SIZE)
+        b = is_void(padded, index - PADDED_AREA - PADDED_SIZE)
+        c = is_void(padded, index - PADDED_AREA              )
+        d = is_void(padded, index - PADDED_AREA + PADDED_SIZE)
+        e = is_void(padded, index                 + PADDED_SIZE)
+        f = is_void(padded, index + PADDED_AREA + PADDED_SIZE)
+        g = is_void(padded, index + PADDED_AREA              )
+        h = is_void(padded, index + PADDED_AREA - PADDED_SIZE)
 
     else:  # Z plane
-        a = is_void((x - 1, y    , z), (wx - 1, wy    , wz), world_voxels)
-        b = is_void((x - 1, y - 1, z), (wx - 1, wy - 1, wz), world_voxels)
-        c = is_void((x    , y - 1, z), (wx    , wy - 1, wz), world_voxels)
-        d = is_void((x + 1, y - 1, z), (wx + 1, wy - 1, wz), world_voxels)
-        e = is_void((x + 1, y    , z), (wx + 1, wy    , wz), world_voxels)
-        f = is_void((x + 1, y + 1, z), (wx + 1, wy + 1, wz), world_voxels)
-        g = is_void((x    , y + 1, z), (wx    , wy + 1, wz), world_voxels)
-        h = is_void((x - 1, y + 1, z), (wx - 1, wy + 1, wz), world_voxels)
+        a = is_void(padded, index - 1                )
+        b = is_void(padded, index - 1 - PADDED_AREA)
+        c = is_void(padded, index     - PADDED_AREA)
+        d = is_void(padded, index + 1 - PADDED_AREA)
+        e = is_void(padded, index + 1                )
+        f = is_void(padded, index + 1 + PADDED_AREA)
+        g = is_void(padded, index     + PADDED_AREA)
+        h = is_void(padded, index - 1 + PADDED_AREA)
 
     ao = (a + b + c), (g + h + a), (e + f + g), (c + d + e)
     return ao
@@ -72,157 +105,685 @@ def pack_data(x, y, z, voxel_id, face_id, ao_id, flip_id):
     return packed_data
 
 @njit
-def get_chunk_index(world_voxel_pos):
+def get_neighbour_indices(chunk_pos, chunk_columns):
     """
-    Get the index of the chunk that contains the given world voxel position.
+    Get the chunk table indices of a chunk and its 26 neighbours.
 
     Parameters:
-        world_voxel_pos (tuple): (wx, wy, wz) world voxel coordinates.
+        chunk_pos (tuple): The chunk position in chunk coordinates.
+        chunk_columns (array): The column position held by each chunk table column.
 
     Returns:
-        int: Index of the chunk in the world voxel array, or -1 if out of bounds.
+        array: The index of the chunk at offset (dx, dy, dz) at (dx + 1) + 3 * (dz + 1) + 9 * (dy + 1),
+        -1 where it is outside the world or not loaded.
     """
-    wx, wy, wz = world_voxel_pos
-    cx = wx // CHUNK_SIZE
-    cy = wy // CHUNK_SIZE
-    cz = wz // CHUNK_SIZE
-    if not (0 <= cx < WORLD_W and 0 <= cy < WORLD_H and 0 <= cz < WORLD_D):
-        return -1
-
-    index = cx + WORLD_W * cz + WORLD_AREA * cy
-    return index
+    cx, cy, cz = chunk_pos
+    neighbours = np.empty(27, dtype=np.int64)
+    for dy in range(-1, 2):
+        for dz in range(-1, 2):
+            for dx in range(-1, 2):
+                neighbours[dx + 1 + 3 * (dz + 1) + 9 * (dy + 1)] = get_chunk_index(cx + dx, cy + dy, cz + dz,
+                                                                                    chunk_columns)
+    return neighbours
 
 @njit
-def is_void(local_voxel_pos, world_voxel_pos, world_voxels):
-    """Check if a voxel position is empty (void)."""
-    chunk_index = get_chunk_index(world_voxel_pos)
+def get_border_voxel(storage, neighbours, x, y, z):
+    """
+    Get the voxel ID at padded coordinates outside the chunk, see fill_padded_box, from the
+    neighbour holding it, BORDER_VOXEL if that neighbour is not loaded.
+    """
+    dx = (x == PADDED_SIZE - 1) - (x == 0)
+    dy = (y == PADDED_SIZE - 1) - (y == 0)
+    dz = (z == PADDED_SIZE - 1) - (z == 0)
+    chunk_index = neighbours[dx + 1 + 3 * (dz + 1) + 9 * (dy + 1)]
     if chunk_index == -1:
-        return False
-    chunk_voxels = world_voxels[chunk_index]
+        return BORDER_VOXEL
+    voxel_index = (x - 1) % CHUNK_SIZE + (z - 1) % CHUNK_SIZE * CHUNK_SIZE + (y - 1) % CHUNK_SIZE * CHUNK_AREA
+    return read_voxel(storage, chunk_index, voxel_index)
+
+@njit
+def get_section_origin(section):
+    """Get the chunk position of the first voxel of a section."""
+    area = SECTIONS_PER_AXIS * SECTIONS_PER_AXIS
+    return (section % SECTIONS_PER_AXIS * SECTION_SIZE, section // area * SECTION_SIZE,
+            section // SECTIONS_PER_AXIS % SECTIONS_PER_AXIS * SECTION_SIZE)
+
+@njit
+def fill_padded_box(chunk_voxels, chunk_pos, storage, chunk_columns, padded, x0, y0, z0, size):
+    """
+    Copy a box of a chunk and the one-voxel border around it into a padded volume, so face and AO
+    tests index it directly instead of looking up the chunk of every neighbour voxel. Border voxels
+    inside the chunk come from its own voxels, the others from its 26 neighbours.
+
+    Parameters:
+        chunk_voxels (array): The chunk's voxels.
+        chunk_pos (tuple): The chunk position in chunk coordinates.
+        storage (tuple): The world voxel storage, see voxel_storage.read_voxel.
+        chunk_columns (array): The column position held by each chunk table column.
+        padded (array): The PADDED_VOL volume to fill, laid out like a chunk with every coordinate + 1.
+        x0, y0, z0 (int): The box's first voxel, also its first padded coordinates with the border.
+        size (int): The box's edge.
+    """
+    neighbours = get_neighbour_indices(chunk_pos, chunk_columns)
+    first, last = max(x0, 1), min(x0 + size + 2, PADDED_SIZE - 1)  # padded x span inside the chunk
+    for y in range(y0, y0 + size + 2):
+        for z in range(z0, z0 + size + 2):
+            row = z * PADDED_SIZE + y * PADDED_AREA
+            if 0 < y < PADDED_SIZE - 1 and 0 < z < PADDED_SIZE - 1:
+                # a row of the chunk, between border voxels where the box touches the chunk's sides
+                voxel_row = (z - 1) * CHUNK_SIZE + (y - 1) * CHUNK_AREA
+                padded[row + first: row + last] = chunk_voxels[voxel_row + first - 1: voxel_row + last - 1]
+                if first > x0:
+                    padded[row] = get_border_voxel(storage, neighbours, 0, y, z)
+                if last < x0 + size + 2:
+                    padded[row + last] = get_border_voxel(storage, neighbours, last, y, z)
+            else:
+                for x in range(x0, x0 + size + 2):
+                    padded[row + x] = get_border_voxel(storage, neighbours, x, y, z)
+
+@njit
+def fill_padded_volume(chunk_voxels, chunk_pos, storage, chunk_columns, padded, sections):
+    """Fill a padded volume around chunk sections, see fill_padded_box, in one box when they are all meshed."""
+    if len(sections) == CHUNK_SECTIONS:
+        fill_padded_box(chunk_voxels, chunk_pos, storage, chunk_columns, padded, 0, 0, 0, CHUNK_SIZE)
+        return
+    for section in sections:
+        x0, y0, z0 = get_section_origin(section)
+        fill_padded_box(chunk_voxels, chunk_pos, storage, chunk_columns, padded, x0, y0, z0, SECTION_SIZE)
+
+@njit
+def is_void(padded, index):
+    """Check if a voxel of a padded volume is empty (void)."""
+    return not padded[index]
+
+@njit
+def add_face(vertex_data, index, face_id, flip_id, v0, v1, v2, v3, indexed):
+    """
+    Add a face quad from its corners v0-v3, as 4 vertices drawn through the shared quad
+    index buffer when indexed, otherwise as the 6 vertices of its two triangles.
+    """
+    corners = (v0, v1, v2, v3)
+    order = FACE_QUADS[face_id, int(flip_id)]
+    if indexed:
+        for i in range(4):
+            vertex_data[index + i] = corners[order[i]]
+        return index + 4
+    for i in range(6):
+        vertex_data[index + i] = corners[order[QUAD_INDICES[i]]]
+    return index + 6
+
+def build_quad_indices(quads=MAX_QUADS):
+    """
+    Build the index data shared by indexed chunk meshes, QUAD_INDICES repeated for every quad.
+
+    Parameters:
+        quads (int): The number of quads to cover.
+
+    Returns:
+        ndarray: The uint32 index data.
+    """
+    return (np.arange(quads, dtype='uint32')[:, None] * 4 + QUAD_INDICES).ravel()
+
+@njit
+def count_faces(chunk_voxels, padded, sections):
+    """
+    Count the visible faces of chunk sections, sizing their vertex data before it is built.
+
+    Returns:
+        array: The quad offset of each (face direction, section) range in the vertex data, direction
+        major and in the order of `sections`, with the total quad count last.
+    """
+    n = len(sections)
+    section_offsets = np.zeros(6 * n + 1, dtype='int32')
+    for i in range(n):
+        x0, y0, z0 = get_section_origin(sections[i])
+        for y in range(y0, y0 + SECTION_SIZE):
+            for z in range(z0, z0 + SECTION_SIZE):
+                for x in range(x0, x0 + SECTION_SIZE):
+                    if not chunk_voxels[x + CHUNK_SIZE * z + CHUNK_AREA * y]:
+                        continue
+                    p = x + 1 + (z + 1) * PADDED_SIZE + (y + 1) * PADDED_AREA
+                    section_offsets[1 + i] += is_void(padded, p + PADDED_AREA)
+                    section_offsets[1 + i + n] += is_void(padded, p - PADDED_AREA)
+                    section_offsets[1 + i + 2 * n] += is_void(padded, p + 1)
+                    section_offsets[1 + i + 3 * n] += is_void(padded, p - 1)
+                    section_offsets[1 + i + 4 * n] += is_void(padded, p - PADDED_SIZE)
+                    section_offsets[1 + i + 5 * n] += is_void(padded, p + PADDED_SIZE)
+    for k in range(6 * n):
+        section_offsets[k + 1] += section_offsets[k]
+    return section_offsets
+
+def get_face_offsets(section_offsets):
+    """Get the quad offset of each face direction's range, and the total quad count last, from section offsets."""
+    return section_offsets[::(len(section_offsets) - 1) // 6]
+
+def get_edit_sections(wx, wy, wz):
+    """
+    Find the chunk sections whose faces or AO can depend on a voxel: those holding a voxel
+    of the 3x3x3 block around it.
+
+    Parameters:
+        wx, wy, wz (int): The world voxel coordinates.
+
+    Returns:
+        dict: The sorted section list of each affected chunk position.
+    """
+    # section columns, rows and layers in world section coordinates
+    axes = [sorted({(w + d) // SECTION_SIZE for d in (-1, 0, 1)}) for w in (wx, wy, wz)]
+    chunk_sections = {}
+    for gx in axes[0]:
+        for gy in axes[1]:
+            for gz in axes[2]:
+                sx, sy, sz = gx % SECTIONS_PER_AXIS, gy % SECTIONS_PER_AXIS, gz % SECTIONS_PER_AXIS
+                position = gx // SECTIONS_PER_AXIS, gy // SECTIONS_PER_AXIS, gz // SECTIONS_PER_AXIS
+                section = sx + SECTIONS_PER_AXIS * sz + SECTIONS_PER_AXIS * SECTIONS_PER_AXIS * sy
+                chunk_sections.setdefault(position, []).append(section)
+    return {position: sorted(sections) for position, sections in chunk_sections.items()}
+
+@njit(cache=True, nogil=True)
+def build_chunk_mesh(chunk_voxels, format_size, chunk_pos, storage, chunk_columns, indexed, sections):
+    """
+    Generate the mesh data for sections of a voxel chunk, all of them (ALL_SECTIONS) for the whole chunk.
+    Releases the GIL so chunks can be meshed on worker threads. Visible faces are counted first so the
+    vertex data is allocated at its exact size. Indexed meshes hold 4 vertices per face and are drawn
+    through the index data of build_quad_indices.
+
+    Faces are grouped by face_id, then by section, each range written from its own cursor, so a renderer
+    can draw only the directions that can face the camera and replace the ranges of remeshed sections.
+
+    Returns:
+        tuple: The vertex data and the quad offsets of its ranges, see count_faces.
+    """
+    padded = np.empty(PADDED_VOL, dtype='uint8')
+    fill_padded_volume(chunk_voxels, chunk_pos, storage, chunk_columns, padded, sections)
+    quad_size = 4 if indexed else 6
+    section_offsets = count_faces(chunk_voxels, padded, sections)
+    vertex_data = np.empty(section_offsets[-1] * quad_size * format_size, dtype='uint32')
+    add_chunk_faces(chunk_voxels, padded, sections, section_offsets, vertex_data, indexed)
+    return vertex_data, section_offsets
+
+@njit(nogil=True)
+def add_chunk_faces(chunk_voxels, padded, sections, section_offsets, vertex_data, indexed):
+    """Write the faces of chunk sections into vertex data sized by count_faces, see build_chunk_mesh."""
+    quad_size = 4 if indexed else 6
+    cursors = section_offsets[:-1] * quad_size  # next vertex of each range
+    n = len(sections)
+
+    for i in range(n):
+        x0, y0, z0 = get_section_origin(sections[i])
+        for y in range(y0, y0 + SECTION_SIZE):
+            for z in range(z0, z0 + SECTION_SIZE):
+                for x in range(x0, x0 + SECTION_SIZE):
+                    voxel_id = chunk_voxels[x + CHUNK_SIZE * z + CHUNK_AREA * y]
+
+                    if not voxel_id:
+                        continue
+
+                    # voxel index in the padded volume
+                    p = x + 1 + (z + 1) * PADDED_SIZE + (y + 1) * PADDED_AREA
+
+                    # top face
+                    if is_void(padded, p + PADDED_AREA):
+                        # get ao values
+                        ao = get_ao(padded, p + PADDED_AREA, plane='Y')
+                        flip_id = ao[1] + ao[3] > ao[0] + ao[2]
+
+                        # format: x, y, z, voxel_id, face_id, ao_id, flip_id
+                        v0 = pack_data(x    , y + 1, z    , voxel_id, 0, ao[0], flip_id)
+                        v1 = pack_data(x + 1, y + 1, z    , voxel_id, 0, ao[1], flip_id)
+                        v2 = pack_data(x + 1, y + 1, z + 1, voxel_id, 0, ao[2], flip_id)
+                        v3 = pack_data(x    , y + 1, z + 1, voxel_id, 0, ao[3], flip_id)
+
+                        cursors[i] = add_face(vertex_data, cursors[i], 0, flip_id, v0, v1, v2, v3, indexed)
+
+                    # bottom face
+                    if is_void(padded, p - PADDED_AREA):
+                        ao = get_ao(padded, p - PADDED_AREA, plane='Y')
+                        flip_id = ao[1] + ao[3] > ao[0] + ao[2]
+
+                        v0 = pack_data(x    , y, z    , voxel_id, 1, ao[0], flip_id)
+                        v1 = pack_data(x + 1, y, z    , voxel_id, 1, ao[1], flip_id)
+                        v2 = pack_data(x + 1, y, z + 1, voxel_id, 1, ao[2], flip_id)
+                        v3 = pack_data(x    , y, z + 1, voxel_id, 1, ao[3], flip_id)
+
+                        cursors[i + n] = add_face(vertex_data, cursors[i + n], 1, flip_id, v0, v1, v2, v3, indexed)
+
+                    # right face
+                    if is_void(padded, p + 1):
+                        ao = get_ao(padded, p + 1, plane='X')
+                        flip_id = ao[1] + ao[3] > ao[0] + ao[2]
+
+                        v0 = pack_data(x + 1, y    , z    , voxel_id, 2, ao[0], flip_id)
+                        v1 = pack_data(x + 1, y + 1, z    , voxel_id, 2, ao[1], flip_id)
+                        v2 = pack_data(x + 1, y + 1, z + 1, voxel_id, 2, ao[2], flip_id)
+                        v3 = pack_data(x + 1, y    , z + 1, voxel_id, 2, ao[3], flip_id)
+
+                        cursors[i + 2 * n] = add_face(vertex_data, cursors[i + 2 * n], 2, flip_id, v0, v1, v2, v3, indexed)
+
+                    # left face
+                    if is_void(padded, p - 1):
+                        ao = get_ao(padded, p - 1, plane='X')
+                        flip_id = ao[1] + ao[3] > ao[0] + ao[2]
+
+                        v0 = pack_data(x, y    , z    , voxel_id, 3, ao[0], flip_id)
+                        v1 = pack_data(x, y + 1, z    , voxel_id, 3, ao[1], flip_id)
+                        v2 = pack_data(x, y + 1, z + 1, voxel_id, 3, ao[2], flip_id)
+                        v3 = pack_data(x, y    , z + 1, voxel_id, 3, ao[3], flip_id)
+
+                        cursors[i + 3 * n] = add_face(vertex_data, cursors[i + 3 * n], 3, flip_id, v0, v1, v2, v3, indexed)
+
+                    # back face
+                    if is_void(padded, p - PADDED_SIZE):
+                        ao = get_ao(padded, p - PADDED_SIZE, plane='Z')
+                        flip_id = ao[1] + ao[3] > ao[0] + ao[2]
+
+                        v0 = pack_data(x,     y,     z, voxel_id, 4, ao[0], flip_id)
+                        v1 = pack_data(x,     y + 1, z, voxel_id, 4, ao[1], flip_id)
+                        v2 = pack_data(x + 1, y + 1, z, voxel_id, 4, ao[2], flip_id)
+                        v3 = pack_data(x + 1, y,     z, voxel_id, 4, ao[3], flip_id)
+
+                        cursors[i + 4 * n] = add_face(vertex_data, cursors[i + 4 * n], 4, flip_id, v0, v1, v2, v3, indexed)
+
+                    # front face
+                    if is_void(padded, p + PADDED_SIZE):
+                        ao = get_ao(padded, p + PADDED_SIZE, plane='Z')
+                        flip_id = ao[1] + ao[3] > ao[0] + ao[2]
+
+                        v0 = pack_data(x    , y    , z + 1, voxel_id, 5, ao[0], flip_id)
+                        v1 = pack_data(x    , y + 1, z + 1, voxel_id, 5, ao[1], flip_id)
+                        v2 = pack_data(x + 1, y + 1, z + 1, voxel_id, 5, ao[2], flip_id)
+                        v3 = pack_data(x + 1, y    , z + 1, voxel_id, 5, ao[3], flip_id)
+
+                        cursors[i + 5 * n] = add_face(vertex_data, cursors[i + 5 * n], 5, flip_id, v0, v1, v2, v3, indexed)
+
+@njit
+def get_face_position(face_id, layer, a, b):
+    """
+    Map face-plane coordinates to a chunk position.
+
+    Quad corners v0-v3 of every face lie at (a, b), (a + 1, b), (a + 1, b + 1) and (a, b + 1),
+    so the per-voxel AO values and triangle orders carry over to merged quads.
+
+    Parameters:
+        face_id (int): The face direction, 0-5.
+        layer (int): The coordinate along the face normal.
+        a, b (int): The coordinates in the face plane.
+
+    Returns:
+        tuple: The (x, y, z) position.
+    """
+    if face_id < 2:
+        return a, layer, b
+    if face_id < 4:
+        return layer, a, b
+    return b, a, layer
+
+@njit
+def get_face_coords(face_id, x, y, z):
+    """Map a chunk position to face-plane coordinates, the inverse of get_face_position."""
+    if face_id < 2:
+        return y, x, z
+    if face_id < 4:
+        return x, y, z
+    return z, y, x
+
+@njit
+def get_face_ao(face_id, padded, index):
+    """Calculate the AO values of a face from the padded index in front of it, see get_ao."""
+    if face_id < 2:
+        return get_ao(padded, index, plane='Y')
+    if face_id < 4:
+        return get_ao(padded, index, plane='X')
+    return get_ao(padded, index, plane='Z')
 
-    x, y, z = local_voxel_pos
-    voxel_index = x % CHUNK_SIZE + z % CHUNK_SIZE * CHUNK_SIZE + y % CHUNK_SIZE * CHUNK_AREA
+@njit
+def get_face_strides(face_id):
+    """
+    Get the voxel index steps along the face-plane coordinates a and b and along the normal, see get_face_position.
 
-    if chunk_voxels[voxel_index]:
-        return False
+    Returns:
+        tuple: The (a, b, layer) steps.
+    """
+    if face_id < 2:
+        return 1, CHUNK_SIZE, CHUNK_AREA
+    if face_id < 4:
+        return CHUNK_AREA, CHUNK_SIZE, 1
+    return CHUNK_AREA, 1, CHUNK_SIZE
+
+@njit
+def is_run_equal(face_keys, start, step, depth, key):
+    """Check if `depth` face keys from `start`, `step` apart, all equal the key."""
+    for i in range(depth):
+        if face_keys[start + i * step] != key:
+            return False
     return True
 
+@njit(nogil=True)
+def fill_face_keys(chunk_voxels, padded, sections, face_keys, layer_faces):
+    """
+    Write the face key of every voxel of chunk sections for each face direction: its voxel ID and the
+    four AO values of the face, or 0 where the face is hidden. One pass over the voxels fills all six.
+
+    Parameters:
+        chunk_voxels (array): The chunk's voxels.
+        padded (array): The chunk's padded volume, see fill_padded_volume.
+        sections (array): The sections to fill.
+        face_keys (array): The [6, CHUNK_VOL] face keys, indexed like the voxels.
+        layer_faces (array): The zeroed [6, len(sections), SECTION_SIZE] output count of visible faces
+            in each layer of each section, the layer counted along the face normal.
+    """
+    for i in range(len(sections)):
+        x0, y0, z0 = get_section_origin(sections[i])
+        for y in range(y0, y0 + SECTION_SIZE):
+            for z in range(z0, z0 + SECTION_SIZE):
+                for x in range(x0, x0 + SECTION_SIZE):
+                    index = x + CHUNK_SIZE * z + CHUNK_AREA * y
+                    voxel_id = chunk_voxels[index]
+                    p = x + 1 + (z + 1) * PADDED_SIZE + (y + 1) * PADDED_AREA
+                    for face_id in range(6):
+                        face_keys[face_id, index] = 0
+                        if not voxel_id:
+                            continue
+                        nx, ny, nz = FACE_NORMALS[face_id]
+                        front = p + nx + nz * PADDED_SIZE + ny * PADDED_AREA
+                        if not is_void(padded, front):
+                            continue
+                        ao = get_face_ao(face_id, padded, front)
+                        face_keys[face_id, index] = voxel_id | ao[0] << 8 | ao[1] << 10 | ao[2] << 12 | ao[3] << 14
+                        layer = y - y0 if face_id < 2 else (x - x0 if face_id < 4 else z - z0)
+                        layer_faces[face_id, i, layer] += 1
+
 @njit
-def add_data(vertex_data, index, *vertices):
-    for vertex in vertices:
-        vertex_data[index] = vertex
-        index += 1
-    return index
+def add_quad(vertex_data, index, face_id, layer, a, b, width, depth, key, indexed):
+    """Add a face quad spanning `width` voxels along a and `depth` along b, see add_face."""
+    voxel_id = key & 255
+    ao = (key >> 8) & 3, (key >> 10) & 3, (key >> 12) & 3, (key >> 14) & 3
+    flip_id = ao[1] + ao[3] > ao[0] + ao[2]
+
+    x0, y0, z0 = get_face_position(face_id, layer, a, b)
+    x1, y1, z1 = get_face_position(face_id, layer, a + width, b)
+    x2, y2, z2 = get_face_position(face_id, layer, a + width, b + depth)
+    x3, y3, z3 = get_face_position(face_id, layer, a, b + depth)
+    return add_face(
+        vertex_data, index, face_id, flip_id,
+        pack_data(x0, y0, z0, voxel_id, face_id, ao[0], flip_id),
+        pack_data(x1, y1, z1, voxel_id, face_id, ao[1], flip_id),
+        pack_data(x2, y2, z2, voxel_id, face_id, ao[2], flip_id),
+        pack_data(x3, y3, z3, voxel_id, face_id, ao[3], flip_id),
+        indexed
+    )
+
+@njit(cache=True, nogil=True)
+def build_greedy_mesh(chunk_voxels, format_size, chunk_pos, storage, chunk_columns, indexed, sections):
+    """
+    Generate the mesh data for sections of a voxel chunk, merging coplanar faces into larger quads.
+
+    One pass over the voxels writes the face key (voxel ID and the four AO values) of every face direction,
+    then each layer of each face direction of a section is swept into rectangles of equal keys, skipping
+    layers without faces and stopping once all faces of a layer are merged. A quad only grows along an axis its
+    AO is constant on, so merged faces shade exactly like the faces they replace, and never past its
+    section, so sections can be remeshed on their own. Takes the same arguments and returns the same
+    vertex layout as build_chunk_mesh; the chunk shader tiles the texture once per voxel across merged quads.
+
+    The vertex data is allocated for the unmerged face count and only the used part is returned as a copy.
+    """
+    padded = np.empty(PADDED_VOL, dtype='uint8')
+    fill_padded_volume(chunk_voxels, chunk_pos, storage, chunk_columns, padded, sections)
+    quad_size = 4 if indexed else 6
+    section_offsets = count_faces(chunk_voxels, padded, sections)
+    vertex_data = np.empty(section_offsets[-1] * quad_size * format_size, dtype='uint32')
+    used = add_greedy_faces(chunk_voxels, padded, sections, section_offsets, vertex_data, indexed, 1)
+    return vertex_data[:used].copy(), section_offsets
+
+@njit(nogil=True)
+def downsample_voxels(chunk_voxels, scale):
+    """
+    Coarsen a chunk to cells of scale³ voxels for a LOD mesh, kept at full resolution so the meshers
+    can mesh it as any chunk. A cell is solid when any of its voxels is, with the ID of its highest
+    solid voxel, so the coarse surface keeps the top material and never sinks below the real one.
+
+    Parameters:
+        chunk_voxels (array): The chunk's voxels.
+        scale (int): The cell edge, a divisor of CHUNK_SIZE.
+
+    Returns:
+        array: The coarsened CHUNK_VOL voxels.
+    """
+    coarse = np.empty(CHUNK_VOL, dtype='uint8')
+    for y0 in range(0, CHUNK_SIZE, scale):
+        for z0 in range(0, CHUNK_SIZE, scale):
+            for x0 in range(0, CHUNK_SIZE, scale):
+                voxel_id = 0
+                for y in range(y0 + scale - 1, y0 - 1, -1):
+                    for z in range(z0, z0 + scale):
+                        for x in range(x0, x0 + scale):
+                            if not voxel_id:
+                                voxel_id = chunk_voxels[x + CHUNK_SIZE * z + CHUNK_AREA * y]
+                    if voxel_id:
+                        break
+                for y in range(y0, y0 + scale):
+                    for z in range(z0, z0 + scale):
+                        row = CHUNK_SIZE * z + CHUNK_AREA * y
+                        coarse[row + x0: row + x0 + scale] = voxel_id
+    return coarse
+
+@njit(cache=True, nogil=True)
+def build_lod_mesh(chunk_voxels, format_size, chunk_pos, storage, chunk_columns, indexed, scale):
+    """
+    Generate the mesh of a distant chunk from its voxels coarsened to cells of scale³ voxels, see
+    downsample_voxels, merging faces as build_greedy_mesh does. Border faces are tested against the
+    real voxels of the neighbours, so wherever the coarse surface stands above a neighbour's, at any
+    level of detail, the wall between them is meshed as a skirt instead of leaving a crack.
+
+    Returns:
+        tuple: The vertex data and the quad offsets of its ranges, laid out like build_greedy_mesh's.
+    """
+    coarse = downsample_voxels(chunk_voxels, scale)
+    padded = np.empty(PADDED_VOL, dtype='uint8')
+    fill_padded_volume(coarse, chunk_pos, storage, chunk_columns, padded, ALL_SECTIONS)
+    quad_size = 4 if indexed else 6
+    section_offsets = count_faces(coarse, padded, ALL_SECTIONS)
+    vertex_data = np.empty(section_offsets[-1] * quad_size * format_size, dtype='uint32')
+    used = add_greedy_faces(coarse, padded, ALL_SECTIONS, section_offsets, vertex_data, indexed, scale)
+    return vertex_data[:used].copy(), section_offsets
+
+@njit(nogil=True)
+def get_mesh_voxels(storage, chunk_index, scale):
+    """Get the voxels a chunk is meshed from, coarsened when it is meshed at a level of detail."""
+    chunk_voxels = get_chunk_voxels(storage, chunk_index)
+    if scale > 1:
+        return downsample_voxels(chunk_voxels, scale)
+    return chunk_voxels
+
+def get_mesher_salt(greedy, scale, indexed):
+    """
+    Get the part of a mesh cache key naming how a chunk is meshed, see build_mesh_key.
+
+    Parameters:
+        greedy (bool): The world meshes with the greedy mesher.
+        scale (int): The chunk's LOD cell edge, meshed by build_lod_mesh past 1.
+        indexed (bool): Indexed quads are built.
+    """
+    greedy = greedy or scale > 1
+    return MESHER_VERSION << 16 | scale << 8 | greedy << 1 | indexed
+
+@njit
+def rotate_left(value, bits):
+    """Rotate a uint64 left."""
+    return (value << np.uint64(bits)) | (value >> np.uint64(64 - bits))
 
 @njit
-def build_chunk_mesh(chunk_voxels, format_size, chunk_pos, world_voxels):
-    """Generate the mesh data for a voxel chunk"""
-    vertex_data = np.empty(CHUNK_VOL * 18 * format_size, dtype='uint32')
+def mix_hash(value):
+    """Finalize a uint64 hash lane so every input bit affects every output bit."""
+    value ^= value >> np.uint64(33)
+    value *= np.uint64(0xff51afd7ed558ccd)
+    value ^= value >> np.uint64(33)
+    value *= np.uint64(0xc4ceb9fe1a85ec53)
+    value ^= value >> np.uint64(33)
+    return value
+
+@njit(cache=True, nogil=True)
+def build_mesh_key(storage, chunk_index, chunk_pos, chunk_columns, scale, salt):
+    """
+    Hash the voxels a whole-chunk mesh is built from, the chunk and its one-voxel border from the
+    neighbours, as the padded volume the meshers fill, along with the mesher salt. Equal keys mean
+    equal meshes, so meshes can be cached across runs. The hash has two independent 64-bit lanes
+    over the volume read as uint64 words.
+
+    Parameters:
+        storage (tuple): The world voxel storage, see voxel_storage.read_voxel.
+        chunk_index (int): The chunk table index.
+        chunk_pos (tuple): The chunk position in chunk coordinates.
+        chunk_columns (array): The column position held by each chunk table column.
+        scale (int): The chunk's LOD cell edge, 1 for full detail.
+        salt (int): The mesher salt, see get_mesher_salt.
+
+    Returns:
+        array: The two uint64 lanes of the key.
+    """
+    padded = np.empty(PADDED_VOL, dtype='uint8')
+    fill_padded_volume(get_mesh_voxels(storage, chunk_index, scale), chunk_pos, storage, chunk_columns, padded,
+                       ALL_SECTIONS)
+    words = padded.view(np.uint64)
+    h1 = np.uint64(salt) ^ np.uint64(0x9e3779b97f4a7c15)
+    h2 = np.uint64(salt) ^ np.uint64(0xc2b2ae3d27d4eb4f)
+    for i in range(len(words)):
+        word = words[i]
+        h1 = rotate_left(h1 ^ word * np.uint64(0x87c37b91114253d5), 31) * np.uint64(0x4cf5ad432745937f)
+        h2 = rotate_left(h2 ^ word * np.uint64(0x4cf5ad432745937f), 27) * np.uint64(0x87c37b91114253d5)
+    key = np.empty(2, dtype=np.uint64)
+    key[0] = mix_hash(h1)
+    key[1] = mix_hash(h2)
+    return key
+
+@njit(cache=True, parallel=True)
+def build_mesh_keys(chunk_indices, chunk_positions, scales, salts, storage, chunk_columns):
+    """
+    Hash the voxels of many chunks in parallel, see build_mesh_key.
+
+    Returns:
+        array: The [n, 2] uint64 key of each chunk.
+    """
+    keys = np.empty((len(chunk_indices), 2), dtype=np.uint64)
+    for i in prange(len(chunk_indices)):
+        chunk_pos = (chunk_positions[i, 0], chunk_positions[i, 1], chunk_positions[i, 2])
+        keys[i] = build_mesh_key(storage, chunk_indices[i], chunk_pos, chunk_columns, scales[i], salts[i])
+    return keys
+
+@njit(nogil=True)
+def add_greedy_faces(chunk_voxels, padded, sections, section_offsets, vertex_data, indexed, scale):
+    """
+    Write the merged faces of chunk sections into vertex data sized by count_faces, see build_greedy_mesh,
+    updating the section offsets to the merged quads. Voxels coarsened to cells of `scale` voxels can
+    only have faces on the cell sides, so only those layers are swept.
+
+    Returns:
+        int: The number of values written.
+    """
+    quad_size = 4 if indexed else 6
     index = 0
+    n = len(sections)
+    face_keys = np.empty((6, CHUNK_VOL), dtype='uint16')
+    layer_faces = np.zeros((6, n, SECTION_SIZE), dtype='int32')
+    fill_face_keys(chunk_voxels, padded, sections, face_keys, layer_faces)
+
+    for face_id in range(6):
+        nx, ny, nz = FACE_NORMALS[face_id]
+        # the face quads of a voxel layer lie on its far side for faces pointing up the axis
+        offset = 1 if nx + ny + nz > 0 else 0
+        keys = face_keys[face_id]  # swept cells are cleared as they are merged
+        step_a, step_b, step_layer = get_face_strides(face_id)
+
+        for i in range(n):
+            x0, y0, z0 = get_section_origin(sections[i])
+            layer0, a0, b0 = get_face_coords(face_id, x0, y0, z0)
+
+            for layer in range(layer0 + offset * (scale - 1), layer0 + SECTION_SIZE, scale):
+                remaining = layer_faces[face_id, i, layer - layer0]  # the sweep stops once all are merged
+                plane = layer * step_layer + a0 * step_a + b0 * step_b  # key index of the cell (a0, b0)
+                for a in range(SECTION_SIZE):
+                    if not remaining:
+                        break
+                    row = plane + a * step_a
+                    for b in range(SECTION_SIZE):
+                        key = keys[row + b * step_b]
+                        if not key:
+                            continue
+                        ao0, ao1, ao2, ao3 = (key >> 8) & 3, (key >> 10) & 3, (key >> 12) & 3, (key >> 14) & 3
+
+                        depth = 1
+                        if ao0 == ao3 and ao1 == ao2:
+                            while b + depth < SECTION_SIZE and keys[row + (b + depth) * step_b] == key:
+                                depth += 1
+                        width = 1
+                        if ao0 == ao1 and ao3 == ao2:
+                            while (a + width < SECTION_SIZE
+                                   and is_run_equal(keys, row + width * step_a + b * step_b, step_b, depth, key)):
+                                width += 1
+
+                        for i_a in range(width):
+                            for i_b in range(depth):
+                                keys[row + i_a * step_a + (b + i_b) * step_b] = 0
+                        remaining -= width * depth
+                        index = add_quad(vertex_data, index, face_id, layer + offset, a0 + a, b0 + b,
+                                         width, depth, key, indexed)
+            section_offsets[face_id * n + i + 1] = index // quad_size
+    return index
+
+@njit(cache=True, parallel=True)
+def build_world_meshes(chunk_indices, chunk_positions, scales, storage, chunk_columns, format_size, indexed, greedy):
+    """
+    Mesh whole chunks in parallel into one contiguous vertex arena, so they can be uploaded as a single
+    buffer. Faces are counted in a first pass to place every chunk; a second pass writes them with the
+    same functions as build_chunk_mesh, build_greedy_mesh and build_lod_mesh, so each chunk's range
+    holds exactly the vertex data they would build. Greedy and LOD meshes are allocated for their
+    unmerged faces and packed together by a third pass.
 
-    for x in range(CHUNK_SIZE):
-        for y in range(CHUNK_SIZE):
-            for z in range(CHUNK_SIZE):
-                voxel_id = chunk_voxels[x + CHUNK_SIZE * z + CHUNK_AREA * y]
-
-                if not voxel_id:
-                    continue
-
-                # voxel world position
-                cx, cy, cz = chunk_pos
-                wx = x + cx * CHUNK_SIZE
-                wy = y + cy * CHUNK_SIZE
-                wz = z + cz * CHUNK_SIZE
-
-                # top face
-                if is_void((x, y + 1, z), (wx, wy + 1, wz), world_voxels):
-                    # get ao values
-                    ao = get_ao((x, y + 1, z), (wx, wy + 1, wz), world_voxels, plane='Y')
-                    flip_id = ao[1] + ao[3] > ao[0] + ao[2]
-
-                    # format: x, y, z, voxel_id, face_id, ao_id, flip_id
-                    v0 = pack_data(x    , y + 1, z    , voxel_id, 0, ao[0], flip_id)
-                    v1 = pack_data(x + 1, y + 1, z    , voxel_id, 0, ao[1], flip_id)
-                    v2 = pack_data(x + 1, y + 1, z + 1, voxel_id, 0, ao[2], flip_id)
-                    v3 = pack_data(x    , y + 1, z + 1, voxel_id, 0, ao[3], flip_id)
-
-                    if flip_id:
-                        index = add_data(vertex_data, index, v1, v0, v3, v1, v3, v2)
-                    else:
-                        index = add_data(vertex_data, index, v0, v3, v2, v0, v2, v1)
-
-                # bottom face
-                if is_void((x, y - 1, z), (wx, wy - 1, wz), world_voxels):
-                    ao = get_ao((x, y - 1, z), (wx, wy - 1, wz), world_voxels, plane='Y')
-                    flip_id = ao[1] + ao[3] > ao[0] + ao[2]
-
-                    v0 = pack_data(x    , y, z    , voxel_id, 1, ao[0], flip_id)
-                    v1 = pack_data(x + 1, y, z    , voxel_id, 1, ao[1], flip_id)
-                    v2 = pack_data(x + 1, y, z + 1, voxel_id, 1, ao[2], flip_id)
-                    v3 = pack_data(x    , y, z + 1, voxel_id, 1, ao[3], flip_id)
-
-                    if flip_id:
-                        index = add_data(vertex_data, index, v1, v3, v0, v1, v2, v3)
-                    else:
-                        index = add_data(vertex_data, index, v0, v2, v3, v0, v1, v2)
-
-                # right face
-                if is_void((x + 1, y, z), (wx + 1, wy, wz), world_voxels):
-                    ao = get_ao((x + 1, y, z), (wx + 1, wy, wz), world_voxels, plane='X')
-                    flip_id = ao[1] + ao[3] > ao[0] + ao[2]
-
-                    v0 = pack_data(x + 1, y    , z    , voxel_id, 2, ao[0], flip_id)
-                    v1 = pack_data(x + 1, y + 1, z    , voxel_id, 2, ao[1], flip_id)
-                    v2 = pack_data(x + 1, y + 1, z + 1, voxel_id, 2, ao[2], flip_id)
-                    v3 = pack_data(x + 1, y    , z + 1, voxel_id, 2, ao[3], flip_id)
-
-                    if flip_id:
-                        index = add_data(vertex_data, index, v3, v0, v1, v3, v1, v2)
-                    else:
-                        index = add_data(vertex_data, index, v0, v1, v2, v0, v2, v3)
-
-                # left face
-                if is_void((x - 1, y, z), (wx - 1, wy, wz), world_voxels):
-                    ao = get_ao((x - 1, y, z), (wx - 1, wy, wz), world_voxels, plane='X')
-                    flip_id = ao[1] + ao[3] > ao[0] + ao[2]
-
-                    v0 = pack_data(x, y    , z    , voxel_id, 3, ao[0], flip_id)
-                    v1 = pack_data(x, y + 1, z    , voxel_id, 3, ao[1], flip_id)
-                    v2 = pack_data(x, y + 1, z + 1, voxel_id, 3, ao[2], flip_id)
-                    v3 = pack_data(x, y    , z + 1, voxel_id, 3, ao[3], flip_id)
-
-                    if flip_id:
-                        index = add_data(vertex_data, index, v3, v1, v0, v3, v2, v1)
-                    else:
-                        index = add_data(vertex_data, index, v0, v2, v1, v0, v3, v2)
-
-                # back face
-                if is_void((x, y, z - 1), (wx, wy, wz - 1), world_voxels):
-                    ao = get_ao((x, y, z - 1), (wx, wy, wz - 1), world_voxels, plane='Z')
-                    flip_id = ao[1] + ao[3] > ao[0] + ao[2]
-
-                    v0 = pack_data(x,     y,     z, voxel_id, 4, ao[0], flip_id)
-                    v1 = pack_data(x,     y + 1, z, voxel_id, 4, ao[1], flip_id)
-                    v2 = pack_data(x + 1, y + 1, z, voxel_id, 4, ao[2], flip_id)
-                    v3 = pack_data(x + 1, y,     z, voxel_id, 4, ao[3], flip_id)
-
-                    if flip_id:
-                        index = add_data(vertex_data, index, v3, v0, v1, v3, v1, v2)
-                    else:
-                        index = add_data(vertex_data, index, v0, v1, v2, v0, v2, v3)
-
-                # front face
-                if is_void((x, y, z + 1), (wx, wy, wz + 1), world_voxels):
-                    ao = get_ao((x, y, z + 1), (wx, wy, wz + 1), world_voxels, plane='Z')
-                    flip_id = ao[1] + ao[3] > ao[0] + ao[2]
-
-                    v0 = pack_data(x    , y    , z + 1, voxel_id, 5, ao[0], flip_id)
-                    v1 = pack_data(x    , y + 1, z + 1, voxel_id, 5, ao[1], flip_id)
-                    v2 = pack_data(x + 1, y + 1, z + 1, voxel_id, 5, ao[2], flip_id)
-                    v3 = pack_data(x + 1, y    , z + 1, voxel_id, 5, ao[3], flip_id)
-
-                    if flip_id:
-                        index = add_data(vertex_data, index, v3, v1, v0, v3, v2, v1)
-                    else:
-                        index = add_data(vertex_data, index, v0, v2, v1, v0, v3, v2)
-    return vertex_data[:index + 1]
+    Parameters:
+        chunk_indices (array): The chunk table index of each chunk.
+        chunk_positions (array): The [n, 3] chunk position of each chunk.
+        scales (array): The LOD cell edge of each chunk, 1 for full detail.
+        storage (tuple): The world voxel storage, see voxel_storage.read_voxel.
+        chunk_columns (array): The column position held by each chunk table column.
+        format_size (int): The number of values per vertex.
+        indexed (bool): Build indexed quads, see build_quad_indices.
+        greedy (bool): Merge faces as build_greedy_mesh does.
+
+    Returns:
+        tuple: The vertex arena, the offset and the number of values of each chunk's range in it,
+        and the [n, 6 * CHUNK_SECTIONS + 1] section offsets of each chunk.
+    """
+    n = len(chunk_indices)
+    quad_size = 4 if indexed else 6
+    section_offsets = np.empty((n, 6 * CHUNK_SECTIONS + 1), dtype='int32')
+    for i in prange(n):
+        chunk_voxels = get_mesh_voxels(storage, chunk_indices[i], scales[i])
+        padded = np.empty(PADDED_VOL, dtype='uint8')
+        chunk_pos = (chunk_positions[i, 0], chunk_positions[i, 1], chunk_positions[i, 2])
+        fill_padded_volume(chunk_voxels, chunk_pos, storage, chunk_columns, padded, ALL_SECTIONS)
+        section_offsets[i] = count_faces(chunk_voxels, padded, ALL_SECTIONS)
+
+    counts = section_offsets[:, -1].astype(np.int64) * quad_size * format_size
+    offsets = np.zeros(n, dtype=np.int64)
+    offsets[1:] = np.cumsum(counts)[:-1]
+    arena = np.empty(offsets[-1] + counts[-1] if n else 0, dtype='uint32')
+    for i in prange(n):
+        chunk_voxels = get_mesh_voxels(storage, chunk_indices[i], scales[i])
+        padded = np.empty(PADDED_VOL, dtype='uint8')
+        chunk_pos = (chunk_positions[i, 0], chunk_positions[i, 1], chunk_positions[i, 2])
+        fill_padded_volume(chunk_voxels, chunk_pos, storage, chunk_columns, padded, ALL_SECTIONS)
+        vertex_data = arena[offsets[i]: offsets[i] + counts[i]]
+        if greedy or scales[i] > 1:
+            add_greedy_faces(chunk_voxels, padded, ALL_SECTIONS, section_offsets[i], vertex_data, indexed, scales[i])
+        else:
+            add_chunk_faces(chunk_voxels, padded, ALL_SECTIONS, section_offsets[i], vertex_data, indexed)
+    if not greedy and not np.any(scales > 1):
+        return arena, offsets, counts, section_offsets
+
+    packed_counts = section_offsets[:, -1].astype(np.int64) * quad_size * format_size
+    packed_offsets = np.zeros(n, dtype=np.int64)
+    packed_offsets[1:] = np.cumsum(packed_counts)[:-1]
+    packed = np.empty(packed_offsets[-1] + packed_counts[-1] if n else 0, dtype='uint32')
+    for i in prange(n):
+        packed[packed_offsets[i]: packed_offsets[i] + packed_counts[i]] = arena[offsets[i]: offsets[i] + packed_counts[i]]
+    return packed, packed_offsets, packed_counts, section_offsets
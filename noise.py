@@ -1,6 +1,12 @@
+import math
+import numpy as np
 from settings import SEED
-from numba import njit
+from numba import njit, prange
 from opensimplex.internals import _noise2, _noise3, _init
+from opensimplex.constants import (
+    GRADIENTS2, GRADIENTS3, NORM_CONSTANT2, NORM_CONSTANT3,
+    STRETCH_CONSTANT2, SQUISH_CONSTANT2, STRETCH_CONSTANT3, SQUISH_CONSTANT3
+)
 
 # Initializes the permutation tables using the predefined seed
 perm, perm_grad_index3 = _init(seed=SEED)
@@ -33,3 +39,176 @@ def noise3(x, y, z):
         float: Noise value at (x, y, z).
     """
     return _noise3(x, y, z, perm, perm_grad_index3)
+
+
+@njit(cache=True)
+def get_axis_step(axis):
+    """Returns the spacing of an evenly spaced ascending axis, or 1 for a single sample."""
+    return axis[1] - axis[0] if axis.size > 1 else 1.0
+
+@njit(cache=True)
+def get_index_range(axis, center, half_width):
+    """
+    Returns the first and last index of an evenly spaced axis within half_width of center,
+    widened by one sample each way against rounding and clamped to the axis.
+    """
+    step = get_axis_step(axis)
+    first = max(int(math.ceil((center - half_width - axis[0]) / step)) - 1, 0)
+    last = min(int(math.floor((center + half_width - axis[0]) / step)) + 1, axis.size - 1)
+    return first, last
+
+@njit(cache=True)
+def get_box_distance(value, low, high):
+    """Returns the distance from value to the [low, high] interval along one axis."""
+    return max(low - value, value - high, 0.0)
+
+@njit(cache=True)
+def get_lattice2(xs, ys):
+    """
+    Lists the 2D lattice vertices whose radius of influence reaches the grid of two axes.
+
+    Parameters:
+        xs (ndarray): The evenly spaced ascending x-coordinates of the grid.
+        ys (ndarray): The evenly spaced ascending y-coordinates of the grid.
+
+    Returns:
+        ndarray: One [x, y, gradient x, gradient y] row per vertex, the gradient pre-divided by the norm.
+    """
+    x0, x1, y0, y1 = xs[0], xs[-1], ys[0], ys[-1]
+    # Stretched coordinates are linear in x and y, so the box corners bound them
+    s0, s1 = (x0 + y0) * STRETCH_CONSTANT2, (x1 + y1) * STRETCH_CONSTANT2
+    a0, a1 = math.floor(x0 + min(s0, s1)) - 3, math.floor(x1 + max(s0, s1)) + 3
+    b0, b1 = math.floor(y0 + min(s0, s1)) - 3, math.floor(y1 + max(s0, s1)) + 3
+
+    lattice = np.empty(((a1 - a0 + 1) * (b1 - b0 + 1), 4))
+    count = 0
+    for a in range(a0, a1 + 1):
+        for b in range(b0, b1 + 1):
+            squish = (a + b) * SQUISH_CONSTANT2
+            px, py = a + squish, b + squish
+            dx, dy = get_box_distance(px, x0, x1), get_box_distance(py, y0, y1)
+            if dx * dx + dy * dy >= 2:
+                continue
+            index = perm[(perm[a & 0xFF] + b) & 0xFF] & 0x0E
+            lattice[count] = px, py, GRADIENTS2[index] / NORM_CONSTANT2, GRADIENTS2[index + 1] / NORM_CONSTANT2
+            count += 1
+    return lattice[:count]
+
+@njit(cache=True)
+def get_lattice3(xs, ys, zs):
+    """
+    Lists the 3D lattice vertices whose radius of influence reaches the grid of three axes.
+
+    Parameters:
+        xs, ys, zs (ndarray): The evenly spaced ascending coordinates of the grid along each axis.
+
+    Returns:
+        ndarray: One [x, y, z, gradient x, gradient y, gradient z] row per vertex, the gradient pre-divided by the norm.
+    """
+    x0, x1, y0, y1, z0, z1 = xs[0], xs[-1], ys[0], ys[-1], zs[0], zs[-1]
+    s0, s1 = (x0 + y0 + z0) * STRETCH_CONSTANT3, (x1 + y1 + z1) * STRETCH_CONSTANT3
+    a0, a1 = math.floor(x0 + min(s0, s1)) - 3, math.floor(x1 + max(s0, s1)) + 3
+    b0, b1 = math.floor(y0 + min(s0, s1)) - 3, math.floor(y1 + max(s0, s1)) + 3
+    c0, c1 = math.floor(z0 + min(s0, s1)) - 3, math.floor(z1 + max(s0, s1)) + 3
+
+    lattice = np.empty(((a1 - a0 + 1) * (b1 - b0 + 1) * (c1 - c0 + 1), 6))
+    count = 0
+    for a in range(a0, a1 + 1):
+        for b in range(b0, b1 + 1):
+            for c in range(c0, c1 + 1):
+                squish = (a + b + c) * SQUISH_CONSTANT3
+                px, py, pz = a + squish, b + squish, c + squish
+                dx = get_box_distance(px, x0, x1)
+                dy = get_box_distance(py, y0, y1)
+                dz = get_box_distance(pz, z0, z1)
+                if dx * dx + dy * dy + dz * dz >= 2:
+                    continue
+                index = perm_grad_index3[(perm[(perm[a & 0xFF] + b) & 0xFF] + c) & 0xFF]
+                lattice[count] = (
+                    px, py, pz,
+                    GRADIENTS3[index] / NORM_CONSTANT3,
+                    GRADIENTS3[index + 1] / NORM_CONSTANT3,
+                    GRADIENTS3[index + 2] / NORM_CONSTANT3
+                )
+                count += 1
+    return lattice[:count]
+
+@njit(cache=True, parallel=True)
+def noise2_grid(xs, ys, out):
+    """
+    Evaluates 2D OpenSimplex noise over the grid spanned by two evenly spaced ascending axes.
+
+    Rather than locating every sample in the lattice, the gradient of each lattice vertex near
+    the grid is hashed once, and its contribution added to every sample within its radius of
+    influence. Each row only visits the samples its vertices reach, with no per-sample floors,
+    hashes or branches on the simplex region. Matches noise2 up to the order of summation.
+
+    Parameters:
+        xs (ndarray): The x-coordinates of the grid columns.
+        ys (ndarray): The y-coordinates of the grid rows.
+        out (ndarray): The [len(ys), len(xs)] output array, out[j, i] = noise2(xs[i], ys[j]).
+    """
+    lattice = get_lattice2(xs, ys)
+    for j in prange(ys.size):
+        y = ys[j]
+        row = out[j]
+        row[:] = 0.0
+        for v in range(lattice.shape[0]):
+            px, py, gx, gy = lattice[v, 0], lattice[v, 1], lattice[v, 2], lattice[v, 3]
+            dy = y - py
+            reach = 2 - dy * dy
+            if reach <= 0:
+                continue
+            first, last = get_index_range(xs, px, math.sqrt(reach))
+            dot_y = gy * dy
+            for i in range(first, last + 1):
+                dx = xs[i] - px
+                attn = reach - dx * dx
+                if attn > 0:
+                    attn *= attn
+                    row[i] += attn * attn * (gx * dx + dot_y)
+
+@njit(cache=True, parallel=True)
+def noise3_grid(xs, ys, zs, out):
+    """
+    Evaluates 3D OpenSimplex noise over the grid spanned by three evenly spaced ascending axes.
+
+    Works as noise2_grid, one y slice at a time. The scalar noise3 leaves out a few vertices at
+    the very edge of their radius of influence, so the two differ by up to about 1e-4.
+
+    The output layout matches chunk voxel indexing (x + CHUNK_SIZE * z + CHUNK_AREA * y),
+    so a chunk-sized field can be read with the same index as the voxel array.
+
+    Parameters:
+        xs (ndarray): The x-coordinates of the grid.
+        ys (ndarray): The y-coordinates of the grid.
+        zs (ndarray): The z-coordinates of the grid.
+        out (ndarray): The [len(ys), len(zs), len(xs)] output array, out[k, j, i] = noise3(xs[i], ys[k], zs[j]).
+    """
+    lattice = get_lattice3(xs, ys, zs)
+    for k in prange(ys.size):
+        y = ys[k]
+        layer = out[k]
+        layer[:] = 0.0
+        for v in range(lattice.shape[0]):
+            px, py, pz = lattice[v, 0], lattice[v, 1], lattice[v, 2]
+            gx, gy, gz = lattice[v, 3], lattice[v, 4], lattice[v, 5]
+            dy = y - py
+            reach_y = 2 - dy * dy
+            if reach_y <= 0:
+                continue
+            z_first, z_last = get_index_range(zs, pz, math.sqrt(reach_y))
+            for j in range(z_first, z_last + 1):
+                dz = zs[j] - pz
+                reach = reach_y - dz * dz
+                if reach <= 0:
+                    continue
+                first, last = get_index_range(xs, px, math.sqrt(reach))
+                dot_yz = gy * dy + gz * dz
+                row = layer[j]
+                for i in range(first, last + 1):
+                    dx = xs[i] - px
+                    attn = reach - dx * dx
+                    if attn > 0:
+                        attn *= attn
+                        row[i] += attn * attn * (gx * dx + dot_yz)
@@ -0,0 +1,192 @@
+from settings import *
+from numba import prange
+from voxel_storage import get_chunk_index, get_chunk_voxels
+
+# Chunk faces in mesher order: top, bottom, right, left, back, front
+FACE_DIRECTIONS = np.array([(0, 1, 0), (0, -1, 0), (1, 0, 0), (-1, 0, 0), (0, 0, -1), (0, 0, 1)], dtype='int32')
+OPPOSITE_FACES = np.array([1, 0, 3, 2, 5, 4], dtype='int32')
+ANY_FACE = 6  # Entry face of the camera's chunk, connected to the faces its air region touches
+ALL_FACES = (1 << 6) - 1
+# Face pairs are bit a * 6 + b of a chunk's connectivity, set along with b * 6 + a
+ALL_CONNECTED = (1 << 36) - 1  # Connectivity of a chunk of air
+NOT_CONNECTED = 0  # Connectivity of a chunk without air
+
+
+@njit(nogil=True)
+def fill_region(chunk_voxels, start, visited, stack):
+    """
+    Flood fills the air region of a chunk holding a voxel.
+
+    Parameters:
+        chunk_voxels (np.array): The CHUNK_VOL voxel IDs of the chunk.
+        start (int): The voxel index of an air voxel.
+        visited (np.array): The voxels filled so far, updated.
+        stack (np.array): CHUNK_VOL scratch voxel indices.
+
+    Returns:
+        int: The faces the region touches, as bits.
+    """
+    last = CHUNK_SIZE - 1
+    visited[start] = True
+    stack[0] = start
+    top = 1
+    faces = 0
+    while top:
+        top -= 1
+        index = stack[top]
+        x, z, y = index % CHUNK_SIZE, index // CHUNK_SIZE % CHUNK_SIZE, index // CHUNK_AREA
+        faces |= (int(y == last) | int(y == 0) << 1 | int(x == last) << 2 | int(x == 0) << 3
+                  | int(z == 0) << 4 | int(z == last) << 5)
+        for face_id in range(6):
+            dx, dy, dz = FACE_DIRECTIONS[face_id]
+            nx, ny, nz = x + dx, y + dy, z + dz
+            if not (0 <= nx < CHUNK_SIZE and 0 <= ny < CHUNK_SIZE and 0 <= nz < CHUNK_SIZE):
+                continue
+            neighbour = nx + CHUNK_SIZE * nz + CHUNK_AREA * ny
+            if not visited[neighbour] and not chunk_voxels[neighbour]:
+                visited[neighbour] = True
+                stack[top] = neighbour
+                top += 1
+    return faces
+
+
+@njit(cache=True)
+def get_region_faces(chunk_voxels, voxel_index, region):
+    """
+    Finds the faces of a chunk the camera can see out of from inside it.
+
+    Parameters:
+        chunk_voxels (np.array): The CHUNK_VOL voxel IDs of the chunk.
+        voxel_index (int): The voxel index holding the camera.
+        region (np.array): CHUNK_VOL bools, set to the air region holding the voxel, or to the voxel alone
+            when it is solid, so the result holds for every voxel set.
+
+    Returns:
+        int: The faces touched by the air region holding the voxel, as bits; every face when it is solid.
+    """
+    region[:] = False
+    if chunk_voxels[voxel_index]:
+        region[voxel_index] = True
+        return ALL_FACES
+    stack = np.empty(CHUNK_VOL, dtype=np.int32)
+    return fill_region(chunk_voxels, voxel_index, region, stack)
+
+
+@njit(cache=True, nogil=True)
+def get_connectivity(chunk_voxels):
+    """
+    Flood fills the air of a chunk from its faces to find which pairs of faces are connected
+    through it, so a chunk seen through one face can only reveal chunks behind the faces
+    connected to it.
+
+    Parameters:
+        chunk_voxels (np.array): The CHUNK_VOL voxel IDs of the chunk.
+
+    Returns:
+        int: The face pair bits, see ALL_CONNECTED.
+    """
+    air = 0
+    for i in range(CHUNK_VOL):
+        air += chunk_voxels[i] == 0
+    if air == 0:
+        return NOT_CONNECTED
+    if air == CHUNK_VOL:
+        return ALL_CONNECTED
+
+    visited = np.zeros(CHUNK_VOL, dtype=np.bool_)
+    stack = np.empty(CHUNK_VOL, dtype=np.int32)
+    connectivity = 0
+    last = CHUNK_SIZE - 1
+    for start in range(CHUNK_VOL):
+        if visited[start] or chunk_voxels[start]:
+            continue
+        x, z, y = start % CHUNK_SIZE, start // CHUNK_SIZE % CHUNK_SIZE, start // CHUNK_AREA
+        if 0 < x < last and 0 < y < last and 0 < z < last:
+            continue  # only regions touching a face can connect faces
+
+        faces = fill_region(chunk_voxels, start, visited, stack)
+        for a in range(6):
+            if faces >> a & 1:
+                for b in range(6):
+                    if faces >> b & 1:
+                        connectivity |= 1 << (a * 6 + b)
+    return connectivity
+
+
+@njit(cache=True, parallel=True)
+def build_connectivity(chunk_indices, storage, connectivity):
+    """
+    Finds the face connectivity of many chunks in parallel, see get_connectivity.
+
+    Parameters:
+        chunk_indices (np.array): The chunk table indices.
+        storage (tuple): The world voxel storage, see voxel_storage.read_voxel.
+        connectivity (np.array): The connectivity of every chunk of the table, written at chunk_indices.
+    """
+    for i in prange(len(chunk_indices)):
+        connectivity[chunk_indices[i]] = get_connectivity(get_chunk_voxels(storage, chunk_indices[i]))
+
+
+@njit(cache=True)
+def find_visible_chunks(seeds, seed_faces, connectivity, in_frustum, chunk_columns, camera_faces=ALL_FACES):
+    """
+    Walks the chunk graph breadth first from the chunks holding the camera, crossing from a chunk
+    to its neighbour only through a face connected to the one it was entered by, into a neighbour
+    within the frustum, and never back toward the camera along an axis already walked away from.
+    Each chunk is expanded once per entry face, so every opening into it is followed.
+
+    Parameters:
+        seeds (np.array): The chunk table indices the walk starts at.
+        seed_faces (np.array): The face each seed is entered by, ANY_FACE for the camera's chunk.
+        connectivity (np.array): The face connectivity of every chunk of the table.
+        in_frustum (np.array): Whether each chunk of the table is within the frustum.
+        chunk_columns (np.array): The column position held by each chunk table column.
+        camera_faces (int): The faces the camera's chunk is left by, see get_region_faces.
+
+    Returns:
+        np.array: The chunk table indices reached, in walk order.
+    """
+    reached = np.zeros(len(connectivity), dtype=np.uint8)  # Entry faces each chunk was expanded by
+    queue = np.empty(7 * len(connectivity), dtype=np.int32)
+    entries = np.empty(len(queue), dtype=np.int32)
+    directions = np.empty(len(queue), dtype=np.int32)  # Faces crossed on the way, as bits
+    visible = np.empty(len(connectivity), dtype=np.int32)
+    head = tail = count = 0
+    for i in range(len(seeds)):
+        chunk_index, entry = seeds[i], seed_faces[i]
+        if reached[chunk_index] >> entry & 1:
+            continue
+        if not reached[chunk_index]:
+            visible[count] = chunk_index
+            count += 1
+        reached[chunk_index] |= 1 << entry
+        queue[tail], entries[tail], directions[tail] = chunk_index, entry, 0
+        tail += 1
+
+    while head < tail:
+        chunk_index, entry, walked = queue[head], entries[head], directions[head]
+        head += 1
+        column = chunk_index % WORLD_AREA
+        cx, cy, cz = chunk_columns[column, 0], chunk_index // WORLD_AREA, chunk_columns[column, 1]
+        for face_id in range(6):
+            if walked >> OPPOSITE_FACES[face_id] & 1:
+                continue
+            if entry == ANY_FACE:
+                if not camera_faces >> face_id & 1:
+                    continue
+            elif not connectivity[chunk_index] >> (entry * 6 + face_id) & 1:
+                continue
+            dx, dy, dz = FACE_DIRECTIONS[face_id]
+            neighbour = get_chunk_index(cx + dx, cy + dy, cz + dz, chunk_columns)
+            if neighbour == -1 or not in_frustum[neighbour]:
+                continue
+            neighbour_entry = OPPOSITE_FACES[face_id]
+            if reached[neighbour] >> neighbour_entry & 1:
+                continue
+            if not reached[neighbour]:
+                visible[count] = neighbour
+                count += 1
+            reached[neighbour] |= 1 << neighbour_entry
+            queue[tail], entries[tail], directions[tail] = neighbour, neighbour_entry, walked | 1 << face_id
+            tail += 1
+    return visible[:count]
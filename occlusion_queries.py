@@ -0,0 +1,142 @@
+from settings import *
+
+QUERY_SLOTS = QUERY_LATENCY + 1  # Queries kept per chunk: this frame's, last frame's and those awaiting readback
+BOX_MARGIN = 0.5  # Boxes are grown so they never tie in depth with the faces on a chunk's border
+NEAR_MARGIN = BOX_MARGIN + 1.0  # Camera distance to a box within which the near plane may clip it
+NOT_ISSUED = np.iinfo(np.int64).min  # Issue frame of a query slot not holding a query
+
+# Unit cube corners and triangles, wound counter-clockwise seen from outside, as CubeMesh
+BOX_CORNERS = [
+    (0, 0, 1), (1, 0, 1), (1, 1, 1), (0, 1, 1),
+    (0, 1, 0), (0, 0, 0), (1, 0, 0), (1, 1, 0)
+]
+BOX_TRIANGLES = [
+    (0, 2, 3), (0, 1, 2),
+    (1, 7, 2), (1, 6, 7),
+    (6, 5, 4), (4, 7, 6),
+    (3, 4, 5), (3, 5, 0),
+    (3, 7, 4), (3, 2, 7),
+    (0, 6, 1), (0, 5, 6)
+]
+
+
+def get_box_vertices():
+    """Returns the positions of the unit cube triangles, as uint8."""
+    return np.array([BOX_CORNERS[i] for triangle in BOX_TRIANGLES for i in triangle], dtype='uint8')
+
+
+class OcclusionQueries:
+    """
+    Draws chunks conditionally on hardware occlusion queries. Once the chunks of a frame are drawn,
+    the bounding box of each is drawn inside a samples-passed query against the frame's depth, with
+    color and depth writes off. The next frame draws the chunk inside a conditional render on that
+    query, so the GPU skips chunks whose box passed no samples without the CPU waiting on the result.
+    Chunks without a query from the previous frame, or close enough to the camera for the near plane
+    to clip their box, are drawn unconditionally. A chunk hidden last frame that comes into view is
+    drawn one frame late.
+
+    Query results are only read back QUERY_LATENCY frames after they were issued, for the counters,
+    so they are complete by then and reading them does not stall.
+
+    Attributes:
+        samples_passed (int): Samples passed by the boxes read back in the last frame.
+        skipped_chunks (int): Chunks among them whose box passed no samples, skipped by the frame after.
+        boxes_drawn (int): Boxes queried in the last frame, each a draw call and a uniform upload.
+    """
+    def __init__(self, ctx, program, chunk_count):
+        """
+        Creates the box geometry and the query table.
+
+        Parameters:
+            ctx: The OpenGL context.
+            program: The chunk_box shader program, with its camera matrices kept up to date.
+            chunk_count (int): The size of the chunk table.
+        """
+        self.ctx = ctx
+        self.program = program
+        self.program['box_size'] = CHUNK_SIZE + 2 * BOX_MARGIN
+        self.vao = ctx.vertex_array(program, [(ctx.buffer(get_box_vertices()), '3u1', 'in_position')])
+        self.queries = [[None] * QUERY_SLOTS for _ in range(chunk_count)]  # Created on first use
+        self.issued = np.full([QUERY_SLOTS, chunk_count], NOT_ISSUED, dtype='int64')  # Frame each query was last issued in
+        self.queried = [np.empty(0, dtype='int32') for _ in range(QUERY_SLOTS)]  # Chunks queried in each slot
+        self.frame = 0
+        self.samples_passed = 0
+        self.skipped_chunks = 0
+        self.boxes_drawn = 0
+
+    def reset(self, chunk_index):
+        """
+        Forgets the queries of a chunk, so a new chunk loaded at its index is drawn unconditionally first.
+
+        Parameters:
+            chunk_index (int): The chunk table index.
+        """
+        self.issued[:, chunk_index] = NOT_ISSUED
+
+    def render(self, chunk_indices, centers, position, draw):
+        """
+        Draws chunks, each conditionally on its query from the previous frame, then queries their boxes.
+
+        Parameters:
+            chunk_indices (np.array): The chunk table indices to draw.
+            centers (np.array): The center of every chunk of the table.
+            position (glm.vec3): The camera position.
+            draw (callable): Draws the chunk at a table index.
+
+        Returns:
+            list: What draw returned for each chunk.
+        """
+        frame = self.frame
+        self.frame += 1
+        slot, previous = frame % QUERY_SLOTS, (frame - 1) % QUERY_SLOTS
+        self.read_back((frame - QUERY_LATENCY) % QUERY_SLOTS, frame - QUERY_LATENCY)
+
+        offsets = np.abs(centers[chunk_indices] - np.array(position, dtype='float32'))
+        near = (offsets <= H_CHUNK_SIZE + NEAR_MARGIN).all(axis=1)
+        conditional = (self.issued[previous, chunk_indices] == frame - 1) & ~near
+        results = []
+        for chunk_index, is_conditional in zip(chunk_indices.tolist(), conditional.tolist()):
+            if is_conditional:
+                with self.queries[chunk_index][previous].crender:
+                    results.append(draw(chunk_index))
+            else:
+                results.append(draw(chunk_index))
+
+        queried = chunk_indices[~near]
+        box_mins = centers[queried] - (H_CHUNK_SIZE + BOX_MARGIN)
+        fbo = self.ctx.fbo
+        color_mask, depth_mask = fbo.color_mask, fbo.depth_mask
+        fbo.color_mask, fbo.depth_mask = (False, False, False, False), False
+        fbo.use()  # masks are applied when the framebuffer is bound
+        box_min = self.program['box_min']
+        for i, chunk_index in enumerate(queried.tolist()):
+            query = self.queries[chunk_index][slot]
+            if query is None:
+                query = self.queries[chunk_index][slot] = self.ctx.query(samples=True)
+            box_min.write(box_mins[i])
+            with query:
+                self.vao.render()
+        fbo.color_mask, fbo.depth_mask = color_mask, depth_mask
+        fbo.use()
+        self.issued[slot, queried] = frame
+        self.queried[slot] = queried
+        self.boxes_drawn = len(queried)
+        return results
+
+    def read_back(self, slot, frame):
+        """
+        Reads the results of the queries issued in a past frame into the counters.
+
+        Parameters:
+            slot (int): The query slot of the frame.
+            frame (int): The frame the queries were issued in.
+        """
+        samples = skipped = 0
+        for chunk_index in self.queried[slot].tolist():
+            if self.issued[slot, chunk_index] != frame:
+                continue  # reset since
+            passed = self.queries[chunk_index][slot].samples
+            samples += passed
+            skipped += passed == 0
+        self.samples_passed = samples
+        self.skipped_chunks = skipped
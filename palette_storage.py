@@ -0,0 +1,329 @@
+from settings import *
+
+# Every chunk stores a palette of the voxel IDs it holds and, per voxel, its palette index
+# packed into uint32 words at 1, 2, 4 or 8 bits. All chunks share one flat word buffer;
+# a chunk widens to the next bit width when a new ID overflows its palette, and narrows
+# once edits leave fewer IDs in use, moving to a fresh region of the buffer. Uniform chunks point at a shared run of zero words at 1 bit,
+# so reads never need to special-case them.
+PALETTE_BITS = (1, 2, 4, 8)
+MAX_PALETTE = 256
+ZERO_WORDS = CHUNK_VOL // 32  # The shared region of uniform chunks
+
+
+def get_bits(palette_size):
+    """
+    Returns the narrowest packing width that can index a palette.
+
+    Parameters:
+        palette_size (int): The number of IDs in the palette.
+    """
+    for bits in PALETTE_BITS:
+        if palette_size <= 1 << bits:
+            return bits
+    raise ValueError(f'palette of {palette_size} IDs does not fit in 8 bits')
+
+
+def get_words(bits):
+    """Returns the number of uint32 words holding a chunk packed at `bits` bits per voxel."""
+    return CHUNK_VOL * int(bits) // 32
+
+
+@njit
+def get_packed_entry(words, offset, width, voxel_index):
+    """
+    Reads the palette index of one voxel of a packed chunk. Entries never straddle words since the width divides 32.
+
+    Parameters:
+        words (ndarray): The flat uint32 word buffer.
+        offset (int): The chunk's first word.
+        width (int): The chunk's packing width.
+        voxel_index (int): The voxel index within the chunk.
+    """
+    bit = voxel_index * width
+    return (words[offset + (bit >> 5)] >> (bit & 31)) & ((1 << width) - 1)
+
+
+@njit
+def get_packed_voxel(words, offsets, bits, palettes, chunk_index, voxel_index):
+    """
+    Reads one voxel ID from a packed chunk.
+
+    Parameters:
+        words (ndarray): The flat uint32 word buffer.
+        offsets (ndarray): The first word of each chunk.
+        bits (ndarray): The packing width of each chunk.
+        palettes (ndarray): The [chunks, MAX_PALETTE] palette of each chunk.
+        chunk_index (int): The chunk.
+        voxel_index (int): The voxel index within the chunk.
+
+    Returns:
+        int: The voxel ID.
+    """
+    return palettes[chunk_index, get_packed_entry(words, offsets[chunk_index], bits[chunk_index], voxel_index)]
+
+
+@njit
+def set_packed_entry(words, offset, width, voxel_index, entry):
+    """
+    Writes the palette index of one voxel of a packed chunk.
+
+    Parameters:
+        words (ndarray): The flat uint32 word buffer.
+        offset (int): The chunk's first word.
+        width (int): The chunk's packing width.
+        voxel_index (int): The voxel index within the chunk.
+        entry (int): The palette index.
+    """
+    bit = voxel_index * width
+    word = offset + (bit >> 5)
+    shift = bit & 31
+    mask = ((1 << width) - 1) << shift
+    words[word] = (words[word] & ~mask) | (entry << shift)
+
+
+@njit
+def build_palette(voxels, palette, lookup, counts):
+    """
+    Collects the distinct IDs of a dense chunk in order of appearance.
+
+    Parameters:
+        voxels (ndarray): The dense CHUNK_VOL voxel array.
+        palette (ndarray): The MAX_PALETTE output palette.
+        lookup (ndarray): The MAX_PALETTE output map from voxel ID to palette index.
+        counts (ndarray): The MAX_PALETTE output number of voxels holding each palette index.
+
+    Returns:
+        int: The palette size.
+    """
+    lookup[:] = -1
+    counts[:] = 0
+    size = 0
+    for i in range(CHUNK_VOL):
+        voxel_id = voxels[i]
+        if lookup[voxel_id] == -1:
+            lookup[voxel_id] = size
+            palette[size] = voxel_id
+            size += 1
+        counts[lookup[voxel_id]] += 1
+    return size
+
+
+@njit
+def pack_entries(voxels, lookup, words, offset, width):
+    """
+    Packs the palette indices of a dense chunk into its word region.
+
+    Parameters:
+        voxels (ndarray): The dense CHUNK_VOL voxel array.
+        lookup (ndarray): The map from voxel ID to palette index.
+        words (ndarray): The flat uint32 word buffer.
+        offset (int): The chunk's first word.
+        width (int): The packing width.
+    """
+    per_word = 32 // width
+    for w in range(CHUNK_VOL // per_word):
+        word = 0
+        base = w * per_word
+        for k in range(per_word):
+            word |= lookup[voxels[base + k]] << (k * width)
+        words[offset + w] = word
+
+
+@njit
+def unpack_entries(words, offset, width, palette, out):
+    """
+    Expands a packed chunk into a dense voxel array.
+
+    Parameters:
+        words (ndarray): The flat uint32 word buffer.
+        offset (int): The chunk's first word.
+        width (int): The packing width.
+        palette (ndarray): The chunk's palette.
+        out (ndarray): The dense CHUNK_VOL voxel array to fill.
+    """
+    per_word = 32 // width
+    mask = (1 << width) - 1
+    for w in range(CHUNK_VOL // per_word):
+        word = words[offset + w]
+        base = w * per_word
+        for k in range(per_word):
+            out[base + k] = palette[(word >> (k * width)) & mask]
+
+
+class PaletteStore:
+    """
+    Palette-compressed, bit-packed voxel storage for every chunk of the chunk table.
+
+    The arrays are exposed as `storage` for the njit readers; `words` is replaced when it
+    grows or is compacted, so readers must take the tuple again rather than keep it.
+    """
+    def __init__(self, chunks):
+        """
+        Initializes the store with every chunk uniform air.
+
+        Parameters:
+            chunks (int): The number of chunks, indexed like the chunk table.
+        """
+        self.words = np.zeros(ZERO_WORDS, dtype='uint32')
+        self.used = ZERO_WORDS  # Words allocated, including dead regions
+        self.live = ZERO_WORDS  # Words held by chunks
+        self.offsets = np.zeros(chunks, dtype='int64')
+        self.bits = np.ones(chunks, dtype='uint8')
+        self.palettes = np.zeros([chunks, MAX_PALETTE], dtype='uint8')
+        self.palette_sizes = np.ones(chunks, dtype='int32')
+        self.counts = np.zeros([chunks, MAX_PALETTE], dtype='int32')  # Voxels holding each palette index
+        self.counts[:, 0] = CHUNK_VOL
+        self.lookup = np.empty(MAX_PALETTE, dtype='int32')
+
+    @property
+    def storage(self):
+        """The (words, offsets, bits, palettes) tuple read by get_packed_voxel."""
+        return self.words, self.offsets, self.bits, self.palettes
+
+    def get_memory(self):
+        """Returns the bytes held by the store, counting only the live words."""
+        return (self.live * self.words.itemsize + self.offsets.nbytes + self.bits.nbytes
+                + self.palettes.nbytes + self.palette_sizes.nbytes + self.counts.nbytes)
+
+    def allocate(self, count):
+        """
+        Reserves a run of words at the end of the buffer, compacting or growing it when full.
+
+        Parameters:
+            count (int): The number of words.
+
+        Returns:
+            int: The first word of the run.
+        """
+        if self.used + count > len(self.words):
+            if self.used - self.live > len(self.words) // 2:
+                self.compact()
+            if self.used + count > len(self.words):
+                grow = max(count, len(self.words) // 2)
+                self.words = np.concatenate([self.words, np.zeros(grow, dtype='uint32')])
+        offset = self.used
+        self.used += count
+        self.live += count
+        return offset
+
+    def release(self, chunk_index):
+        """
+        Resets a chunk to uniform air, leaving its region dead.
+
+        Parameters:
+            chunk_index (int): The chunk.
+        """
+        if self.offsets[chunk_index]:
+            self.live -= get_words(self.bits[chunk_index])
+        self.offsets[chunk_index] = 0
+        self.bits[chunk_index] = 1
+        self.palettes[chunk_index, 0] = 0
+        self.palette_sizes[chunk_index] = 1
+        self.counts[chunk_index] = 0
+        self.counts[chunk_index, 0] = CHUNK_VOL
+
+    def compact(self):
+        """Moves every chunk region to the front of a new buffer, dropping the dead regions."""
+        words = np.zeros(max(self.live + self.live // 2, ZERO_WORDS), dtype='uint32')
+        used = ZERO_WORDS
+        for chunk_index in np.flatnonzero(self.offsets):
+            count = get_words(self.bits[chunk_index])
+            offset = self.offsets[chunk_index]
+            words[used: used + count] = self.words[offset: offset + count]
+            self.offsets[chunk_index] = used
+            used += count
+        self.words, self.used = words, used
+
+    def pack(self, chunk_index, voxels):
+        """
+        Stores a dense chunk, choosing the narrowest width for its palette.
+
+        Parameters:
+            chunk_index (int): The chunk.
+            voxels (ndarray): The dense CHUNK_VOL voxel array.
+        """
+        self.release(chunk_index)
+        palette = self.palettes[chunk_index]
+        size = build_palette(voxels, palette, self.lookup, self.counts[chunk_index])
+        self.palette_sizes[chunk_index] = size
+        if size == 1:
+            return None  # uniform chunks read the shared zero words
+
+        width = get_bits(size)
+        offset = self.allocate(get_words(width))
+        pack_entries(voxels, self.lookup, self.words, offset, width)
+        self.offsets[chunk_index] = offset
+        self.bits[chunk_index] = width
+
+    def unpack(self, chunk_index, out=None):
+        """
+        Expands a chunk into a dense voxel array.
+
+        Parameters:
+            chunk_index (int): The chunk.
+            out (ndarray): The CHUNK_VOL array to fill, allocated when omitted.
+
+        Returns:
+            ndarray: The dense voxel array.
+        """
+        if out is None:
+            out = np.empty(CHUNK_VOL, dtype='uint8')
+        unpack_entries(self.words, self.offsets[chunk_index], self.bits[chunk_index], self.palettes[chunk_index], out)
+        return out
+
+    def get_voxel(self, chunk_index, voxel_index):
+        """
+        Reads one voxel ID.
+
+        Parameters:
+            chunk_index (int): The chunk.
+            voxel_index (int): The voxel index within the chunk.
+        """
+        return get_packed_voxel(self.words, self.offsets, self.bits, self.palettes, chunk_index, voxel_index)
+
+    def set_voxel(self, chunk_index, voxel_index, voxel_id):
+        """
+        Writes one voxel ID, adding it to the chunk's palette and widening the chunk when needed.
+        Palette entries no voxel holds any more are reused for new IDs, and a chunk whose IDs in use
+        fit a narrower width is repacked at it, so edits never leave it wider than its voxels need.
+
+        Parameters:
+            chunk_index (int): The chunk.
+            voxel_index (int): The voxel index within the chunk.
+            voxel_id (int): The new voxel ID.
+        """
+        size = self.palette_sizes[chunk_index]
+        counts = self.counts[chunk_index]
+        old_entry = get_packed_entry(self.words, self.offsets[chunk_index], self.bits[chunk_index], voxel_index)
+        if self.palettes[chunk_index, old_entry] == voxel_id:
+            return None
+        counts[old_entry] -= 1
+        entries = np.flatnonzero(self.palettes[chunk_index, :size] == voxel_id)
+        unused = np.flatnonzero(counts[:size] == 0)
+        if len(entries):
+            entry = entries[0]
+        elif len(unused):
+            entry = unused[0]
+            self.palettes[chunk_index, entry] = voxel_id
+        else:
+            entry = size
+            self.palettes[chunk_index, size] = voxel_id
+            self.palette_sizes[chunk_index] = size + 1
+        counts[entry] += 1
+
+        width = get_bits(max(self.palette_sizes[chunk_index], 2))
+        if width > self.bits[chunk_index] or not self.offsets[chunk_index]:
+            # widen, or leave the shared zero words, by repacking into a fresh region
+            voxels = self.unpack(chunk_index)
+            old_width = self.bits[chunk_index]
+            offset = self.allocate(get_words(width))
+            if self.offsets[chunk_index]:
+                self.live -= get_words(old_width)
+            self.lookup[:] = -1
+            self.lookup[self.palettes[chunk_index, :size]] = np.arange(size)
+            pack_entries(voxels, self.lookup, self.words, offset, width)
+            self.offsets[chunk_index] = offset
+            self.bits[chunk_index] = width
+        set_packed_entry(self.words, self.offsets[chunk_index], self.bits[chunk_index], voxel_index, entry)
+        if get_bits(max(np.count_nonzero(counts), 2)) < self.bits[chunk_index] or counts[entry] == CHUNK_VOL:
+            self.pack(chunk_index, self.unpack(chunk_index))  # narrow, or become uniform
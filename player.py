@@ -29,6 +29,9 @@ class Player(Camera):
             if pg.K_1 <= event.key <= pg.K_7:
                 if voxel_handler.new_voxel_id != event.key - pg.K_0:
                     voxel_handler.new_voxel_id = event.key - pg.K_0
+            if event.key == pg.K_g:
+                world = self.app.scene.world
+                world.set_greedy_meshing(not world.greedy_meshing)
 
     def mouse_control(self):
         """Handles mouse movement for camera rotation."""
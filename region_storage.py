@@ -0,0 +1,248 @@
+from settings import *
+import struct
+import threading
+import zlib
+
+# Region file layout:
+#   header: magic, format version, REGION_SIZE, WORLD_H, CHUNK_SIZE, SEED, CAVE_STRIDE, GENERATOR_HASH
+#   offset table: one (offset, length) pair of uint32 per record, zero length when absent
+#   records: appended payloads, each starting with its encoding byte
+# Every column of a region owns WORLD_H chunk records followed by its height tile record,
+# so any chunk can be read with one seek into the table and one into the payloads.
+REGION_MAGIC = b'VXRG'
+REGION_VERSION = 2
+HEADER = struct.Struct('<4sHHHHqII')
+# Settings the generated voxels depend on, so a file generated with other values is not mixed into the world
+GENERATOR_PARAMS = (SEED, CAVE_STRIDE, SNOW_LVL, STONE_LVL, DIRT_LVL, GRASS_LVL, SAND_LVL,
+                    TREE_PROBABILITY, TREE_WIDTH, TREE_HEIGHT)
+GENERATOR_HASH = zlib.crc32(repr(GENERATOR_PARAMS).encode())
+ENTRY = struct.Struct('<II')
+COLUMN_RECORDS = WORLD_H + 1
+HEIGHTMAP_RECORD = WORLD_H
+REGION_RECORDS = REGION_SIZE * REGION_SIZE * COLUMN_RECORDS
+TABLE_OFFSET = HEADER.size
+DATA_OFFSET = TABLE_OFFSET + ENTRY.size * REGION_RECORDS
+
+# Record encodings
+UNIFORM, ZLIB = 0, 1
+ZLIB_LEVEL = 6
+
+
+def encode_chunk(voxels, level=ZLIB_LEVEL):
+    """
+    Compresses the voxels of a chunk, storing a uniform chunk as its single voxel ID.
+
+    Parameters:
+        voxels (ndarray): The CHUNK_VOL voxel array.
+        level (int): The zlib compression level.
+
+    Returns:
+        bytes: The encoded record.
+    """
+    voxel_id = voxels[0]
+    if (voxels == voxel_id).all():
+        return bytes((UNIFORM, voxel_id))
+    return bytes((ZLIB,)) + zlib.compress(voxels.tobytes(), level)
+
+
+def decode_chunk(record, voxels):
+    """
+    Decompresses a chunk record.
+
+    Parameters:
+        record (bytes): The encoded record.
+        voxels (ndarray): The CHUNK_VOL voxel array to fill.
+
+    Returns:
+        int: The chunk's uniform voxel ID, or -1 if it is mixed.
+    """
+    if record[0] == UNIFORM:
+        voxels[:] = record[1]
+        return record[1]
+    voxels[:] = np.frombuffer(zlib.decompress(record[1:]), dtype='uint8')
+    return -1
+
+
+class RegionFile:
+    """
+    A file holding the chunk columns of one REGION_SIZE x REGION_SIZE region.
+
+    Records are appended and the offset table entry is rewritten in place, so saving a
+    chunk never moves the others. Replaced records are left behind as dead space until
+    the file is compacted on close.
+    """
+    def __init__(self, path):
+        """
+        Opens a region file, creating it, or recreating it if it was written with another layout
+        or generator settings, so its columns are generated again.
+
+        Parameters:
+            path (str): The file path.
+        """
+        self.path = path
+        self.file = open(path, 'r+b') if os.path.exists(path) else None
+        if self.file is not None and self.file.read(HEADER.size) != self.get_header():
+            self.file.close()
+            self.file = None
+        if self.file is None:
+            self.file = open(path, 'w+b')
+            self.file.write(self.get_header() + bytes(ENTRY.size * REGION_RECORDS))
+        self.file.seek(TABLE_OFFSET)
+        self.table = np.frombuffer(self.file.read(ENTRY.size * REGION_RECORDS), dtype='<u4').reshape(-1, 2).copy()
+        self.end = self.file.seek(0, os.SEEK_END)
+
+    @staticmethod
+    def get_header():
+        """Returns the header written by this version of the engine and generator settings."""
+        return HEADER.pack(REGION_MAGIC, REGION_VERSION, REGION_SIZE, WORLD_H, CHUNK_SIZE,
+                           SEED, CAVE_STRIDE, GENERATOR_HASH)
+
+    def get_dead_bytes(self):
+        """Returns the bytes of replaced records left in the file."""
+        return self.end - DATA_OFFSET - int(self.table[:, 1].sum(dtype='int64'))
+
+    def read(self, record):
+        """
+        Reads a record.
+
+        Parameters:
+            record (int): The record index.
+
+        Returns:
+            bytes: The record payload, or None if it was never written.
+        """
+        offset, length = self.table[record]
+        if not length:
+            return None
+        self.file.seek(offset)
+        return self.file.read(length)
+
+    def write(self, record, payload):
+        """
+        Appends a record payload and points the offset table at it.
+
+        Parameters:
+            record (int): The record index.
+            payload (bytes): The record payload.
+        """
+        offset = self.file.seek(0, os.SEEK_END)
+        self.file.write(payload)
+        self.end = offset + len(payload)
+        self.table[record] = offset, len(payload)
+        self.file.seek(TABLE_OFFSET + ENTRY.size * record)
+        self.file.write(ENTRY.pack(offset, len(payload)))
+
+    def compact(self):
+        """
+        Rewrites the file with only the live records, in record order. The new file replaces the old
+        one once complete, so a crash leaves one or the other.
+        """
+        table = np.zeros_like(self.table)
+        with open(self.path + '.tmp', 'wb') as file:
+            file.write(self.get_header() + bytes(ENTRY.size * REGION_RECORDS))
+            end = DATA_OFFSET
+            for record in np.flatnonzero(self.table[:, 1]).tolist():
+                payload = self.read(record)
+                file.write(payload)
+                table[record] = end, len(payload)
+                end += len(payload)
+            file.seek(TABLE_OFFSET)
+            file.write(table.astype('<u4').tobytes())
+        self.file.close()
+        os.replace(self.path + '.tmp', self.path)
+        self.file = open(self.path, 'r+b')
+        self.table = table
+        self.end = end
+
+    def close(self):
+        """Compacts the file if it holds replaced records and closes it."""
+        if self.get_dead_bytes():
+            self.compact()
+        self.file.close()
+
+
+class RegionStore:
+    """
+    Saves and loads chunk columns in region files under a directory. Region files are opened
+    on first use and kept open; all access is serialized so the background builder and the
+    main thread can share the store.
+    """
+    def __init__(self, path=SAVE_DIR, level=ZLIB_LEVEL):
+        """
+        Initializes the store.
+
+        Parameters:
+            path (str): The directory holding the region files.
+            level (int): The zlib compression level of saved chunks.
+        """
+        self.path = path
+        self.level = level
+        self.regions = {}
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def get_region(self, cx, cz):
+        """
+        Returns the region file of a column together with the column's first record.
+
+        Parameters:
+            cx, cz (int): The column position in chunk coordinates.
+        """
+        rx, rz = cx // REGION_SIZE, cz // REGION_SIZE
+        region = self.regions.get((rx, rz))
+        if region is None:
+            region = RegionFile(os.path.join(self.path, f'r.{rx}.{rz}.vxr'))
+            self.regions[rx, rz] = region
+        return region, (cx % REGION_SIZE + REGION_SIZE * (cz % REGION_SIZE)) * COLUMN_RECORDS
+
+    def load_column(self, cx, cz):
+        """
+        Loads a saved column.
+
+        Parameters:
+            cx, cz (int): The column position in chunk coordinates.
+
+        Returns:
+            tuple: The column's height tile, its [WORLD_H, CHUNK_VOL] voxels and, per chunk,
+            its uniform voxel ID or -1; None if the column was never saved.
+        """
+        with self.lock:
+            region, first = self.get_region(cx, cz)
+            records = [region.read(first + record) for record in range(COLUMN_RECORDS)]
+        if None in records:
+            return None
+
+        heightmap = np.frombuffer(zlib.decompress(records[HEIGHTMAP_RECORD]), dtype='int32')
+        voxels = np.empty([WORLD_H, CHUNK_VOL], dtype='uint8')
+        uniform_ids = np.array([decode_chunk(records[y], voxels[y]) for y in range(WORLD_H)], dtype='int32')
+        return heightmap, voxels, uniform_ids
+
+    def save_column(self, cx, cz, heightmap, voxels):
+        """
+        Saves a whole column.
+
+        Parameters:
+            cx, cz (int): The column position in chunk coordinates.
+            heightmap (ndarray): The column's height tile.
+            voxels (list): The CHUNK_VOL voxel arrays of the column's chunks, bottom to top.
+        """
+        records = [encode_chunk(chunk_voxels, self.level) for chunk_voxels in voxels]
+        records.append(zlib.compress(heightmap.astype('int32').tobytes(), self.level))
+        with self.lock:
+            region, first = self.get_region(cx, cz)
+            for record, payload in enumerate(records):
+                region.write(first + record, payload)
+
+    def get_size(self):
+        """Returns the total size of the region files in bytes."""
+        with self.lock:
+            for region in self.regions.values():
+                region.file.flush()
+        return sum(os.path.getsize(os.path.join(self.path, name)) for name in os.listdir(self.path))
+
+    def close(self):
+        """Compacts and closes every open region file."""
+        with self.lock:
+            for region in self.regions.values():
+                region.close()
+            self.regions = {}
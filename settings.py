@@ -2,6 +2,7 @@ from numba import njit
 import numpy as np
 import glm
 import math
+import os
 
 # OpenGL settings
 MAJOR_VER, MINOR_VER = 3, 3  # OpenGL version
@@ -11,10 +12,47 @@ NUM_SAMPLES = 1  # Antialiasing sample count
 # Resolution settings
 WIN_RES = glm.vec2(1920, 1080)  # Window resolution
 FPS = 120  # Target frames per second
+CAPTION_INTERVAL = 1.0  # Seconds between refreshes of the window caption's stats
 
 # World generation seed
 SEED = 8402  # Random seed for procedural generation
 
+# World generation workers (1 keeps the serial per-chunk path)
+GEN_WORKERS = os.cpu_count() or 1
+
+# Background chunk building
+BUILD_ASYNC = True  # Generate and mesh chunks on worker threads instead of blocking the frame
+BUILD_WORKERS = max(GEN_WORKERS - 1, 1)  # Mesh worker threads
+GEN_BATCH = 16  # Chunk columns generated per background batch
+UPLOAD_BUDGET_MS = 4.0  # Max time per frame spent uploading finished meshes to the GPU
+UPLOAD_BUDGET_BYTES = 4 * 1024 * 1024  # Max vertex data uploaded per frame
+
+# Chunk meshing
+GREEDY_MESHING = False  # Merge coplanar faces with the same voxel ID and AO into larger quads (toggle with G); AO keeps ~80% of quads
+INDEXED_QUADS = True  # Store 4 vertices per face and draw chunks through one shared quad index buffer
+CULL_FACE_RANGES = True  # Skip the face directions of a chunk that all point away from the camera
+SECTION_SIZE = 16  # Edge of the cubic sections chunks are meshed in, so an edit remeshes only the sections it touches
+BULK_MESHING = True  # Mesh chunks built on the main thread in parallel into one shared vertex buffer
+OCCLUSION_CULLING = True  # Draw only the chunks the camera can see into through chunk faces connected by air
+OCCLUSION_QUERIES = False  # Skip drawing chunks whose bounding box was hidden last frame, with GPU occlusion queries
+QUERY_LATENCY = 2  # Frames before occlusion query results are read back for the counters, so reading never stalls
+FRONT_TO_BACK = True  # Draw the visible chunks nearest first, so the depth test rejects the fragments hidden behind them
+
+# Voxel storage
+PALETTE_STORAGE = False  # Keep mixed chunks palette-compressed and bit-packed instead of as dense rows
+# Packed storage takes ~2.7x less memory than the pool, but sequential reads are ~8x slower than dense rows
+# (benchmark palette: ~590M against ~4500M voxels/s); random reads and meshing run at about the same speed
+
+# World saving
+SAVE_WORLD = False  # Load chunks from region files when saved, and save generated and edited chunks under SAVE_DIR
+SAVE_DIR = f'saves/{SEED}'  # Directory holding the region files of the world
+REGION_SIZE = 8  # Chunk columns per region file side
+JOURNAL_COMPACT_RATIO = 4  # Compact the edit journal once it holds this many records per live edit
+JOURNAL_MIN_RECORDS = 1024  # Live edit count below which the journal is compacted as if it held this many
+JOURNAL_SYNC_INTERVAL = 1.0  # Max seconds edits wait in the OS cache before the journal is synced to disk
+MESH_CACHE = True  # With SAVE_WORLD, keep built chunk meshes on disk so unchanged chunks skip meshing on the next launch
+MESH_CACHE_BYTES = 256 * 1024 * 1024  # Vertex data kept in the mesh cache, least recently used meshes are evicted past it
+
 # Ray casting settings
 MAX_RAY_DIST = 6  # Maximum distance for ray tracing (used for voxel selection)
 
@@ -25,8 +63,20 @@ CHUNK_AREA = CHUNK_SIZE * CHUNK_SIZE  # Area of a chunk (XZ plane)
 CHUNK_VOL = CHUNK_AREA * CHUNK_SIZE  # Volume of a chunk
 CHUNK_SPHERE_RADIUS = H_CHUNK_SIZE * math.sqrt(3)  # Bounding sphere radius for chunk frustum culling
 
-# World dimensions
-WORLD_W, WORLD_H = 20, 2  # World width and height in chunks
+# Level of detail
+LOD_MESHING = True  # Mesh distant chunks from coarser voxel cells
+LOD_DISTANCES = (4 * CHUNK_SIZE, 8 * CHUNK_SIZE, 12 * CHUNK_SIZE)  # Distances past which chunks use 2, 4 and 8 voxel cells
+LOD_HYSTERESIS = CHUNK_SIZE // 2  # Distance a chunk must pass a LOD bound by before switching, so it does not flicker
+
+# World streaming settings
+STREAMING = False  # Load and unload chunk columns around the player instead of building a fixed world
+STREAM_RADIUS = 8  # Columns within this many chunks of the player are loaded
+STREAM_HYSTERESIS = 1  # Extra chunks a column may fall behind the radius before it is unloaded
+# Streamed columns are kept within 2 * (STREAM_RADIUS + STREAM_HYSTERESIS) + 1 columns, which must fit in WORLD_W
+
+# World dimensions (in streaming mode, the size of the ring-buffer chunk table around the player)
+WORLD_W = 20  # World width in chunks
+WORLD_H = 2  # World height in chunks
 WORLD_D = WORLD_W  # World depth (same as width)
 WORLD_AREA = WORLD_W * WORLD_D  # Total number of chunks in XZ plane
 WORLD_VOL = WORLD_AREA * WORLD_H  # Total number of chunks in the world
@@ -69,6 +119,9 @@ DIRT_LVL = 40  # Dirt level height
 GRASS_LVL = 8   # Grass level height
 SAND_LVL = 7    # Sand level height (beach areas)
 
+# Cave settings
+CAVE_STRIDE = 1  # Cave density sampling stride in voxels; 1 is exact, larger values interpolate a coarse lattice (should divide CHUNK_SIZE)
+
 # Tree generation settings
 TREE_PROBABILITY = 0.02  # Probability of tree spawning on a grass block
 TREE_WIDTH, TREE_HEIGHT = 4, 8  # Tree dimensions
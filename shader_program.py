@@ -1,9 +1,25 @@
 from settings import *
 
+CAMERA_BINDING = 0  # Uniform block binding point of the Camera block every program reads
+
+
+def get_camera_data(camera):
+    """
+    Packs the camera matrices as the std140 Camera uniform block: m_proj, m_view and m_view_proj.
+
+    Parameters:
+        camera: The player, or another camera.
+    Returns:
+        bytes: The 192 bytes of the block.
+    """
+    return camera.m_proj.to_bytes() + camera.m_view.to_bytes() + (camera.m_proj * camera.m_view).to_bytes()
+
+
 class ShaderProgram:
     """
     Handles the initialization and management of OpenGL shader programs used in the application.
     It loads, compiles, and links shader programs, assigns texture units, and updates uniform values.
+    The camera matrices live in one uniform buffer bound to the Camera block of every program.
     """
     def __init__(self, app):
         """
@@ -21,6 +37,11 @@ class ShaderProgram:
         self.voxel_marker = self.get_program(shader_name='voxel_marker')
         self.water = self.get_program('water')
         self.clouds = self.get_program('clouds')
+        self.chunk_box = self.get_program('chunk_box')
+
+        # Camera matrices shared by every program
+        self.camera_block = self.ctx.buffer(get_camera_data(self.player))
+        self.camera_block.bind_to_uniform_block(CAMERA_BINDING)
 
         # Set initial uniform values
         self.set_uniforms_on_init()
@@ -28,35 +49,27 @@ class ShaderProgram:
     def set_uniforms_on_init(self):
         """Sets initial values for uniform variables in the shaders."""
         # Chunk shader uniforms
-        self.chunk['m_proj'].write(self.player.m_proj)  # Projection matrix
-        self.chunk['m_model'].write(glm.mat4())  # Model matrix (identity matrix)
         self.chunk['u_texture_array_0'] = 1  # Assign texture array unit
         self.chunk['bg_color'].write(BG_COLOR)  # Background color
         self.chunk['water_line'] = WATER_LINE  # Water level reference
 
         # Voxel marker shader uniforms
-        self.voxel_marker['m_proj'].write(self.player.m_proj)
         self.voxel_marker['m_model'].write(glm.mat4())
         self.voxel_marker['u_texture_0'] = 0  # Assign texture unit
 
         # Water shader uniforms
-        self.water['m_proj'].write(self.player.m_proj)
         self.water['u_texture_0'] = 2  # Assign texture unit
         self.water['water_area'] = WATER_AREA  # Define water area dimensions
         self.water['water_line'] = WATER_LINE  # Define water level
 
         # Clouds shader uniforms
-        self.clouds['m_proj'].write(self.player.m_proj)
         self.clouds['center'] = CENTER_XZ  # Cloud movement center reference
         self.clouds['bg_color'].write(BG_COLOR)  # Background color for clouds
         self.clouds['cloud_scale'] = CLOUD_SCALE  # Cloud scaling factor
 
     def update(self):
-        """Updates the view matrix in all shaders to reflect camera movements."""
-        self.chunk['m_view'].write(self.player.m_view)
-        self.voxel_marker['m_view'].write(self.player.m_view)
-        self.water['m_view'].write(self.player.m_view)
-        self.clouds['m_view'].write(self.player.m_view)
+        """Updates the camera matrices of all shaders to reflect camera movements, in a single buffer write."""
+        self.camera_block.write(get_camera_data(self.player))
 
     def get_program(self, shader_name):
         """
@@ -75,4 +88,5 @@ class ShaderProgram:
 
         # Compile and link the shader program
         program = self.ctx.program(vertex_shader=vertex_shader, fragment_shader=fragment_shader)
+        program['Camera'].binding = CAMERA_BINDING
         return program
@@ -17,8 +17,8 @@ flat in int face_id;
 flat in int voxel_id;
 
 void main() {
-    vec2 face_uv = uv;
-    face_uv.x = uv.x / 3.0 - min(face_id, 2) / 3.0;
+    vec2 face_uv = fract(uv);
+    face_uv.x = face_uv.x / 3.0 - min(face_id, 2) / 3.0;
 
     vec3 tex_col = texture(u_texture_array_0, vec3(face_uv, voxel_id)).rgb;
     tex_col = pow(tex_col, gamma);
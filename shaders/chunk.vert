@@ -1,14 +1,17 @@
 #version 330 core
 
 layout (location = 0) in uint packed_data;
+layout (location = 1) in ivec3 chunk_origin;  // world position of the chunk's minimum corner, per instance
 
 int x, y, z;
 int ao_id;
 int flip_id;
 
-uniform mat4 m_proj;
-uniform mat4 m_view;
-uniform mat4 m_model;
+layout (std140) uniform Camera {
+    mat4 m_proj;
+    mat4 m_view;
+    mat4 m_view_proj;
+};
 
 flat out int voxel_id;
 flat out int face_id;
@@ -26,18 +29,6 @@ const float face_shading[6] = float[6](
     0.5, 0.8   // front back
 );
 
-const vec2 uv_coords[4] = vec2[4](
-    vec2(0, 0), vec2(0, 1),
-    vec2(1, 0), vec2(1, 1)
-);
-
-const int uv_indices[24] = int[24](
-    1, 0, 2, 1, 2, 3,  // tex coords indices for vertices of an even face
-    3, 0, 2, 3, 1, 0,  // odd face
-    3, 1, 0, 3, 0, 2,  // even flipped face
-    1, 2, 3, 1, 0, 2   // odd flipped face
-);
-
 vec3 hash31(float p) {
     vec3 p3 = fract(vec3(p * 21.2) * vec3(0.1031, 0.1030, 0.0973));
     p3 += dot(p3, p3.yzx + 33.33);
@@ -69,13 +60,15 @@ void main() {
     unpack(packed_data);
 
     vec3 in_position = vec3(x, y, z);
-    int uv_index = gl_VertexID % 6  + ((face_id & 1) + flip_id * 2) * 6;
 
-    uv = uv_coords[uv_indices[uv_index]];
+    // tex coords follow the face plane, one texture per voxel, so merged quads tile it;
+    // odd faces mirror u so every face keeps its orientation
+    vec2 plane_pos = face_id < 2 ? in_position.xz : (face_id < 4 ? in_position.zy : in_position.xy);
+    uv = vec2((face_id & 1) == 0 ? plane_pos.x : -plane_pos.x, -plane_pos.y);
 
     shading = face_shading[face_id] * ao_values[ao_id];
 
-    frag_world_pos = (m_model * vec4(in_position, 1.0)).xyz;
+    frag_world_pos = vec3(chunk_origin) + in_position;
 
-    gl_Position = m_proj * m_view * vec4(frag_world_pos, 1.0);
+    gl_Position = m_view_proj * vec4(frag_world_pos, 1.0);
 }
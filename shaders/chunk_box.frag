@@ -0,0 +1,8 @@
+#version 330 core
+
+layout (location = 0) out vec4 fragColor;
+
+void main() {
+    // only the samples passing the depth test are counted, color writes are masked off
+    fragColor = vec4(1.0);
+}
@@ -0,0 +1,15 @@
+#version 330 core
+
+layout (location = 0) in vec3 in_position;
+
+layout (std140) uniform Camera {
+    mat4 m_proj;
+    mat4 m_view;
+    mat4 m_view_proj;
+};
+uniform vec3 box_min;
+uniform float box_size;
+
+void main() {
+    gl_Position = m_view_proj * vec4(box_min + in_position * box_size, 1.0);
+}
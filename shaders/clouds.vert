@@ -2,9 +2,11 @@
 
 layout (location = 0) in vec3 in_position;
 
-uniform mat4 m_proj;
-uniform mat4 m_view;
-uniform mat4 m_view_proj;
+layout (std140) uniform Camera {
+    mat4 m_proj;
+    mat4 m_view;
+    mat4 m_view_proj;
+};
 uniform int center;
 uniform float u_time;
 uniform float cloud_scale;
@@ -17,6 +19,5 @@ void main() {
 
     float time = 300 * sin(0.01 * u_time);
     pos.xz += time;
-    gl_Position = m_proj * m_view * vec4(pos, 1.0);
-//    gl_Position = m_view_proj * vec4(pos, 1.0);
+    gl_Position = m_view_proj * vec4(pos, 1.0);
 }
\ No newline at end of file
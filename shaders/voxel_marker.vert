@@ -3,8 +3,11 @@
 layout (location = 0) in vec2 in_tex_coord_0;
 layout (location = 1) in vec3 in_position;
 
-uniform mat4 m_proj;
-uniform mat4 m_view;
+layout (std140) uniform Camera {
+    mat4 m_proj;
+    mat4 m_view;
+    mat4 m_view_proj;
+};
 uniform mat4 m_model;
 
 out vec3 marker_color;
@@ -13,5 +16,5 @@ out vec2 uv;
 void main() {
     uv = in_tex_coord_0;
     marker_color = vec3(0.5, 0.5, 0.5);
-    gl_Position = m_proj * m_view * m_model * vec4((in_position - 0.5) * 1.01 + 0.5, 1.0);
+    gl_Position = m_view_proj * m_model * vec4((in_position - 0.5) * 1.01 + 0.5, 1.0);
 }
@@ -3,9 +3,11 @@
 layout (location = 0) in vec2 in_tex_coord;
 layout (location = 1) in vec3 in_position;
 
-uniform mat4 m_proj;
-uniform mat4 m_view;
-uniform mat4 m_view_proj;
+layout (std140) uniform Camera {
+    mat4 m_proj;
+    mat4 m_view;
+    mat4 m_view_proj;
+};
 uniform int water_area;
 uniform float water_line;
 
@@ -18,5 +20,5 @@ void main() {
 
     pos.y += water_line;
     uv = in_tex_coord * water_area;
-    gl_Position = m_proj * m_view * vec4(pos, 1.0);
+    gl_Position = m_view_proj * vec4(pos, 1.0);
 }
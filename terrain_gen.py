@@ -1,6 +1,35 @@
-from noise import noise2, noise3
-from random import random
+from noise import noise2, noise2_grid, noise3_grid
 from settings import *
+from numba import prange
+from voxel_storage import UNIFORM_ROWS
+
+# Salts separating the independent random streams drawn at the same voxel
+SURFACE_SALT = 1
+TREE_SALT = 2
+LEAVES_SALT = 3
+
+# Height octave frequencies
+HEIGHT_F1 = 0.005
+HEIGHT_F2, HEIGHT_F4, HEIGHT_F8 = HEIGHT_F1 * 2, HEIGHT_F1 * 4, HEIGHT_F1 * 8
+
+@njit
+def hash_random(wx, wy, wz, salt):
+    """
+    Returns a uniform random value derived only from the seed and a world position,
+    so decoration does not depend on the order chunks are generated in.
+
+    Parameters:
+        wx, wy, wz (int): World coordinates of the voxel.
+        salt (int): Distinguishes independent random streams at the same position.
+
+    Returns:
+        float: A value in [0, 1).
+    """
+    h = (SEED * 374761393 + wx * 668265263 + wy * 2147483647 + wz * 2246822519 + salt * 3266489917) & 0xFFFFFFFF
+    h = ((h ^ (h >> 15)) * 2246822519) & 0xFFFFFFFF
+    h = ((h ^ (h >> 13)) * 3266489917) & 0xFFFFFFFF
+    h ^= h >> 16
+    return h / 4294967296.0
 
 @njit
 def get_height(x, z):
@@ -14,6 +43,28 @@ def get_height(x, z):
     Returns:
         int: The calculated height of the terrain at the given coordinates.
     """
+    return combine_height(
+        x, z,
+        noise2(0.1 * x, 0.1 * z),
+        noise2(x * HEIGHT_F1, z * HEIGHT_F1),
+        noise2(x * HEIGHT_F2, z * HEIGHT_F2),
+        noise2(x * HEIGHT_F4, z * HEIGHT_F4),
+        noise2(x * HEIGHT_F8, z * HEIGHT_F8)
+    )
+
+@njit
+def combine_height(x, z, n_mask, n1, n2, n4, n8):
+    """
+    Combines the height noise octaves of a column with the island mask.
+
+    Parameters:
+        x, z (int): World coordinates of the column.
+        n_mask (float): Low-amplitude noise flattening the first octave.
+        n1, n2, n4, n8 (float): Noise octaves at increasing frequency.
+
+    Returns:
+        int: The terrain height of the column.
+    """
     # island mask
     island = 1 / (pow(0.0025 * math.hypot(x - CENTER_XZ, z - CENTER_XZ), 20) + 0.0001)
     island = min(island, 1)
@@ -22,24 +73,196 @@ def get_height(x, z):
     a1 = CENTER_Y
     a2, a4, a8 = a1 * 0.5, a1 * 0.25, a1 * 0.125
 
-    # frequency
-    f1 = 0.005
-    f2, f4, f8 = f1 * 2, f1 * 4, f1 * 8
-
-    if noise2(0.1 * x, 0.1 * z) < 0:
+    if n_mask < 0:
         a1 /= 1.07
 
     height = 0
-    height += noise2(x * f1, z * f1) * a1 + a1
-    height += noise2(x * f2, z * f2) * a2 - a2
-    height += noise2(x * f4, z * f4) * a4 + a4
-    height += noise2(x * f8, z * f8) * a8 - a8
+    height += n1 * a1 + a1
+    height += n2 * a2 - a2
+    height += n4 * a4 + a4
+    height += n8 * a8 - a8
 
-    height = max(height,  noise2(x * f8, z * f8) + 2)
+    height = max(height, n8 + 2)
     height *= island
 
     return int(height)
 
+@njit
+def build_heightmap(heightmap, cx, cz):
+    """
+    Fills the height tile of a chunk column, evaluating every noise octave over the whole tile at once.
+
+    Parameters:
+        heightmap (ndarray): The CHUNK_AREA tile to fill, indexed as x + CHUNK_SIZE * z.
+        cx, cz (int): World coordinates of the column origin.
+    """
+    xs = np.arange(cx, cx + CHUNK_SIZE) * 1.0
+    zs = np.arange(cz, cz + CHUNK_SIZE) * 1.0
+
+    fields = np.empty((5, CHUNK_SIZE, CHUNK_SIZE))
+    noise2_grid(0.1 * xs, 0.1 * zs, fields[0])
+    noise2_grid(xs * HEIGHT_F1, zs * HEIGHT_F1, fields[1])
+    noise2_grid(xs * HEIGHT_F2, zs * HEIGHT_F2, fields[2])
+    noise2_grid(xs * HEIGHT_F4, zs * HEIGHT_F4, fields[3])
+    noise2_grid(xs * HEIGHT_F8, zs * HEIGHT_F8, fields[4])
+
+    for x in range(CHUNK_SIZE):
+        for z in range(CHUNK_SIZE):
+            heightmap[x + CHUNK_SIZE * z] = combine_height(
+                x + cx, z + cz,
+                fields[0, z, x], fields[1, z, x], fields[2, z, x], fields[3, z, x], fields[4, z, x]
+            )
+
+@njit
+def generate_terrain(voxels, heightmap, cx, cy, cz, cave_stride):
+    """
+    Generates terrain voxel data for a chunk based on its column heightmap.
+
+    The cave noise fields are evaluated in bulk over the slab of the chunk lying below
+    the highest column, rather than point by point per voxel. Below its surface voxel a
+    column is only stone or cave, so it is filled in a tight loop and only the surface
+    voxel, the one that can hold a tree, goes through set_voxel_id.
+
+    Parameters:
+        voxels (ndarray): The zeroed CHUNK_VOL array storing voxel IDs.
+        heightmap (ndarray): The precomputed height tile of the chunk's column.
+        cx, cy, cz (int): World coordinates of the chunk origin.
+        cave_stride (int): Cave density sampling stride, see sample_cave_density.
+    """
+    top = min(heightmap.max() - cy, CHUNK_SIZE)  # Highest local terrain level in the chunk
+    if top <= 0:
+        return None
+
+    xs = np.arange(cx, cx + CHUNK_SIZE) * 1.0
+    ys = np.arange(cy, cy + top) * 1.0
+    zs = np.arange(cz, cz + CHUNK_SIZE) * 1.0
+
+    cave_floor = np.empty((CHUNK_SIZE, CHUNK_SIZE))
+    noise2_grid(xs * 0.1, zs * 0.1, cave_floor)
+    cave_density = np.empty((top, CHUNK_SIZE, CHUNK_SIZE))
+    sample_cave_density(cave_density, xs, ys, zs, cave_stride)
+
+    for x in range(CHUNK_SIZE):
+        wx = x + cx  # World X coordinate
+        for z in range(CHUNK_SIZE):
+            wz = z + cz  # World Z coordinate
+            world_height = heightmap[x + CHUNK_SIZE * z]  # Get terrain height at this position
+            local_height = min(world_height - cy, CHUNK_SIZE)  # Limit height to chunk bounds
+            body = min(world_height - 1 - cy, local_height)  # Voxels below the surface voxel
+
+            for y in range(body):
+                hollow = is_cave(y + cy, world_height, cave_density[y, z, x], cave_floor[z, x])
+                voxels[get_index(x, y, z)] = 0 if hollow else STONE
+
+            for y in range(max(body, 0), local_height):
+                wy = y + cy  # World Y coordinate
+                set_voxel_id(voxels, x, y, z, wx, wy, wz, world_height,
+                             cave_density[y, z, x], cave_floor[z, x])  # Assign voxel type
+
+@njit
+def sample_cave_density(cave_density, xs, ys, zs, stride):
+    """
+    Fills the cave density field of a chunk slab.
+
+    With a stride of 1 every voxel is sampled exactly. Larger strides sample the 3D noise
+    on a lattice anchored at the chunk origin, every `stride` voxels, and trilinearly
+    interpolate between lattice points. Neighbouring chunks share lattice points on their
+    common border as long as the stride divides CHUNK_SIZE. The interpolation runs one axis
+    at a time, x, z then y, so only the last pass touches every voxel.
+
+    Parameters:
+        cave_density (ndarray): The [len(ys), len(zs), len(xs)] field to fill.
+        xs, ys, zs (ndarray): World coordinates of the slab voxels along each axis.
+        stride (int): The lattice spacing in voxels.
+    """
+    if stride <= 1:
+        noise3_grid(xs * 0.09, ys * 0.09, zs * 0.09, cave_density)
+        return None
+
+    nx = (xs.size - 1) // stride + 2
+    ny = (ys.size - 1) // stride + 2
+    nz = (zs.size - 1) // stride + 2
+    lattice = np.empty((ny, nz, nx))
+    noise3_grid(
+        (xs[0] + np.arange(nx) * stride) * 0.09,
+        (ys[0] + np.arange(ny) * stride) * 0.09,
+        (zs[0] + np.arange(nz) * stride) * 0.09,
+        lattice
+    )
+
+    inv_stride = 1.0 / stride
+    rows = np.empty((ny, nz, xs.size))  # Lattice rows interpolated along x
+    for x in range(xs.size):
+        gx, tx = x // stride, (x % stride) * inv_stride
+        for gy in range(ny):
+            for gz in range(nz):
+                rows[gy, gz, x] = lattice[gy, gz, gx] + (lattice[gy, gz, gx + 1] - lattice[gy, gz, gx]) * tx
+
+    planes = np.empty((ny, zs.size, xs.size))  # Lattice planes interpolated along x and z
+    for z in range(zs.size):
+        gz, tz = z // stride, (z % stride) * inv_stride
+        for gy in range(ny):
+            c0, c1, plane = rows[gy, gz], rows[gy, gz + 1], planes[gy, z]
+            for x in range(xs.size):
+                plane[x] = c0[x] + (c1[x] - c0[x]) * tz
+
+    for y in range(ys.size):
+        gy, ty = y // stride, (y % stride) * inv_stride
+        c0, c1, layer = planes[gy], planes[gy + 1], cave_density[y]
+        for z in range(zs.size):
+            for x in range(xs.size):
+                layer[z, x] = c0[z, x] + (c1[z, x] - c0[z, x]) * ty
+
+@njit(parallel=True)
+def generate_chunks(voxels, heightmaps, chunk_columns, chunk_slots, chunk_indices, cave_stride):
+    """
+    Generates dense chunks in parallel, writing straight into their voxel pool rows.
+
+    Parameters:
+        voxels (ndarray): The [rows, CHUNK_VOL] world voxel pool.
+        heightmaps (ndarray): The [WORLD_AREA, CHUNK_AREA] column height tiles.
+        chunk_columns (ndarray): The [WORLD_AREA, 2] column position held by each table column.
+        chunk_slots (ndarray): Per chunk index, its pool row; uniform chunks are skipped.
+        chunk_indices (ndarray): The indices of the chunks to generate.
+        cave_stride (int): Cave density sampling stride, see sample_cave_density.
+    """
+    for i in prange(chunk_indices.size):
+        chunk_index = chunk_indices[i]
+        slot = chunk_slots[chunk_index]
+        if slot < UNIFORM_ROWS:
+            continue
+        column = chunk_index % WORLD_AREA
+        x, z = chunk_columns[column, 0], chunk_columns[column, 1]
+        y = chunk_index // WORLD_AREA
+
+        chunk_voxels = voxels[slot]
+        chunk_voxels[:] = 0
+        generate_terrain(
+            chunk_voxels, heightmaps[column], x * CHUNK_SIZE, y * CHUNK_SIZE, z * CHUNK_SIZE, cave_stride
+        )
+
+@njit(parallel=True, nogil=True)
+def generate_columns(voxels, heightmaps, columns, cave_stride):
+    """
+    Generates whole chunk columns in parallel into standalone arrays, so a background
+    thread can build them without touching the world voxel pool.
+
+    Parameters:
+        voxels (ndarray): The zeroed [len(columns), WORLD_H, CHUNK_VOL] voxel arrays to fill.
+        heightmaps (ndarray): The [len(columns), CHUNK_AREA] height tiles to fill.
+        columns (ndarray): The [n, 2] column positions in chunk coordinates.
+        cave_stride (int): Cave density sampling stride, see sample_cave_density.
+    """
+    for i in prange(columns.shape[0]):
+        build_heightmap(heightmaps[i], columns[i, 0] * CHUNK_SIZE, columns[i, 1] * CHUNK_SIZE)
+
+    for i in prange(columns.shape[0] * WORLD_H):
+        column, y = i // WORLD_H, i % WORLD_H
+        x, z = columns[column, 0], columns[column, 1]
+        generate_terrain(
+            voxels[column, y], heightmaps[column], x * CHUNK_SIZE, y * CHUNK_SIZE, z * CHUNK_SIZE, cave_stride
+        )
+
 @njit
 def get_index(x, y, z):
     """
@@ -56,7 +279,20 @@ def get_index(x, y, z):
     return x + CHUNK_SIZE * z + CHUNK_AREA * y
 
 @njit
-def set_voxel_id(voxels, x, y, z, wx, wy, wz, world_height):
+def is_cave(wy, world_height, cave_density, cave_floor):
+    """
+    Tells whether a voxel below the surface of its column is hollowed out by caves.
+
+    Parameters:
+        wy (int): World Y coordinate of the voxel.
+        world_height (int): The terrain height of its column.
+        cave_density (float): The 3D cave noise at the voxel; positive values are hollow.
+        cave_floor (float): The 2D noise raising the lowest level caves can reach in this column.
+    """
+    return cave_density > 0 and cave_floor * 3 + 3 < wy < world_height - 10
+
+@njit
+def set_voxel_id(voxels, x, y, z, wx, wy, wz, world_height, cave_density, cave_floor):
     """
     Determines and sets the voxel type at a given position based on world height and noise values.
 
@@ -65,19 +301,20 @@ def set_voxel_id(voxels, x, y, z, wx, wy, wz, world_height):
         x, y, z (int): Local chunk coordinates of the voxel.
         wx, wy, wz (int): World coordinates of the voxel.
         world_height (int): The computed height of the terrain at this position.
+        cave_density (float): The 3D cave noise at this voxel; positive values are hollow.
+        cave_floor (float): The 2D noise raising the lowest level caves can reach in this column.
     """
     voxel_id = 0
 
     if wy < world_height - 1:
         # create caves
-        if (noise3(wx * 0.09, wy * 0.09, wz * 0.09) > 0 and
-                noise2(wx * 0.1, wz * 0.1) * 3 + 3 < wy < world_height - 10):
+        if is_cave(wy, world_height, cave_density, cave_floor):
             voxel_id = 0
 
         else:
             voxel_id = STONE
     else:
-        rng = int(7 * random())
+        rng = int(7 * hash_random(wx, wy, wz, SURFACE_SALT))
         ry = wy - rng
         if SNOW_LVL <= ry < world_height:
             voxel_id = SNOW
@@ -99,20 +336,22 @@ def set_voxel_id(voxels, x, y, z, wx, wy, wz, world_height):
 
     # place tree
     if wy < DIRT_LVL:
-        place_tree(voxels, x, y, z, voxel_id)
+        place_tree(voxels, x, y, z, wx, wy, wz, voxel_id)
 
 @njit
-def place_tree(voxels, x, y, z, voxel_id):
+def place_tree(voxels, x, y, z, wx, wy, wz, voxel_id):
     """
     Attempts to place a tree at a given location if conditions are met.
 
     Parameters:
         voxels (ndarray): The voxel array storing terrain data.
         x, y, z (int): Local chunk coordinates of the potential tree position.
+        wx, wy, wz (int): World coordinates of the potential tree position.
         voxel_id (int): The ID of the voxel at the given location.
     """
-    rnd = random()
-    if voxel_id != GRASS or rnd > TREE_PROBABILITY:
+    if voxel_id != GRASS:
+        return None  # before hashing, which most voxels would otherwise pay for
+    if hash_random(wx, wy, wz, TREE_SALT) > TREE_PROBABILITY:
         return None
     if y + TREE_HEIGHT >= CHUNK_SIZE:
         return None
@@ -128,7 +367,7 @@ def place_tree(voxels, x, y, z, voxel_id):
     m = 0
     for n, iy in enumerate(range(TREE_H_HEIGHT, TREE_HEIGHT - 1)):
         k = iy % 2
-        rng = int(random() * 2)
+        rng = int(hash_random(wx, wy + iy, wz, LEAVES_SALT) * 2)
         for ix in range(-TREE_H_WIDTH + m, TREE_H_WIDTH - m * rng):
             for iz in range(-TREE_H_WIDTH + m * rng, TREE_H_WIDTH - m):
                 if (ix + iz) % 4:
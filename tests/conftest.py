@@ -0,0 +1,13 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fixed_world import build_fixed_world
+
+
+@pytest.fixture(scope='session')
+def fixed_world():
+    """The height tiles and voxel pool of the fixed world, generated once for every test."""
+    return build_fixed_world()
@@ -0,0 +1,62 @@
+import pytest
+from settings import *
+from voxel_storage import AIR_SLOT, create_pool
+from meshes.chunk_mesh_builder import (ALL_SECTIONS, CHUNK_SECTIONS, PADDED_VOL, build_chunk_mesh, build_greedy_mesh,
+                                      count_faces, fill_padded_volume, get_face_offsets)
+from fixed_world import DENSE_SLOTS, WORLD_COLUMNS, get_chunk_position, get_mixed_chunks
+
+MESHERS = (build_chunk_mesh, build_greedy_mesh)
+AIR_WORLD = create_pool(0), np.full(WORLD_VOL, AIR_SLOT, dtype='int32')  # every neighbour chunk is air
+
+
+def get_voxel_index(x, y, z):
+    """Returns the index of a voxel within a chunk."""
+    return x + CHUNK_SIZE * z + CHUNK_AREA * y
+
+
+def get_face_counts(mesher, voxels, storage=AIR_WORLD, position=(1, 0, 1), indexed=True):
+    """Meshes a chunk and returns the quad count of each face direction, checking the vertex data size."""
+    vertex_data, section_offsets = mesher(voxels, 1, position, storage, WORLD_COLUMNS, indexed, ALL_SECTIONS)
+    assert len(vertex_data) == section_offsets[-1] * (4 if indexed else 6)
+    return np.diff(get_face_offsets(section_offsets)).tolist()
+
+
+@pytest.mark.parametrize('mesher', MESHERS)
+@pytest.mark.parametrize('indexed', (True, False))
+def test_single_voxel_has_six_faces(mesher, indexed):
+    voxels = np.zeros(CHUNK_VOL, dtype='uint8')
+    voxels[get_voxel_index(10, 10, 10)] = GRASS
+    assert get_face_counts(mesher, voxels, indexed=indexed) == [1] * 6
+
+
+def test_hidden_faces_are_culled():
+    """Two touching voxels hide the faces between them."""
+    voxels = np.zeros(CHUNK_VOL, dtype='uint8')
+    voxels[get_voxel_index(10, 10, 10)] = voxels[get_voxel_index(11, 10, 10)] = STONE
+    assert get_face_counts(build_chunk_mesh, voxels) == [2, 2, 1, 1, 2, 2]
+
+
+def test_greedy_merges_a_flat_slab():
+    """A 4x4 slab takes a quad per voxel face per-voxel, and one quad per face direction greedy."""
+    voxels = np.zeros(CHUNK_VOL, dtype='uint8')
+    for x in range(4):
+        for z in range(4):
+            voxels[get_voxel_index(2 + x, 5, 2 + z)] = STONE
+    assert get_face_counts(build_chunk_mesh, voxels) == [16, 16, 4, 4, 4, 4]
+    assert get_face_counts(build_greedy_mesh, voxels) == [1] * 6
+
+
+def test_fixed_world_face_counts(fixed_world):
+    """Per-voxel meshes hold every counted face; greedy meshes never need more quads per face direction."""
+    _, voxels = fixed_world
+    storage = voxels, DENSE_SLOTS
+    padded = np.empty(PADDED_VOL, dtype='uint8')
+    for chunk_index in get_mixed_chunks(voxels)[::40].tolist():
+        chunk_voxels, position = voxels[DENSE_SLOTS[chunk_index]], get_chunk_position(chunk_index)
+        fill_padded_volume(chunk_voxels, position, storage, WORLD_COLUMNS, padded, ALL_SECTIONS)
+        counted = count_faces(chunk_voxels, padded, ALL_SECTIONS)
+        assert len(counted) == 6 * CHUNK_SECTIONS + 1
+        naive = get_face_counts(build_chunk_mesh, chunk_voxels, storage, position)
+        greedy = get_face_counts(build_greedy_mesh, chunk_voxels, storage, position)
+        assert naive == np.diff(get_face_offsets(counted)).tolist()
+        assert all(0 < merged <= faces or merged == faces == 0 for merged, faces in zip(greedy, naive))
@@ -0,0 +1,65 @@
+from settings import *
+from camera import Camera
+from occlusion import ALL_CONNECTED, ANY_FACE, build_connectivity, find_visible_chunks, get_region_faces
+from fixed_world import ALL_CHUNKS, DENSE_SLOTS, WORLD_COLUMNS, get_chunk_position
+
+CENTERS = np.array([(np.array(get_chunk_position(chunk_index)) + 0.5) * CHUNK_SIZE for chunk_index in ALL_CHUNKS],
+                   dtype='float32')
+CENTER_CHUNK = WORLD_W // 2 + WORLD_W * (WORLD_D // 2)  # the bottom chunk of the middle column
+
+
+def get_camera(position, yaw=-90, pitch=0):
+    """Returns a camera with its frustum updated."""
+    camera = Camera(position, yaw, pitch)
+    camera.update()
+    return camera
+
+
+def test_frustum_keeps_chunks_ahead():
+    """Chunks ahead of the camera are kept, chunks behind it culled, and unloaded rows never visible."""
+    camera = get_camera(CENTERS[CENTER_CHUNK])  # looking toward -z
+    ahead, behind = CENTER_CHUNK - 2 * WORLD_W, CENTER_CHUNK + 2 * WORLD_W
+    centers = CENTERS.copy()
+    centers[ahead - 1] = np.nan
+    visible = camera.frustum.cull(centers).tolist()
+    assert CENTER_CHUNK in visible and ahead in visible
+    assert behind not in visible and ahead - 1 not in visible
+    assert visible == [i for i in ALL_CHUNKS.tolist() if camera.frustum.is_sphere_on_frustum(glm.vec3(*CENTERS[i]))
+                       and i != ahead - 1]
+
+
+def test_open_world_reaches_every_chunk():
+    """A walk through chunks connected on every face reaches every chunk within the frustum."""
+    connectivity = np.full(WORLD_VOL, ALL_CONNECTED, dtype='int64')
+    in_frustum = np.ones(WORLD_VOL, dtype=np.bool_)
+    in_frustum[WORLD_VOL - 1] = False  # a corner chunk, hiding no chunk behind it
+    reached = find_visible_chunks(np.array([CENTER_CHUNK], dtype='int32'), np.array([ANY_FACE]), connectivity,
+                                  in_frustum, WORLD_COLUMNS)
+    assert sorted(reached.tolist()) == np.flatnonzero(in_frustum).tolist()
+
+
+def test_sealed_room_hides_every_other_chunk(fixed_world):
+    """From a room sealed in solid stone only its own chunk is visible; a shaft to the top reveals more."""
+    _, generated = fixed_world
+    voxels = generated.copy()
+    room = voxels[DENSE_SLOTS[CENTER_CHUNK]].reshape(CHUNK_SIZE, CHUNK_SIZE, CHUNK_SIZE)  # y, z, x
+    room[:] = STONE
+    room[20:28, 20:28, 20:28] = 0
+    camera_voxel = 24 + CHUNK_SIZE * 24 + CHUNK_AREA * 24
+    connectivity = np.empty(WORLD_VOL, dtype='int64')
+    storage = voxels, DENSE_SLOTS
+    seeds, seed_faces = np.array([CENTER_CHUNK], dtype='int32'), np.array([ANY_FACE])
+    in_frustum = np.ones(WORLD_VOL, dtype=np.bool_)
+
+    build_connectivity(ALL_CHUNKS, storage, connectivity)
+    camera_faces = get_region_faces(room.ravel(), camera_voxel, np.zeros(CHUNK_VOL, dtype=np.bool_))
+    assert camera_faces == 0
+    reached = find_visible_chunks(seeds, seed_faces, connectivity, in_frustum, WORLD_COLUMNS, camera_faces)
+    assert reached.tolist() == [CENTER_CHUNK]
+
+    room[28:, 23:25, 23:25] = 0
+    build_connectivity(ALL_CHUNKS, storage, connectivity)
+    camera_faces = get_region_faces(room.ravel(), camera_voxel, np.zeros(CHUNK_VOL, dtype=np.bool_))
+    assert camera_faces == 1  # the top face
+    reached = find_visible_chunks(seeds, seed_faces, connectivity, in_frustum, WORLD_COLUMNS, camera_faces)
+    assert CENTER_CHUNK + WORLD_AREA in reached.tolist() and len(reached) > 2
@@ -0,0 +1,58 @@
+from settings import *
+from edit_journal import HEADER, RECORD, EditJournal
+
+
+def test_edits_replay_after_reopening(tmp_path):
+    """Reopening the journal replays its edits, later edits of a voxel overriding earlier ones."""
+    path = str(tmp_path / 'edits.journal')
+    journal = EditJournal(path)
+    journal.record((0, 0, 0), 5, STONE)
+    journal.record((0, 0, 0), 2, DIRT)
+    journal.record((0, 0, 0), 5, 0)
+    journal.record((1, 1, -1), 7, GRASS)
+    journal.close()
+
+    journal = EditJournal(path)
+    indices, ids = journal.get_delta((0, 0, 0))
+    assert indices.tolist() == [2, 5] and ids.tolist() == [DIRT, 0]
+    indices, ids = journal.get_delta((1, 1, -1))
+    assert indices.tolist() == [7] and ids.tolist() == [GRASS]
+    assert journal.get_delta((2, 0, 0)) is None
+    assert journal.live == 3
+    journal.close()
+
+
+def test_torn_record_is_dropped(tmp_path):
+    """A record cut short by a crash is dropped and the records before it are kept."""
+    path = str(tmp_path / 'edits.journal')
+    journal = EditJournal(path)
+    journal.record((0, 0, 0), 1, STONE)
+    journal.record((0, 0, 0), 2, STONE)
+    journal.close()
+    with open(path, 'ab') as file:
+        file.write(b'\x01\x02\x03')
+
+    journal = EditJournal(path)
+    assert journal.get_delta((0, 0, 0))[0].tolist() == [1, 2]
+    journal.close()
+    assert os.path.getsize(path) == HEADER.size + 2 * RECORD.itemsize
+
+
+def test_compaction_keeps_live_edits(tmp_path):
+    """Once overwritten records dominate, the journal is rewritten with one record per live edit."""
+    path = str(tmp_path / 'edits.journal')
+    journal = EditJournal(path)
+    for i in range(JOURNAL_COMPACT_RATIO * JOURNAL_MIN_RECORDS + 1):
+        journal.record((0, 0, 0), i % 3, STONE if i % 2 else DIRT)
+    journal.update()
+    assert journal.compaction is not None
+    journal.record((0, 0, 0), 9, GRASS)  # made while compacting
+    journal.close()
+    assert os.path.getsize(path) == HEADER.size + 4 * RECORD.itemsize
+
+    expected = journal.get_delta((0, 0, 0))
+    journal = EditJournal(path)
+    indices, ids = journal.get_delta((0, 0, 0))
+    assert indices.tolist() == expected[0].tolist() == [0, 1, 2, 9]
+    assert ids.tolist() == expected[1].tolist()
+    journal.close()
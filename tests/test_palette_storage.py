@@ -0,0 +1,85 @@
+from settings import *
+from palette_storage import PaletteStore
+from voxel_storage import read_voxel
+from fixed_world import DENSE_SLOTS
+
+
+def test_chunks_round_trip(fixed_world):
+    """Packed chunks of the fixed world unpack and read back to their voxels."""
+    _, voxels = fixed_world
+    store = PaletteStore(4)
+    rows = [voxels[0], voxels[STONE], *voxels[len(voxels) - 2:]]
+    for chunk_index, row in enumerate(rows):
+        store.pack(chunk_index, row)
+    rng = np.random.default_rng(SEED)
+    for chunk_index, row in enumerate(rows):
+        assert np.array_equal(store.unpack(chunk_index), row)
+        for voxel_index in rng.integers(CHUNK_VOL, size=64).tolist():
+            assert store.get_voxel(chunk_index, voxel_index) == row[voxel_index]
+
+
+def test_read_voxel_matches_both_layouts(fixed_world):
+    """read_voxel reads the same IDs from the dense pool and the palette store, outside njit code."""
+    _, voxels = fixed_world
+    chunk_indices = [0, len(DENSE_SLOTS) - 1]
+    store = PaletteStore(len(DENSE_SLOTS))
+    for chunk_index in chunk_indices:
+        store.pack(chunk_index, voxels[DENSE_SLOTS[chunk_index]])
+    rng = np.random.default_rng(SEED)
+    for chunk_index in chunk_indices:
+        for voxel_index in rng.integers(CHUNK_VOL, size=64).tolist():
+            expected = voxels[DENSE_SLOTS[chunk_index], voxel_index]
+            assert read_voxel((voxels, DENSE_SLOTS), chunk_index, voxel_index) == expected
+            assert read_voxel(store.storage, chunk_index, voxel_index) == expected
+
+
+def test_palette_widths():
+    """The packed width is the narrowest holding the chunk's palette, and uniform chunks take no words."""
+    store = PaletteStore(3)
+    store.pack(0, np.full(CHUNK_VOL, SAND, dtype='uint8'))
+    store.pack(1, np.arange(CHUNK_VOL, dtype='uint8') % 3)
+    store.pack(2, np.arange(CHUNK_VOL, dtype='uint8') % 7)
+    assert store.offsets[0] == 0
+    assert store.bits[1:].tolist() == [2, 4]
+
+
+def test_set_voxel_widens_and_reads_back():
+    """Setting voxels adds their IDs to the palette, widening the chunk, without touching other voxels."""
+    store = PaletteStore(2)
+    expected = np.zeros(CHUNK_VOL, dtype='uint8')
+    store.pack(0, expected)
+    store.pack(1, np.full(CHUNK_VOL, STONE, dtype='uint8'))
+    rng = np.random.default_rng(SEED)
+    for voxel_id in range(1, WOOD + 1):
+        for voxel_index in rng.integers(CHUNK_VOL, size=8).tolist():
+            store.set_voxel(0, voxel_index, voxel_id)
+            expected[voxel_index] = voxel_id
+    assert np.array_equal(store.unpack(0), expected)
+    assert (store.unpack(1) == STONE).all()
+
+
+def test_set_voxel_narrows_when_ids_leave():
+    """Edits that remove IDs from a chunk reuse their palette entries and repack it at a narrower width."""
+    store = PaletteStore(1)
+    voxels = (np.arange(CHUNK_VOL) % 5).astype('uint8')
+    store.pack(0, voxels)
+    assert store.bits[0] == 4
+    for voxel_index in np.flatnonzero(voxels >= 2).tolist():
+        store.set_voxel(0, voxel_index, 1)
+    voxels[voxels >= 2] = 1
+    assert store.bits[0] == 1
+    assert np.array_equal(store.unpack(0), voxels)
+
+    store.set_voxel(0, 7, WOOD)  # a third ID widens again
+    voxels[7] = WOOD
+    assert store.bits[0] == 2 and store.palette_sizes[0] == 3
+    store.set_voxel(0, 7, 0)
+    store.set_voxel(0, 8, SNOW)  # takes the entry WOOD left
+    voxels[7], voxels[8] = 0, SNOW
+    assert store.palette_sizes[0] == 3
+    assert np.array_equal(store.unpack(0), voxels)
+
+    for voxel_index in np.flatnonzero(voxels).tolist():
+        store.set_voxel(0, voxel_index, 0)
+    assert store.offsets[0] == 0 and store.palette_sizes[0] == 1  # uniform air again
+    assert (store.unpack(0) == 0).all()
@@ -0,0 +1,72 @@
+import os
+import region_storage
+from settings import *
+from region_storage import RegionStore, decode_chunk, encode_chunk
+
+
+def make_column(seed):
+    """Returns a random height tile and column of chunks, the top one uniform air."""
+    rng = np.random.default_rng(seed)
+    heightmap = rng.integers(0, WORLD_H * CHUNK_SIZE, CHUNK_AREA).astype('int32')
+    voxels = [rng.integers(0, STONE + 1, CHUNK_VOL).astype('uint8') for _ in range(WORLD_H - 1)]
+    voxels.append(np.zeros(CHUNK_VOL, dtype='uint8'))
+    return heightmap, voxels
+
+
+def test_chunk_records_round_trip():
+    """Mixed chunks decode to their voxels and uniform chunks to their single ID."""
+    mixed = np.arange(CHUNK_VOL, dtype='uint8') % 7
+    out = np.empty(CHUNK_VOL, dtype='uint8')
+    assert decode_chunk(encode_chunk(mixed), out) == -1
+    assert np.array_equal(out, mixed)
+    assert decode_chunk(encode_chunk(np.full(CHUNK_VOL, STONE, dtype='uint8')), out) == STONE
+    assert (out == STONE).all()
+
+
+def test_columns_round_trip(tmp_path):
+    """Saved columns load back unchanged after the store is reopened; unsaved ones load as None."""
+    store = RegionStore(str(tmp_path))
+    columns = {(cx, cz): make_column(seed) for seed, (cx, cz) in enumerate(((0, 0), (1, 0), (REGION_SIZE, 3), (-1, -2)))}
+    for (cx, cz), (heightmap, voxels) in columns.items():
+        store.save_column(cx, cz, heightmap, voxels)
+    store.close()
+
+    store = RegionStore(str(tmp_path))
+    for (cx, cz), (heightmap, voxels) in columns.items():
+        loaded_heightmap, loaded_voxels, uniform_ids = store.load_column(cx, cz)
+        assert np.array_equal(loaded_heightmap, heightmap)
+        assert np.array_equal(loaded_voxels, np.array(voxels))
+        assert uniform_ids.tolist() == [-1] * (WORLD_H - 1) + [0]
+    assert store.load_column(2, 2) is None
+    store.close()
+
+
+def test_close_compacts_replaced_records(tmp_path):
+    """Closing the store drops the records of columns saved over, keeping the latest ones."""
+    store = RegionStore(str(tmp_path))
+    for seed in range(3):
+        store.save_column(0, 0, *make_column(seed))
+    region, _ = store.get_region(0, 0)
+    assert region.get_dead_bytes() > 0
+    size = store.get_size()
+    store.close()
+    assert store.get_size() < size
+
+    store = RegionStore(str(tmp_path))
+    heightmap, voxels = make_column(2)
+    loaded_heightmap, loaded_voxels, _ = store.load_column(0, 0)
+    assert np.array_equal(loaded_heightmap, heightmap) and np.array_equal(loaded_voxels, np.array(voxels))
+    assert store.get_region(0, 0)[0].get_dead_bytes() == 0
+    store.close()
+
+
+def test_files_of_other_generator_settings_are_rejected(tmp_path, monkeypatch):
+    """A region written with other generator settings is recreated, so its columns are generated again."""
+    store = RegionStore(str(tmp_path))
+    store.save_column(0, 0, *make_column(0))
+    store.close()
+    monkeypatch.setattr(region_storage, 'GENERATOR_HASH', region_storage.GENERATOR_HASH ^ 1)
+    store = RegionStore(str(tmp_path))
+    assert store.load_column(0, 0) is None
+    store.close()
+    assert os.listdir(tmp_path) == ['r.0.0.vxr']
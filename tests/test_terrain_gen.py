@@ -0,0 +1,34 @@
+from concurrent.futures import ThreadPoolExecutor
+from settings import *
+from terrain_gen import generate_terrain
+from fixed_world import ALL_CHUNKS, DENSE_SLOTS, build_world_heightmaps, get_chunk_position
+
+
+def test_heightmaps_are_repeatable(fixed_world):
+    """Height tiles depend only on the seed and the column position."""
+    heightmaps, _ = fixed_world
+    assert np.array_equal(build_world_heightmaps(), heightmaps)
+
+
+def test_chunks_match_the_parallel_kernel_in_any_order(fixed_world):
+    """Chunks generated one at a time, in shuffled order across threads, match the parallel kernel byte for byte."""
+    heightmaps, expected = fixed_world
+    order = np.random.default_rng(SEED).permutation(ALL_CHUNKS)[:64].tolist()
+    voxels = {chunk_index: np.zeros(CHUNK_VOL, dtype='uint8') for chunk_index in order}
+
+    def build(chunk_index):
+        x, y, z = get_chunk_position(chunk_index)
+        generate_terrain(voxels[chunk_index], heightmaps[x + WORLD_W * z], x * CHUNK_SIZE, y * CHUNK_SIZE,
+                         z * CHUNK_SIZE, CAVE_STRIDE)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(build, order))
+    for chunk_index in order:
+        assert np.array_equal(voxels[chunk_index], expected[DENSE_SLOTS[chunk_index]]), chunk_index
+
+
+def test_terrain_has_ground_and_air(fixed_world):
+    """The generated world is neither empty nor solid."""
+    _, voxels = fixed_world
+    solid = np.count_nonzero(voxels[DENSE_SLOTS])
+    assert 0 < solid < WORLD_VOL * CHUNK_VOL
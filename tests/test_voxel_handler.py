@@ -0,0 +1,34 @@
+from types import SimpleNamespace
+from settings import *
+from voxel_handler import VoxelHandler
+
+
+class SolidWorld:
+    """A world whose only solid voxels are the given world positions, each chunk reading them back by index."""
+    def __init__(self, solid, position, forward):
+        self.solid = {tuple(voxel) for voxel in solid}
+        self.app = SimpleNamespace(player=SimpleNamespace(position=glm.vec3(position), forward=glm.vec3(forward)))
+
+    def get_chunk(self, cx, cy, cz):
+        origin = glm.ivec3(cx, cy, cz) * CHUNK_SIZE
+
+        def get_voxel(voxel_index):
+            x, z, y = voxel_index % CHUNK_SIZE, voxel_index // CHUNK_SIZE % CHUNK_SIZE, voxel_index // CHUNK_AREA
+            return STONE if tuple(origin + glm.ivec3(x, y, z)) in self.solid else 0
+        return SimpleNamespace(get_voxel=get_voxel)
+
+
+def cast(solid, position, forward):
+    """Casts the ray of a player and returns the voxel hit and its normal, or None."""
+    handler = VoxelHandler(SolidWorld(solid, position, forward))
+    if not handler.ray_cast():
+        return None
+    return tuple(handler.voxel_world_pos), tuple(handler.voxel_normal)
+
+
+def test_ray_starts_in_the_cell_below_at_negative_coordinates():
+    """From a negative, non-integer x the ray starts in the cell holding the player, in both directions along x."""
+    position = (-62.3, 10.5, 480.5)  # in cell x = -63, beside the voxel at x = -62
+    assert cast([(-62, 10, 480)], position, (-1, 0, 0)) is None
+    assert cast([(-62, 10, 480)], position, (1, 0, 0)) == ((-62, 10, 480), (-1, 0, 0))
+    assert cast([(-62, 10, 480), (-65, 10, 480)], position, (-1, 0, 0)) == ((-65, 10, 480), (1, 0, 0))
@@ -1,5 +1,4 @@
 from settings import *
-from meshes.chunk_mesh_builder import get_chunk_index
 
 class VoxelHandler:
     """Handles voxel interactions, such as adding and removing voxels, and rebuilding chunk meshes when modifications occur."""
@@ -11,7 +10,7 @@ class VoxelHandler:
             world: The world instance managing the voxel terrain.
         """
         self.app = world.app
-        self.chunks = world.chunks
+        self.world = world
         self.chunk = None
         self.voxel_id = None
         self.voxel_index = None
@@ -21,53 +20,20 @@ class VoxelHandler:
         self.new_voxel_id = 1
 
     def add_voxel(self):
-        """Adds a voxel at the targeted position if it is empty, then rebuilds the chunk mesh."""
+        """Adds a voxel at the targeted position if it is empty, then rebuilds the affected mesh sections."""
         if self.voxel_id:
-            result = self.get_voxel_id(self.voxel_world_pos + self.voxel_normal)
+            voxel_world_pos = self.voxel_world_pos + self.voxel_normal
+            result = self.get_voxel_id(voxel_world_pos)
             if not result[0]:
                 _, voxel_index, _, chunk = result
-                chunk.voxels[voxel_index] = self.new_voxel_id
-                chunk.mesh.rebuild()
-                if chunk.is_empty:
-                    chunk.is_empty = False
-
-    def rebuild_adj_chunk(self, adj_voxel_pos):
-        """
-        Rebuilds the mesh of an adjacent chunk if the voxel modification affects it.
-
-        Parameters:
-            adj_voxel_pos: The world position of the adjacent voxel.
-        """
-        index = get_chunk_index(adj_voxel_pos)
-        if index != -1:
-            self.chunks[index].mesh.rebuild()
-
-    def rebuild_adjacent_chunks(self):
-        """Rebuilds the meshes of chunks adjacent to the modified voxel."""
-        lx, ly, lz = self.voxel_local_pos
-        wx, wy, wz = self.voxel_world_pos
-
-        if lx == 0:
-            self.rebuild_adj_chunk((wx - 1, wy, wz))
-        elif lx == CHUNK_SIZE - 1:
-            self.rebuild_adj_chunk((wx + 1, wy, wz))
-
-        if ly == 0:
-            self.rebuild_adj_chunk((wx, wy - 1, wz))
-        elif ly == CHUNK_SIZE - 1:
-            self.rebuild_adj_chunk((wx, wy + 1, wz))
-
-        if lz == 0:
-            self.rebuild_adj_chunk((wx, wy, wz - 1))
-        elif lz == CHUNK_SIZE - 1:
-            self.rebuild_adj_chunk((wx, wy, wz + 1))
+                chunk.set_voxel(voxel_index, self.new_voxel_id)
+                self.world.rebuild_voxel_meshes(voxel_world_pos)
 
     def remove_voxel(self):
-        """Removes a voxel at the targeted position and rebuilds affected chunk meshes."""
+        """Removes a voxel at the targeted position and rebuilds the affected mesh sections."""
         if self.voxel_id:
-            self.chunk.voxels[self.voxel_index] = 0
-            self.chunk.mesh.rebuild()
-            self.rebuild_adjacent_chunks()
+            self.chunk.set_voxel(self.voxel_index, 0)
+            self.world.rebuild_voxel_meshes(self.voxel_world_pos)
 
     def update(self):
         """Updates the voxel handler by performing a raycast to detect voxel interactions."""
@@ -80,7 +46,7 @@ class VoxelHandler:
         # end point
         x2, y2, z2 = self.app.player.position + self.app.player.forward * MAX_RAY_DIST
 
-        current_voxel_pos = glm.ivec3(x1, y1, z1)
+        current_voxel_pos = glm.ivec3(glm.floor(self.app.player.position))
         self.voxel_id = 0
         self.voxel_normal = glm.ivec3(0)
         step_dir = -1
@@ -140,16 +106,14 @@ class VoxelHandler:
         Returns:
             Tuple containing voxel ID, index, local position, and chunk reference.
         """
-        cx, cy, cz = chunk_pos = voxel_world_pos / CHUNK_SIZE
-
-        if 0 <= cx < WORLD_W and 0 <= cy < WORLD_H and 0 <= cz < WORLD_D:
-            chunk_index = cx + WORLD_W * cz + WORLD_AREA * cy
-            chunk = self.chunks[chunk_index]
+        cx, cy, cz = chunk_pos = voxel_world_pos // CHUNK_SIZE
+        chunk = self.world.get_chunk(cx, cy, cz)
 
+        if chunk is not None:
             lx, ly, lz = voxel_local_pos = voxel_world_pos - chunk_pos * CHUNK_SIZE
 
             voxel_index = lx + CHUNK_SIZE * lz + CHUNK_AREA * ly
-            voxel_id = chunk.voxels[voxel_index]
+            voxel_id = chunk.get_voxel(voxel_index)
 
             return voxel_id, voxel_index, voxel_local_pos, chunk
         return 0, 0, 0, 0
@@ -0,0 +1,158 @@
+from settings import *
+from numba import prange
+from numba.extending import overload
+from palette_storage import get_packed_voxel, unpack_entries
+
+# The first rows of the world voxel pool are shared, read-only rows, one per voxel ID,
+# with every voxel set to that ID. A uniform chunk stores only its ID as its slot and
+# reads through the shared row, so it needs no dense array of its own. Rows from
+# UNIFORM_ROWS on hold dense chunks.
+UNIFORM_ROWS = WOOD + 1
+AIR_SLOT = 0
+# Slot of mixed chunks held by the palette store instead of a dense row
+PACKED_SLOT = 2 ** 31 - 1
+
+
+def create_pool(dense_rows):
+    """
+    Allocates a world voxel pool with the shared uniform rows followed by zeroed dense rows.
+
+    Parameters:
+        dense_rows (int): The number of dense chunk rows.
+
+    Returns:
+        np.array: The [UNIFORM_ROWS + dense_rows, CHUNK_VOL] voxel pool.
+    """
+    pool = np.zeros([UNIFORM_ROWS + dense_rows, CHUNK_VOL], dtype='uint8')
+    for voxel_id in range(UNIFORM_ROWS):
+        pool[voxel_id] = voxel_id
+    return pool
+
+
+@njit(parallel=True)
+def find_uniform_rows(voxels, rows, uniform_ids):
+    """
+    Finds pool rows whose voxels all hold the same ID.
+
+    Parameters:
+        voxels (ndarray): The [rows, CHUNK_VOL] voxel pool.
+        rows (ndarray): The pool rows to check.
+        uniform_ids (ndarray): Output per checked row, the shared voxel ID or -1 if the row is mixed.
+    """
+    for i in prange(rows.size):
+        row_voxels = voxels[rows[i]]
+        voxel_id = row_voxels[0]
+        uniform_ids[i] = voxel_id
+        for j in range(1, CHUNK_VOL):
+            if row_voxels[j] != voxel_id:
+                uniform_ids[i] = -1
+                break
+
+
+# Chunk table columns not holding a loaded column
+UNLOADED = -2 ** 31
+
+
+@njit
+def get_column_index(cx, cz):
+    """
+    Maps a chunk column position to its entry in the ring-buffer chunk table.
+
+    Parameters:
+        cx, cz (int): The column position in chunk coordinates.
+
+    Returns:
+        int: The column index, wrapped around the WORLD_W x WORLD_D table.
+    """
+    return cx % WORLD_W + WORLD_W * (cz % WORLD_D)
+
+
+@njit
+def get_chunk_index(cx, cy, cz, chunk_columns):
+    """
+    Returns the chunk table index of a chunk position if that chunk is loaded.
+
+    Parameters:
+        cx, cy, cz (int): The chunk position in chunk coordinates.
+        chunk_columns (ndarray): The [WORLD_AREA, 2] column position held by each table column.
+
+    Returns:
+        int: The chunk index, or -1 if the chunk is outside the world or not loaded.
+    """
+    if not 0 <= cy < WORLD_H:
+        return -1
+    column = get_column_index(cx, cz)
+    if chunk_columns[column, 0] != cx or chunk_columns[column, 1] != cz:
+        return -1
+    return column + WORLD_AREA * cy
+
+
+def get_chunk_voxels(storage, chunk_index):
+    """
+    Returns the dense voxels of a chunk from the world's voxel storage.
+
+    Parameters:
+        storage (tuple): (voxels, chunk_slots) for the dense pool, or PaletteStore.storage.
+        chunk_index (int): The chunk index in the chunk table.
+
+    Returns:
+        ndarray: The chunk's pool row, or an unpacked copy for the palette store.
+    """
+    if len(storage) == 2:
+        voxels, chunk_slots = storage
+        return voxels[chunk_slots[chunk_index]]
+    words, offsets, bits, palettes = storage
+    chunk_voxels = np.empty(CHUNK_VOL, dtype='uint8')
+    unpack_entries(words, offsets[chunk_index], bits[chunk_index], palettes[chunk_index], chunk_voxels)
+    return chunk_voxels
+
+
+def read_voxel(storage, chunk_index, voxel_index):
+    """
+    Reads one voxel ID of a chunk from the world's voxel storage.
+
+    Parameters:
+        storage (tuple): (voxels, chunk_slots) for the dense pool, or PaletteStore.storage.
+        chunk_index (int): The chunk index in the chunk table.
+        voxel_index (int): The voxel index within the chunk.
+
+    Returns:
+        int: The voxel ID.
+    """
+    if len(storage) == 2:
+        voxels, chunk_slots = storage
+        return voxels[chunk_slots[chunk_index], voxel_index]
+    words, offsets, bits, palettes = storage
+    return get_packed_voxel(words, offsets, bits, palettes, chunk_index, voxel_index)
+
+
+@overload(read_voxel)
+def overload_read_voxel(storage, chunk_index, voxel_index):
+    """Picks the reader matching the storage layout when read_voxel is compiled."""
+    if len(storage) == 2:
+        def read_dense(storage, chunk_index, voxel_index):
+            voxels, chunk_slots = storage
+            return voxels[chunk_slots[chunk_index], voxel_index]
+        return read_dense
+
+    def read_packed(storage, chunk_index, voxel_index):
+        words, offsets, bits, palettes = storage
+        return get_packed_voxel(words, offsets, bits, palettes, chunk_index, voxel_index)
+    return read_packed
+
+
+@overload(get_chunk_voxels)
+def overload_get_chunk_voxels(storage, chunk_index):
+    """Picks the reader matching the storage layout when get_chunk_voxels is compiled."""
+    if len(storage) == 2:
+        def get_dense(storage, chunk_index):
+            voxels, chunk_slots = storage
+            return voxels[chunk_slots[chunk_index]]
+        return get_dense
+
+    def get_packed(storage, chunk_index):
+        words, offsets, bits, palettes = storage
+        chunk_voxels = np.empty(CHUNK_VOL, dtype='uint8')
+        unpack_entries(words, offsets[chunk_index], bits[chunk_index], palettes[chunk_index], chunk_voxels)
+        return chunk_voxels
+    return get_packed
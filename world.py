@@ -1,9 +1,31 @@
 from settings import *
-from world_objects.chunk import Chunk
+from world_objects.chunk import Chunk, get_lod
 from voxel_handler import VoxelHandler
+from chunk_builder import MESH_FORMAT_SIZE, ChunkBuilder
+from region_storage import RegionStore
+from edit_journal import EditJournal
+from palette_storage import PaletteStore
+from meshes.chunk_mesh import ORIGIN_BYTES, MeshArena
+from meshes.chunk_mesh_builder import build_mesh_keys, build_world_meshes, get_edit_sections, get_mesher_salt
+from mesh_cache import MeshCache
+from occlusion_queries import OcclusionQueries
+from frustum import sort_by_distance
+from occlusion import ALL_CONNECTED, ALL_FACES, ANY_FACE, build_connectivity, find_visible_chunks, get_region_faces
+from terrain_gen import build_heightmap, generate_chunks, get_height
+from voxel_storage import *
+from collections import deque
+import numba
 
 class World:
-    """ Represents the voxel-based world, managing chunks and voxel data."""
+    """
+    Represents the voxel-based world, managing chunks and voxel data.
+
+    Chunks live in a WORLD_W x WORLD_H x WORLD_D table indexed as a ring buffer, so column
+    (cx, cz) always occupies table column (cx % WORLD_W, cz % WORLD_D). A fixed world fills the
+    table once; with STREAMING, columns are loaded and unloaded around the player. Columns are
+    built by the chunk builder in the background with BUILD_ASYNC, and loaded from region files
+    with SAVE_WORLD, edits being replayed from the edit journal. See settings.py for the rest.
+    """
     def __init__(self, app):
         """
         Initializes the world with chunks, voxel data, and a voxel handler.
@@ -13,32 +35,759 @@ class World:
         """
         self.app = app
         self.chunks = [None for _ in range(WORLD_VOL)]
-        self.voxels = np.empty([WORLD_VOL, CHUNK_VOL], dtype='uint8')
+        self.voxels = create_pool(0)  # Pool of shared uniform rows and dense chunk rows
+        self.chunk_slots = np.full(WORLD_VOL, AIR_SLOT, dtype='int32')  # Pool row of each chunk
+        self.chunk_columns = np.full([WORLD_AREA, 2], UNLOADED, dtype='int32')  # Column held by each table column
+        self.chunk_centers = np.full([WORLD_VOL, 3], np.nan, dtype='float32')  # Center of each loaded chunk, for culling
+        self.chunk_connectivity = np.full(WORLD_VOL, ALL_CONNECTED, dtype='int64')  # Face pairs connected through air
+        self.chunk_origins = app.ctx.buffer(reserve=WORLD_VOL * ORIGIN_BYTES)  # Minimum corner of each loaded chunk, for drawing
+        self.draw_order = np.arange(WORLD_VOL, dtype='int32')  # Chunk table indices nearest the camera first, as of the last frame
+        self.free_slots = []
+        self.retired_slots = deque()  # (storage epoch, row) of freed rows mesh jobs may still read, see free_slot
+        self.storage_epoch = 0  # Storage copies handed out, see get_storage
+        self.palette = PaletteStore(WORLD_VOL) if PALETTE_STORAGE else None
+        self.greedy_meshing = GREEDY_MESHING
+        self.submitted_vertices = 0  # Vertices submitted by the chunk draw calls of the last frame
+        self.drawn_chunks = 0  # Chunks drawn in the last frame
+        self.draw_calls = 0  # Draw calls made by the chunk pass in the last frame
+        self.uniform_uploads = 0  # Uniform writes made by the chunk pass in the last frame, none unless querying boxes
+        self.occluded_chunks = 0  # Chunks within the frustum skipped by occlusion culling in the last frame
+        self.camera_region = None  # The camera's chunk, its mesh version and the faces its air region touches
+        self.camera_region_voxels = np.zeros(CHUNK_VOL, dtype=np.bool_)  # The voxels of that air region
+        self.queries = OcclusionQueries(app.ctx, app.shader_program.chunk_box, WORLD_VOL) if OCCLUSION_QUERIES else None
+        self.heightmaps = np.empty([WORLD_AREA, CHUNK_AREA], dtype='int32')
+        self.player_column = None  # Column the player was in when streaming last ran
+        self.lod_position = glm.vec3(app.player.position)  # Player position when LOD levels were last updated
+        self.region_store = RegionStore() if SAVE_WORLD else None
+        self.mesh_cache = MeshCache() if SAVE_WORLD and MESH_CACHE else None
+        self.journal = EditJournal(f'{SAVE_DIR}/edits.journal' if SAVE_WORLD else None)
+        self.builder = ChunkBuilder(self) if BUILD_ASYNC else None
         self.build_chunks()
         self.build_chunk_mesh()
         self.voxel_handler = VoxelHandler(self)
 
     def update(self):
-        """Updates the world, particularly handling voxel interactions."""
+        """Updates the world, streaming chunks around the player and handling voxel interactions."""
+        if STREAMING:
+            self.stream_chunks()
+        if LOD_MESHING:
+            self.update_lods()
+        if self.builder is not None:
+            self.builder.update()
+        self.journal.update()
         self.voxel_handler.update()
 
+    def get_heightmap(self, position):
+        """
+        Returns the cached height tile of the column containing a chunk.
+
+        Parameters:
+            position (tuple): The chunk position in chunk coordinates.
+
+        Returns:
+            np.array: CHUNK_AREA terrain heights, indexed as x + CHUNK_SIZE * z.
+        """
+        x, _, z = position
+        return self.heightmaps[get_column_index(x, z)]
+
+    def get_height(self, wx, wz):
+        """
+        Returns the terrain height at a world position without evaluating noise when it is cached.
+
+        Parameters:
+            wx, wz (int): World voxel coordinates.
+
+        Returns:
+            int: The terrain height at (wx, wz).
+        """
+        wx, wz = int(wx), int(wz)
+        cx, cz = wx // CHUNK_SIZE, wz // CHUNK_SIZE
+        if self.is_column_loaded(cx, cz):
+            heightmap = self.heightmaps[get_column_index(cx, cz)]
+            return int(heightmap[wx % CHUNK_SIZE + CHUNK_SIZE * (wz % CHUNK_SIZE)])
+        return get_height(wx, wz)
+
+    def is_column_loaded(self, cx, cz):
+        """
+        Indicates if a chunk column is currently held by the chunk table.
+
+        Parameters:
+            cx, cz (int): The column position in chunk coordinates.
+        """
+        column = get_column_index(cx, cz)
+        return self.chunk_columns[column, 0] == cx and self.chunk_columns[column, 1] == cz
+
+    def is_column_wanted(self, cx, cz):
+        """
+        Indicates if a chunk column belongs to the fixed world or lies within STREAM_RADIUS of the player.
+
+        Parameters:
+            cx, cz (int): The column position in chunk coordinates.
+        """
+        if not STREAMING:
+            return 0 <= cx < WORLD_W and 0 <= cz < WORLD_D
+        px, pz = self.player_column
+        return max(abs(cx - px), abs(cz - pz)) <= STREAM_RADIUS
+
+    def is_column_ready(self, cx, cz):
+        """
+        Indicates if a chunk column is loaded along with every wanted neighbour, diagonal
+        ones included since they shade its border, so its border faces can be meshed for good.
+
+        Parameters:
+            cx, cz (int): The column position in chunk coordinates.
+        """
+        if not self.is_column_loaded(cx, cz):
+            return False
+        for x in range(cx - 1, cx + 2):
+            for z in range(cz - 1, cz + 2):
+                if self.is_column_wanted(x, z) and not self.is_column_loaded(x, z):
+                    return False
+        return True
+
+    def get_player_column(self):
+        """Returns the chunk column position containing the player."""
+        x, _, z = self.app.player.position
+        return int(x // CHUNK_SIZE), int(z // CHUNK_SIZE)
+
+    def get_stream_columns(self):
+        """Returns the positions of the columns within STREAM_RADIUS of the player that are not loaded yet."""
+        px, pz = self.player_column
+        return [(x, z) for x in range(px - STREAM_RADIUS, px + STREAM_RADIUS + 1)
+                for z in range(pz - STREAM_RADIUS, pz + STREAM_RADIUS + 1)
+                if not self.is_column_loaded(x, z)]
+
     def build_chunks(self):
-        """Initializes and generations all chunks in the world."""
-        for x in range(WORLD_W):
-            for y in range(WORLD_H):
-                for z in range(WORLD_D):
-                    chunk = Chunk(self, position=(x, y, z))
-                    chunk_index = x + WORLD_W * z + WORLD_AREA * y
-                    self.chunks[chunk_index] = chunk
-                    self.voxels[chunk_index] = chunk.build_voxels()
-                    chunk.voxels = self.voxels[chunk_index]
+        """Initializes and generates the chunks of the whole world, or of the streaming radius around the player."""
+        if STREAMING:
+            if 2 * (STREAM_RADIUS + STREAM_HYSTERESIS) + 1 > WORLD_W:
+                raise ValueError('streamed columns do not fit in the chunk table, lower STREAM_RADIUS or raise WORLD_W')
+            self.player_column = self.get_player_column()
+            columns = self.get_stream_columns()
+        else:
+            columns = [(x, z) for x in range(WORLD_W) for z in range(WORLD_D)]
+        if self.builder is not None:
+            self.builder.request_columns(columns)
+        else:
+            self.load_columns(columns)
+            self.compact_pool()
+
+    def place_column(self, cx, cz):
+        """
+        Creates the chunks of a column in the chunk table, unloading the column that held its entry.
+        Every chunk starts out as uniform air.
+
+        Parameters:
+            cx, cz (int): The column position in chunk coordinates.
+
+        Returns:
+            list: The column's chunks, bottom to top.
+        """
+        column = get_column_index(cx, cz)
+        if self.chunk_columns[column, 0] != UNLOADED:
+            self.unload_column(column)
+        self.chunk_columns[column] = cx, cz
+
+        chunks = []
+        for y in range(WORLD_H):
+            chunk = Chunk(self, position=(cx, y, cz))
+            self.chunks[chunk.index] = chunk
+            self.chunk_centers[chunk.index] = chunk.center
+            self.chunk_origins.write(chunk.origin, offset=chunk.index * ORIGIN_BYTES)
+            self.chunk_connectivity[chunk.index] = ALL_CONNECTED  # seen through until its voxels are in
+            chunks.append(chunk)
+        return chunks
+
+    def add_column(self, cx, cz, heightmap, voxels, uniform_ids):
+        """
+        Installs a column generated in the background or loaded from disk, copying its dense
+        chunks into the voxel pool.
+
+        Parameters:
+            cx, cz (int): The column position in chunk coordinates.
+            heightmap (ndarray): The column's height tile.
+            voxels (ndarray): The [WORLD_H, CHUNK_VOL] voxels of the column's chunks.
+            uniform_ids (ndarray): Per chunk, its uniform voxel ID or -1 if it is mixed.
+
+        Returns:
+            list: The column's chunks, bottom to top.
+        """
+        chunks = self.place_column(cx, cz)
+        self.heightmaps[get_column_index(cx, cz)] = heightmap
+        self.reserve_slots(int(np.count_nonzero(uniform_ids == -1)))
+        for chunk, chunk_voxels, voxel_id in zip(chunks, voxels, uniform_ids):
+            if voxel_id == -1:
+                slot = self.allocate_slot()
+                self.voxels[slot] = chunk_voxels
+                self.chunk_slots[chunk.index] = slot
+            else:
+                self.chunk_slots[chunk.index] = voxel_id
+        self.apply_edits(chunks)
+        self.pack_chunks(chunks)
+        return chunks
+
+    def load_columns(self, columns):
+        """
+        Loads chunk columns into the chunk table, from the region store when they were saved,
+        and generates the voxels of the others.
+
+        Chunks lying above the highest terrain of their column are stored as uniform air
+        without being generated. The rest get a dense row of the voxel pool and are generated,
+        in parallel when GEN_WORKERS > 1; rows that come out uniform are released again.
+
+        Parameters:
+            columns (list): The (cx, cz) positions of the columns to load.
+
+        Returns:
+            list: The chunks of the loaded columns.
+        """
+        loaded, generated, new_columns = [], [], []
+        for cx, cz in columns:
+            saved = self.region_store.load_column(cx, cz) if self.region_store else None
+            if saved is not None:
+                loaded += self.add_column(cx, cz, *saved)
+                continue
+
+            chunks = self.place_column(cx, cz)
+            new_columns.append(chunks)
+            heightmap = self.heightmaps[get_column_index(cx, cz)]
+            build_heightmap(heightmap, cx * CHUNK_SIZE, cz * CHUNK_SIZE)
+
+            column_top = heightmap.max()
+            for chunk in chunks:
+                loaded.append(chunk)
+                if chunk.position[1] * CHUNK_SIZE < column_top:
+                    generated.append(chunk)
+
+        self.reserve_slots(len(generated))
+        for chunk in generated:
+            self.chunk_slots[chunk.index] = self.allocate_slot()
+
+        if GEN_WORKERS > 1:
+            chunk_indices = np.array([chunk.index for chunk in generated], dtype='int32')
+            threads = numba.get_num_threads()
+            numba.set_num_threads(min(GEN_WORKERS, threads))
+            try:
+                generate_chunks(self.voxels, self.heightmaps, self.chunk_columns, self.chunk_slots,
+                                chunk_indices, CAVE_STRIDE)
+            finally:
+                numba.set_num_threads(threads)
+        else:
+            for chunk in generated:
+                chunk.build_voxels()
+        self.release_uniform_chunks(generated)
+
+        if self.region_store:
+            for chunks in new_columns:
+                x, _, z = chunks[0].position
+                self.region_store.save_column(x, z, self.get_heightmap(chunks[0].position),
+                                              [chunk.voxels for chunk in chunks])
+        generated_chunks = [chunk for chunks in new_columns for chunk in chunks]
+        self.apply_edits(generated_chunks)
+        self.pack_chunks(generated_chunks)
+        return loaded
+
+    def unload_column(self, column):
+        """
+        Removes a column from the chunk table, returning its dense pool rows to the free list.
+
+        Parameters:
+            column (int): The table column index.
+        """
+        for y in range(WORLD_H):
+            chunk_index = column + WORLD_AREA * y
+            slot = self.chunk_slots[chunk_index]
+            if UNIFORM_ROWS <= slot != PACKED_SLOT:
+                self.free_slot(int(slot))
+            if self.palette is not None:
+                self.palette.release(chunk_index)
+            self.chunk_slots[chunk_index] = AIR_SLOT
+            if self.chunks[chunk_index] is not None:
+                self.chunks[chunk_index].drop_mesh()
+            self.chunks[chunk_index] = None
+            self.chunk_centers[chunk_index] = np.nan
+            if self.queries is not None:
+                self.queries.reset(chunk_index)
+        self.chunk_columns[column] = UNLOADED
+
+    def stream_chunks(self):
+        """
+        Loads the columns within STREAM_RADIUS of the player and unloads those that fell more
+        than STREAM_RADIUS + STREAM_HYSTERESIS behind, so walking back and forth over a chunk
+        border does not thrash. Chunks next to newly loaded columns are remeshed to open up
+        their border faces, and chunks around unloaded columns to close theirs and drop the shading
+        the columns cast; with BUILD_ASYNC the new columns are handed to the chunk builder instead.
+        """
+        player_column = self.get_player_column()
+        if player_column == self.player_column:
+            return None
+        self.player_column = px, pz = player_column
+
+        keep = STREAM_RADIUS + STREAM_HYSTERESIS
+        remesh = set()
+        for column, (cx, cz) in enumerate(self.chunk_columns.tolist()):
+            if cx != UNLOADED and max(abs(cx - px), abs(cz - pz)) > keep:
+                self.unload_column(column)
+                remesh.update(self.get_chunk(cx + dx, y, cz + dz) for dx in (-1, 0, 1) for dz in (-1, 0, 1)
+                              for y in range(WORLD_H))
+        remesh = {chunk for chunk in remesh if chunk is not None and self.chunks[chunk.index] is chunk}
+
+        if self.builder is not None:
+            for chunk in remesh:
+                self.builder.request_mesh(chunk)
+            self.builder.request_columns(self.get_stream_columns())
+            return None
+
+        for chunk in self.load_columns(self.get_stream_columns()):
+            x, y, z = chunk.position
+            remesh.update(self.get_chunk(x + dx, y, z + dz) for dx in (-1, 0, 1) for dz in (-1, 0, 1))
+        remesh.discard(None)
+        self.build_meshes(remesh)
+
+    def update_lods(self):
+        """
+        Moves chunks to the level of detail of their distance to the player and remeshes those that
+        switch. Levels are only revisited once the player has moved half of LOD_HYSTERESIS, since
+        no chunk can switch sooner.
+        """
+        position = self.app.player.position
+        if glm.distance(position, self.lod_position) < LOD_HYSTERESIS / 2:
+            return None
+        self.lod_position = glm.vec3(position)
+
+        switched = []
+        for chunk in self.chunks:
+            if chunk is None:
+                continue
+            lod = get_lod(glm.distance(position, chunk.center), chunk.lod)
+            if lod != chunk.lod:
+                chunk.lod = lod
+                switched.append(chunk)
+        if self.builder is not None:
+            for chunk in switched:
+                self.builder.request_mesh(chunk)
+        else:
+            self.build_meshes(switched)
+
+    def apply_edits(self, chunks):
+        """
+        Replays the edit journal deltas over freshly generated or loaded chunks.
+
+        Parameters:
+            chunks (list): The chunks to apply their edits to.
+        """
+        for chunk in chunks:
+            delta = self.journal.get_delta(chunk.position)
+            if delta is None:
+                continue
+            slot = chunk.slot
+            if slot < UNIFORM_ROWS:
+                slot = self.expand_chunk(chunk.index)
+            indices, ids = delta
+            self.voxels[slot, indices] = ids
+
+    def pack_chunks(self, chunks):
+        """
+        Moves freshly loaded chunks from the dense pool into the palette store, when it is enabled.
+        Uniform chunks keep their shared row and are packed too so njit readers never branch on them.
+
+        Parameters:
+            chunks (list): The chunks to pack.
+        """
+        if self.palette is None:
+            return None
+        for chunk in chunks:
+            slot = chunk.slot
+            self.palette.pack(chunk.index, self.voxels[slot])
+            if slot >= UNIFORM_ROWS:
+                self.free_slot(slot)
+                self.chunk_slots[chunk.index] = PACKED_SLOT
+
+    def get_storage(self, copy=False):
+        """
+        Returns the voxel storage read by the mesher, see voxel_storage.read_voxel.
+
+        A copy is for mesh jobs on other threads. It copies the tables that edits change in place and
+        starts a new storage epoch: rows freed from then on are not reused while a job reading the copy
+        is in flight, see free_slot. The palette word buffer needs no copy, as regions are never reused
+        in place and compaction moves them to a new buffer.
+
+        Parameters:
+            copy (bool): Copy the tables that edits change in place, for use on another thread.
+
+        Returns:
+            tuple: (voxels, chunk_slots) for the dense pool, or the palette store's arrays.
+        """
+        if copy:
+            self.storage_epoch += 1
+        if self.palette is None:
+            return self.voxels, self.chunk_slots.copy() if copy else self.chunk_slots
+        words, offsets, bits, palettes = self.palette.storage
+        if copy:
+            return words, offsets.copy(), bits.copy(), palettes.copy()
+        return words, offsets, bits, palettes
+
+    def save(self):
+        """
+        Stops the chunk builder and closes the edit journal, region files and mesh cache; edits are already saved.
+        """
+        if self.builder is not None:
+            self.builder.shutdown()
+        self.journal.close()
+        if self.region_store:
+            self.region_store.close()
+        if self.mesh_cache:
+            self.mesh_cache.close()
+
+    def release_uniform_chunks(self, chunks):
+        """
+        Points every generated chunk holding a single voxel ID at the shared uniform row
+        and returns its dense row to the free list.
+
+        Parameters:
+            chunks (list): The generated chunks to check.
+        """
+        rows = np.array([chunk.slot for chunk in chunks], dtype='int32')
+        uniform_ids = np.empty(len(rows), dtype='int32')
+        find_uniform_rows(self.voxels, rows, uniform_ids)
+        for chunk, slot, voxel_id in zip(chunks, rows, uniform_ids):
+            if 0 <= voxel_id < UNIFORM_ROWS:
+                self.chunk_slots[chunk.index] = voxel_id
+                self.free_slot(int(slot))
+
+    def compact_pool(self):
+        """Shrinks the voxel pool to the rows still in use, dropping free rows."""
+        rows = list(range(UNIFORM_ROWS))
+        for chunk_index, slot in enumerate(self.chunk_slots):
+            if UNIFORM_ROWS <= slot != PACKED_SLOT:
+                self.chunk_slots[chunk_index] = len(rows)
+                rows.append(slot)
+        self.voxels = self.voxels[rows]
+        self.free_slots = []
+        self.retired_slots.clear()  # storage copies keep the old pool
+
+    def reserve_slots(self, count):
+        """
+        Grows the voxel pool in one step so that at least `count` rows are free.
+
+        Parameters:
+            count (int): The number of rows about to be allocated.
+        """
+        missing = count - len(self.free_slots)
+        if missing <= 0:
+            return None
+        rows = len(self.voxels)
+        grow = max(missing, 16, rows // 4)
+        self.voxels = np.concatenate([self.voxels, np.zeros([grow, CHUNK_VOL], dtype='uint8')])
+        self.free_slots = list(range(rows + grow - 1, rows - 1, -1)) + self.free_slots
+
+    def free_slot(self, slot):
+        """
+        Returns a dense row of the voxel pool to the free list. With the chunk builder, mesh jobs may
+        still read the row through an older storage copy, so it is retired until recycle_slots.
+
+        Parameters:
+            slot (int): The pool row.
+        """
+        if self.builder is None:
+            self.free_slots.append(slot)
+        else:
+            self.retired_slots.append((self.storage_epoch, slot))
+
+    def recycle_slots(self, oldest_epoch):
+        """
+        Returns the retired rows no mesh job in flight can read anymore to the free list.
+
+        Parameters:
+            oldest_epoch (int): The storage epoch of the oldest copy still read by a job in flight.
+        """
+        while self.retired_slots and self.retired_slots[0][0] < oldest_epoch:
+            self.free_slots.append(self.retired_slots.popleft()[1])
+
+    def allocate_slot(self):
+        """
+        Reserves a dense row of the voxel pool, growing the pool when no row is free.
+
+        Returns:
+            int: The reserved pool row.
+        """
+        self.reserve_slots(1)
+        return self.free_slots.pop()
+
+    def expand_chunk(self, chunk_index):
+        """
+        Gives a uniform chunk a dense pool row copied from its shared row, ready to be edited.
+
+        Parameters:
+            chunk_index (int): The index of the uniform chunk.
+
+        Returns:
+            int: The chunk's new pool row.
+        """
+        slot = self.allocate_slot()
+        self.voxels[slot] = self.voxels[self.chunk_slots[chunk_index]]
+        self.chunk_slots[chunk_index] = slot
+        return slot
+
+    def get_chunk(self, x, y, z):
+        """
+        Returns the chunk at a chunk position, or None if it is outside the world or not loaded.
+
+        Parameters:
+            x, y, z (int): The chunk position in chunk coordinates.
+        """
+        chunk_index = get_chunk_index(x, y, z, self.chunk_columns)
+        if chunk_index == -1:
+            return None
+        return self.chunks[chunk_index]
+
+    def rebuild_voxel_meshes(self, voxel_world_pos):
+        """
+        Remeshes the sections of every loaded chunk whose faces or AO an edited voxel can change.
+
+        Parameters:
+            voxel_world_pos (glm.ivec3): The world position of the edited voxel.
+        """
+        for (cx, cy, cz), sections in get_edit_sections(*voxel_world_pos).items():
+            chunk = self.get_chunk(cx, cy, cz)
+            if chunk is not None:
+                chunk.rebuild_mesh(sections)
 
     def build_chunk_mesh(self):
         """Builds the mesh for each chunk, enabling rendering."""
-        for chunk in self.chunks:
-            chunk.build_mesh()
+        self.build_meshes([chunk for chunk in self.chunks if chunk is not None])
+
+    def build_meshes(self, chunks):
+        """
+        Meshes chunks on the main thread. With BULK_MESHING they are meshed in parallel by
+        build_world_meshes into one vertex arena, uploaded as a single buffer that each chunk
+        draws its own range of; otherwise they are meshed one at a time. With the mesh cache,
+        chunks are hashed in parallel first, only the misses are meshed and the hits are
+        uploaded into the arena straight from the cache's mapped pages.
+
+        Parameters:
+            chunks (iterable): The chunks to mesh.
+        """
+        if not BULK_MESHING:
+            for chunk in chunks:
+                chunk.build_mesh()
+            return None
+
+        if OCCLUSION_CULLING:
+            self.update_connectivity(chunks)
+
+        meshed = []
+        for chunk in chunks:
+            if chunk.is_empty or chunk.is_buried():
+                chunk.drop_mesh()
+            else:
+                meshed.append(chunk)
+        if not meshed:
+            return None
+        chunk_indices = np.array([chunk.index for chunk in meshed], dtype='int32')
+        chunk_positions = np.array([chunk.position for chunk in meshed], dtype='int32')
+        scales = np.array([chunk.lod_scale for chunk in meshed], dtype='int32')
+        storage = self.get_storage()
+
+        keys, cached = self.get_cached_meshes(chunk_indices, chunk_positions, scales, storage)
+        misses = [i for i, mesh in enumerate(cached) if mesh is None]
+        vertex_data, offsets, counts, section_offsets = build_world_meshes(
+            chunk_indices[misses], chunk_positions[misses], scales[misses], storage, self.chunk_columns,
+            MESH_FORMAT_SIZE, INDEXED_QUADS, self.greedy_meshing
+        )
+        if self.mesh_cache:
+            for i, offset, count, chunk_offsets in zip(misses, offsets.tolist(), counts.tolist(), section_offsets):
+                self.mesh_cache.put(keys[i], vertex_data[offset: offset + count], chunk_offsets)
+        self.upload_meshes(meshed, cached, misses, vertex_data, offsets, counts, section_offsets)
+
+    def update_connectivity(self, chunks):
+        """
+        Rebuilds the face connectivity of the chunks whose voxels changed since it was last built.
+
+        Parameters:
+            chunks (iterable): The chunks about to be meshed.
+        """
+        stale = [chunk for chunk in chunks if chunk.connectivity_stale]
+        if stale:
+            build_connectivity(np.array([chunk.index for chunk in stale], dtype='int32'), self.get_storage(),
+                               self.chunk_connectivity)
+        for chunk in stale:
+            chunk.connectivity_stale = False
+
+    def get_cached_meshes(self, chunk_indices, chunk_positions, scales, storage):
+        """
+        Hashes chunks in parallel and looks their meshes up in the mesh cache.
+
+        Parameters:
+            chunk_indices (np.array): The chunk table indices.
+            chunk_positions (np.array): The chunk positions, as int32.
+            scales (np.array): The LOD scale of each chunk.
+            storage (tuple): The voxel storage, see get_storage.
+
+        Returns:
+            tuple: The cache key of each chunk, or None without the mesh cache, and its cached vertex data
+            and section offsets, or None on a miss.
+        """
+        if not self.mesh_cache:
+            return None, [None] * len(chunk_indices)
+        salts = np.array([get_mesher_salt(self.greedy_meshing, scale, INDEXED_QUADS) for scale in scales.tolist()],
+                         dtype='int64')
+        keys = [tuple(key) for key in build_mesh_keys(chunk_indices, chunk_positions, scales, salts, storage,
+                                                        self.chunk_columns).tolist()]
+        return keys, [self.mesh_cache.get(key) for key in keys]
+
+    def upload_meshes(self, meshed, cached, misses, vertex_data, offsets, counts, section_offsets):
+        """
+        Uploads freshly built and cached meshes into one vertex arena and points each chunk at its range.
+
+        Parameters:
+            meshed (list): The chunks meshed.
+            cached (list): The cached mesh of each chunk, or None if it was built.
+            misses (list): The positions in meshed of the chunks built.
+            vertex_data (np.array): The vertices built by build_world_meshes.
+            offsets (np.array): The first vertex of each built chunk.
+            counts (np.array): The vertex count of each built chunk.
+            section_offsets (list): The section offsets of each built chunk.
+        """
+        offsets, counts = offsets * vertex_data.itemsize, counts * vertex_data.itemsize
+        # the misses lead the arena in one piece, each hit follows at its own offset
+        meshes = [None] * len(meshed)
+        for i, offset, count, chunk_offsets in zip(misses, offsets.tolist(), counts.tolist(), section_offsets):
+            meshes[i] = offset, count, chunk_offsets
+        size = vertex_data.nbytes
+        for i, mesh in enumerate(cached):
+            if mesh is not None:
+                meshes[i] = size, mesh[0].nbytes, mesh[1]
+                size += mesh[0].nbytes
+
+        users = sum(1 for _, count, _ in meshes if count)
+        arena = MeshArena(self.app.ctx, size, users) if users else None
+        if arena is not None:
+            arena.write(vertex_data, 0)
+            for (offset, count, _), mesh in zip(meshes, cached):
+                if mesh is not None and count:
+                    arena.write(mesh[0], offset)
+        for chunk, (offset, count, chunk_offsets) in zip(meshed, meshes):
+            if count:
+                chunk.set_arena_mesh(arena, offset, chunk_offsets)
+            else:
+                chunk.drop_mesh()
+
+    def set_greedy_meshing(self, enabled):
+        """
+        Switches between the per-voxel and the greedy mesher and remeshes every loaded chunk.
+
+        Parameters:
+            enabled (bool): Use the greedy mesher.
+        """
+        self.greedy_meshing = enabled
+        chunks = [chunk for chunk in self.chunks if chunk is not None]
+        if self.builder is None:
+            self.build_meshes(chunks)
+        else:
+            for chunk in chunks:
+                self.builder.request_mesh(chunk)
+
+    def get_triangle_count(self):
+        """Returns the number of triangles in the loaded chunk meshes."""
+        return sum(chunk.mesh.vao.vertices // 3 for chunk in self.chunks if chunk is not None and chunk.mesh)
+
+    def get_occlusion_seeds(self, position, visible):
+        """
+        Picks the chunks the occlusion walk starts at: the camera's chunk, left only by the faces the
+        camera's air region touches, or from above or below the world, the chunks of the nearest layer
+        within the frustum, entered by the face toward the camera. The air region is only flood filled again
+        once the camera leaves it, or its chunk is replaced, edited or remeshed.
+
+        Parameters:
+            position (glm.vec3): The camera position.
+            visible (np.array): The chunks within the frustum.
+
+        Returns:
+            tuple: The seed chunk indices, the face each is entered by and the faces the camera's chunk
+            is left by, or None if the camera is beside the loaded world, where nothing is culled.
+        """
+        voxel = tuple(int(value // 1) for value in position)
+        cx, cy, cz = (value // CHUNK_SIZE for value in voxel)
+        if 0 <= cy < WORLD_H:
+            if not self.is_column_loaded(cx, cz):
+                return None
+            chunk = self.get_chunk(cx, cy, cz)
+            x, y, z = (value % CHUNK_SIZE for value in voxel)
+            voxel_index = x + CHUNK_SIZE * z + CHUNK_AREA * y
+            region = self.camera_region
+            if (region is None or region[0] is not chunk or region[1] != chunk.mesh_version
+                    or not self.camera_region_voxels[voxel_index]):
+                faces = get_region_faces(chunk.voxels, voxel_index, self.camera_region_voxels)
+                region = self.camera_region = chunk, chunk.mesh_version, faces
+            return np.array([chunk.index], dtype='int32'), np.array([ANY_FACE]), region[2]
+        layer, face = (WORLD_H - 1, 0) if cy >= WORLD_H else (0, 1)
+        seeds = visible[visible // WORLD_AREA == layer]
+        return seeds, np.full(len(seeds), face), ALL_FACES
+
+    def get_visible_chunks(self):
+        """
+        Finds the chunks to draw: those within the camera's frustum, culled in a single call over the
+        chunk center table, and with OCCLUSION_CULLING, only those the camera sees into through chunk
+        faces connected by air, see find_visible_chunks.
+
+        Returns:
+            np.array: The chunk table indices.
+        """
+        camera = self.app.player
+        visible = camera.frustum.cull(self.chunk_centers)
+        self.occluded_chunks = 0
+        if not OCCLUSION_CULLING:
+            return visible
+        seeds = self.get_occlusion_seeds(camera.position, visible)
+        if seeds is None:
+            return visible
+        in_frustum = np.zeros(WORLD_VOL, dtype=np.bool_)
+        in_frustum[visible] = True
+        seeds, seed_faces, camera_faces = seeds
+        reached = find_visible_chunks(seeds, seed_faces, self.chunk_connectivity, in_frustum, self.chunk_columns,
+                                      camera_faces)
+        self.occluded_chunks = len(visible) - len(reached)
+        return reached
+
+    def sort_front_to_back(self, chunk_indices):
+        """
+        Orders chunks nearest the camera first, by re-sorting the draw order of the last frame, see sort_by_distance.
+
+        Parameters:
+            chunk_indices (np.array): The chunk table indices to order.
+
+        Returns:
+            np.array: The chunk table indices, nearest first.
+        """
+        sort_by_distance(self.draw_order, self.chunk_centers, tuple(self.app.player.position))
+        selected = np.zeros(WORLD_VOL, dtype=np.bool_)
+        selected[chunk_indices] = True
+        return self.draw_order[selected[self.draw_order]]
 
     def render(self):
-        """Renders all chunks in the world."""
-        for chunk in self.chunks:
-            chunk.render()
+        """
+        Renders the visible chunks with a mesh, see get_visible_chunks, counting the chunks drawn, the vertices
+        submitted, and the draw calls and uniform uploads made. With OCCLUSION_QUERIES, chunks are drawn through
+        the occlusion queries, and the GPU skips those hidden last frame; they still count as drawn, the queries
+        count them once read back. With FRONT_TO_BACK, chunks are drawn nearest first, so hidden fragments fail
+        the depth test before shading.
+        """
+        visible = self.get_visible_chunks()
+        if FRONT_TO_BACK:
+            visible = self.sort_front_to_back(visible)
+        meshed = np.array([self.chunks[chunk_index].mesh is not None for chunk_index in visible.tolist()],
+                          dtype=np.bool_)
+        visible = visible[meshed]
+        if self.queries is None:
+            draws = [self.chunks[chunk_index].render() for chunk_index in visible.tolist()]
+        else:
+            draws = self.queries.render(visible, self.chunk_centers, self.app.player.position,
+                                        lambda chunk_index: self.chunks[chunk_index].render())
+        self.submitted_vertices = sum(vertices for vertices, _ in draws)
+        self.drawn_chunks = sum(vertices > 0 for vertices, _ in draws)
+        self.draw_calls = sum(calls for _, calls in draws)
+        self.uniform_uploads = 0  # chunks are placed by the chunk origin buffer
+        if self.queries is not None:
+            self.draw_calls += self.queries.boxes_drawn
+            self.uniform_uploads = self.queries.boxes_drawn
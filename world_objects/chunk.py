@@ -1,7 +1,33 @@
 from settings import *
-from meshes.chunk_mesh import ChunkMesh
-import random
-from terrain_gen import *
+from meshes.chunk_mesh import ChunkMesh, get_facing_faces
+from terrain_gen import generate_terrain
+from voxel_storage import AIR_SLOT, PACKED_SLOT, UNIFORM_ROWS, get_column_index
+from chunk_builder import EDIT_RANK, MESH_FORMAT_SIZE
+from meshes.chunk_mesh_builder import ALL_SECTIONS, build_chunk_mesh, build_greedy_mesh, build_lod_mesh
+from mesh_cache import get_cached_mesh
+from occlusion import get_connectivity
+
+
+def get_lod(distance, lod=0):
+    """
+    Picks the level of detail of a chunk from its distance to the camera. A chunk leaves its current
+    level only once it is LOD_HYSTERESIS past the level's bounds.
+
+    Args:
+        distance (float): The distance from the camera to the chunk's center.
+        lod (int): The chunk's current level.
+
+    Returns:
+        int: The level, 0 for full detail, each next level meshed from cells twice as large.
+    """
+    if not LOD_MESHING:
+        return 0
+    while lod < len(LOD_DISTANCES) and distance > LOD_DISTANCES[lod] + LOD_HYSTERESIS:
+        lod += 1
+    while lod > 0 and distance < LOD_DISTANCES[lod - 1] - LOD_HYSTERESIS:
+        lod -= 1
+    return lod
+
 
 class Chunk:
     """
@@ -11,12 +37,15 @@ class Chunk:
         app (App): The main application instance.
         world (World): The world instance this chunk belongs to.
         position (tuple): The position of the chunk in chunk coordinates.
-        m_model (glm.mat4): The model matrix for transforming the chunk in the world.
-        voxels (np.array): A 1D array storing voxel data for the chunk.
-        mesh (ChunkMesh): The mesh representation of the chunk for rendering.
-        is_empty (bool): Indicates if the chunk contains no solid voxels.
+        index (int): The index of the chunk in the world's ring-buffer chunk table.
+        origin (np.array): The world position of the chunk's minimum corner, as int32, see World.chunk_origins.
+        mesh (ChunkMesh): The mesh representation of the chunk for rendering, None when it has nothing to draw.
+        mesh_version (int): Bumped on every background mesh request, so stale results are dropped.
+        lod (int): The level of detail the chunk is meshed at, see get_lod.
+        connectivity_stale (bool): The voxels changed since the chunk's face connectivity was last found.
         center (glm.vec3): The center position of the chunk for frustum culling.
-        is_on_frustum (function): Function reference to check if the chunk is within the camera's frustum.
+        box_min (glm.vec3): The minimum corner of the chunk's bounding box.
+        box_max (glm.vec3): The maximum corner of the chunk's bounding box.
     """
     def __init__(self, world, position):
         """
@@ -29,70 +58,225 @@ class Chunk:
         self.app = world.app
         self.world = world
         self.position = position
-        self.m_model = self.get_model_matrix()
-        self.voxels: np.array = None
+        x, y, z = position
+        self.index = get_column_index(x, z) + WORLD_AREA * y
+        self.origin = np.array(position, dtype='int32') * CHUNK_SIZE
         self.mesh: ChunkMesh = None
-        self.is_empty = True
+        self.mesh_version = 0
         self.center = (glm.vec3(self.position) + 0.5) * CHUNK_SIZE  # Center for frustum culling
-        self.is_on_frustum = self.app.player.frustum.is_on_frustum  # Frustum culling function
+        self.box_min = glm.vec3(self.position) * CHUNK_SIZE  # Bounding box for face-direction culling
+        self.box_max = self.box_min + CHUNK_SIZE
+        self.lod = get_lod(glm.distance(self.app.player.position, self.center))
+        self.connectivity_stale = True
+
+    @property
+    def slot(self):
+        """The chunk's row in the world voxel pool; uniform chunks use the shared row of their voxel ID."""
+        return int(self.world.chunk_slots[self.index])
+
+    @property
+    def is_uniform(self):
+        """Indicates if every voxel of the chunk holds the same ID and no dense array is stored."""
+        return self.slot < UNIFORM_ROWS
+
+    @property
+    def is_empty(self):
+        """Indicates if the chunk is uniform air."""
+        return self.slot == AIR_SLOT
+
+    @property
+    def voxels(self):
+        """
+        The chunk's voxel array. Uniform chunks return their shared row and packed chunks
+        an unpacked copy, so edits must go through set_voxel.
+        """
+        slot = self.slot
+        if slot == PACKED_SLOT:
+            return self.world.palette.unpack(self.index)
+        return self.world.voxels[slot]
+
+    def get_voxel(self, voxel_index):
+        """
+        Returns the ID of a voxel of the chunk.
+
+        Args:
+            voxel_index (int): The voxel index within the chunk.
+        """
+        slot = self.slot
+        if slot == PACKED_SLOT:
+            return self.world.palette.get_voxel(self.index, voxel_index)
+        return self.world.voxels[slot, voxel_index]
+
+    def set_voxel(self, voxel_index, voxel_id):
+        """
+        Sets the ID of a voxel, expanding a uniform chunk to dense or packed storage on its
+        first edit, and records the edit in the world's edit journal.
+
+        Args:
+            voxel_index (int): The voxel index within the chunk.
+            voxel_id (int): The new voxel ID.
+        """
+        if self.world.palette is not None:
+            self.world.palette.set_voxel(self.index, voxel_index, voxel_id)
+            self.world.chunk_slots[self.index] = PACKED_SLOT
+        else:
+            slot = self.slot
+            if slot < UNIFORM_ROWS:
+                slot = self.world.expand_chunk(self.index)
+            self.world.voxels[slot, voxel_index] = voxel_id
+        self.connectivity_stale = True
+        self.world.camera_region = None
+        self.world.journal.record(self.position, voxel_index, voxel_id)
+
+    def is_buried(self):
+        """
+        Indicates if the chunk is uniformly solid and enclosed by uniformly solid chunks
+        or the world border, so none of its faces can be seen.
+        """
+        if not self.is_solid_uniform():
+            return False
+        x, y, z = self.position
+        for dx, dy, dz in ((1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1)):
+            neighbour = self.world.get_chunk(x + dx, y + dy, z + dz)
+            if neighbour is not None and not neighbour.is_solid_uniform():
+                return False
+        return True
+
+    def is_solid_uniform(self):
+        """Indicates if every voxel of the chunk holds the same solid ID."""
+        return AIR_SLOT < self.slot < UNIFORM_ROWS
 
-    def get_model_matrix(self):
+    @property
+    def lod_scale(self):
+        """The edge of the voxel cells the chunk is meshed from at its level of detail."""
+        return 1 << self.lod
+
+    def get_vertex_data(self, sections=ALL_SECTIONS):
         """
-        Computes the model transformation matrix for the chunk.
+        Meshes the chunk on the calling thread with the world's current mesher, or with the LOD
+        mesher, always whole, away from full detail. Whole meshes go through the world's mesh cache.
+
+        Args:
+            sections (np.array): The sorted sections to mesh, the whole chunk by default.
 
         Returns:
-            glm.mat4: The transformation matrix for the chunk.
+            tuple: The vertex data and the quad offsets of its ranges.
         """
-        m_model = glm.translate(glm.mat4(), glm.vec3(self.position) * CHUNK_SIZE)
-        return m_model
+        world = self.world
+        storage = world.get_storage()
+        if self.lod:
+            def mesher():
+                return build_lod_mesh(self.voxels, MESH_FORMAT_SIZE, self.position, storage, world.chunk_columns,
+                                      INDEXED_QUADS, self.lod_scale)
+        else:
+            def mesher():
+                build = build_greedy_mesh if world.greedy_meshing else build_chunk_mesh
+                return build(self.voxels, MESH_FORMAT_SIZE, self.position, storage, world.chunk_columns,
+                             INDEXED_QUADS, sections)
+        if sections is not ALL_SECTIONS and not self.lod:
+            return mesher()
+        return get_cached_mesh(world.mesh_cache, storage, world.chunk_columns, self.index, self.position,
+                               world.greedy_meshing, self.lod_scale, mesher)
 
-    def set_uniform(self):
-        """Sets the model matrix uniform in the shader program before rendering."""
-        self.mesh.program['m_model'].write(self.m_model)
+    def update_connectivity(self):
+        """
+        Finds which pairs of the chunk's faces are connected through air for OCCLUSION_CULLING, see
+        get_connectivity, if its voxels changed since.
+        """
+        if OCCLUSION_CULLING and self.connectivity_stale:
+            self.world.chunk_connectivity[self.index] = get_connectivity(self.voxels)
+            self.connectivity_stale = False
 
     def build_mesh(self):
-        """Generates the mesh for the chunk based on its voxel data."""
-        self.mesh = ChunkMesh(self)
+        """
+        Generates the mesh for the chunk based on its voxel data, skipping chunks with no visible faces,
+        and updates its face connectivity.
+        """
+        self.update_connectivity()
+        if self.is_empty or self.is_buried():
+            self.drop_mesh()
+        else:
+            self.set_mesh(*self.get_vertex_data())
 
-    def render(self):
-        """Renders the chunk if it is not empty and is within the camera's frustum."""
-        if not self.is_empty and self.is_on_frustum(self):
-            self.set_uniform()
-            self.mesh.render()
+    def rebuild_mesh(self, sections=None):
+        """
+        Regenerates the mesh after the chunk or one of its neighbours was edited, in the background when enabled.
 
-    def build_voxels(self):
+        Args:
+            sections (list): The sorted sections to remesh, the whole chunk when omitted, when it has no mesh
+                or when it is meshed at a level of detail.
         """
-        Generates the voxel data for the chunk.
+        if self.lod:
+            sections = None
+        if self.world.builder is not None:
+            self.world.builder.request_mesh(self, EDIT_RANK, sections)
+        elif sections is None or self.mesh is None:
+            self.build_mesh()
+        else:
+            self.update_connectivity()
+            sections = np.array(sections, dtype='int32')
+            self.set_mesh(*self.get_vertex_data(sections), sections)
 
-        Returns:
-            np.array: A 1D array containing voxel IDs for the chunk.
+    def set_mesh(self, vertex_data, section_offsets, sections=None):
         """
-        voxels = np.zeros(CHUNK_VOL, dtype='uint8')  # Initialize an empty voxel array
-        cx, cy, cz = glm.ivec3(self.position) * CHUNK_SIZE  # Get world-space coordinates
-        self.generate_terrain(voxels, cx, cy, cz)  # Fill voxel data based on terrain generation
-        if np.any(voxels):  # Check if the chunk contains any solid voxels
-            self.is_empty = False
-        return voxels
+        Uploads vertex data as the chunk's mesh, or as the new ranges of some of its sections,
+        dropping the mesh when it ends up empty.
 
-    @staticmethod
-    @njit
-    def generate_terrain(voxels, cx, cy, cz):
+        Args:
+            vertex_data (np.array): The vertex data.
+            section_offsets (np.array): The quad offsets of its ranges.
+            sections (np.array): The sorted sections it holds, None for the whole chunk.
         """
-        Generates terrain voxel data for the chunk based on world height.
+        if sections is not None:
+            self.mesh.rebuild_sections(vertex_data, section_offsets, sections)
+            if not self.mesh.face_offsets[-1]:
+                self.drop_mesh()
+        elif not len(vertex_data):
+            self.drop_mesh()
+        elif self.mesh is None:
+            self.mesh = ChunkMesh(self, vertex_data, section_offsets)
+        else:
+            self.mesh.rebuild(vertex_data, section_offsets)
+
+    def set_arena_mesh(self, arena, offset, section_offsets):
+        """
+        Makes the chunk's mesh draw its range of a mesh arena, see World.build_meshes.
 
         Args:
-            voxels (np.array): The array storing voxel IDs.
-            cx (int): The world X coordinate of the chunk.
-            cy (int): The world Y coordinate of the chunk.
-            cz (int): The world Z coordinate of the chunk.
-        """
-        for x in range(CHUNK_SIZE):
-            wx = x + cx  # World X coordinate
-            for z in range(CHUNK_SIZE):
-                wz = z + cz  # World Z coordinate
-                world_height = get_height(wx, wz)  # Get terrain height at this position
-                local_height = min(world_height - cy, CHUNK_SIZE)  # Limit height to chunk bounds
-
-                for y in range(local_height):
-                    wy = y + cy  # World Y coordinate
-                    set_voxel_id(voxels, x, y, z, wx, wy, wz, world_height)  # Assign voxel type
+            arena (MeshArena): The arena holding the vertex data.
+            offset (int): The byte offset of the vertex data in the arena.
+            section_offsets (np.array): The quad offsets of its ranges.
+        """
+        if self.mesh is None:
+            self.mesh = ChunkMesh(self, section_offsets=section_offsets, arena=arena, arena_offset=offset)
+        else:
+            self.mesh.use_arena(arena, offset, section_offsets)
+
+    def drop_mesh(self):
+        """Releases the chunk's mesh, leaving it with nothing to draw."""
+        if self.mesh is not None:
+            self.mesh.release()
+            self.mesh = None
+
+    def render(self):
+        """
+        Renders the chunk if it has a mesh, drawing only the face directions that can face the
+        camera when CULL_FACE_RANGES is set. The world culls chunks outside the camera's frustum first.
+
+        Returns:
+            tuple: The number of vertices submitted and of draw calls made.
+        """
+        if self.mesh is None:
+            return 0, 0
+        if CULL_FACE_RANGES:
+            return self.mesh.render_faces(get_facing_faces(self.app.player.position, self.box_min, self.box_max))
+        self.mesh.render()
+        return self.mesh.vao.vertices, 1
+
+    def build_voxels(self):
+        """Generates the voxel data for the chunk into its row of the world voxel pool."""
+        voxels = self.world.voxels[self.slot]
+        voxels[:] = 0
+        cx, cy, cz = glm.ivec3(self.position) * CHUNK_SIZE  # Get world-space coordinates
+        heightmap = self.world.get_heightmap(self.position)  # Height tile shared by the column
+        generate_terrain(voxels, heightmap, cx, cy, cz, CAVE_STRIDE)  # Fill voxel data based on terrain generation